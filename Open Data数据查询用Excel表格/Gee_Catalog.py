@@ -1,34 +1,45 @@
+import argparse
 import json
 import os
 import pandas as pd
-from pystac_client import Client
+from catalog_store import build_unified, write_parquet
+from http_cache import HttpCache
+from stac_crawler import CrawlCheckpoint, StacCrawler, collection_file
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--retry-failed", action="store_true", help="only re-crawl catalogs that failed")
+parser.add_argument("--restart", action="store_true", help="ignore the checkpoint and crawl from scratch")
+args = parser.parse_args()
 
 out_dir = "datasets"
 
 url = "https://earthengine-stac.storage.googleapis.com/catalog/catalog.json"
 
-root = Client.open(url, headers=[])
-
-catalogs = []
+cache = HttpCache()
+crawler = StacCrawler(cache=cache, max_workers=32, per_host=16)
 
-for link in root.get_child_links():
-    if link.rel == "child":
-        catalogs.append(link.target)
+checkpoint_file = "gee_catalog.checkpoint.json"
+if args.restart and os.path.exists(checkpoint_file):
+    os.remove(checkpoint_file)
+checkpoint = CrawlCheckpoint(checkpoint_file, out_dir)
 
 datasets = []
 
 i = 0
-for catalog in catalogs:
-    cat = Client.open(catalog, headers=[])
+for cat in checkpoint.crawl(crawler, url, retry_failed=args.retry_failed):
     print(cat.title)
 
+    if cat.error is not None:
+        print(cat.error)
+        checkpoint.record(cat)
+        continue
+
     try:
-        for index, collection in enumerate(cat.get_all_collections()):
-            data = collection.to_dict()
+        for index, data in enumerate(cat.collections):
             print(f'{i}: {data["id"]}')
             i = i + 1
             dataset = {}
-            output = out_dir + "/" + data["id"].replace("/", "_") + ".json"
+            output = collection_file(out_dir, data["id"])
             if not os.path.exists(os.path.dirname(output)):
                 os.makedirs(os.path.dirname(output))
             with open(output, "w") as f:
@@ -83,8 +94,13 @@ for catalog in catalogs:
             dataset["license"] = data["license"]
 
             datasets.append(dataset)
+        checkpoint.record(cat)
     except Exception as e:
         print(e)
+        checkpoint.record(cat, e)
+
+checkpoint.finish()
+cache.report()
 
 print("Total datasets: ", len(datasets))
 
@@ -97,3 +113,6 @@ df.drop(["script", "terms_of_use", "thumbnail"], axis=1).to_csv(
 
 with open("gee_catalog.json", "w") as f:
     json.dump(df.to_dict("records"), f, indent=4)
+
+write_parquet(df, "gee_catalog")
+build_unified()
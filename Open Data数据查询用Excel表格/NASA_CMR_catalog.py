@@ -1,32 +1,40 @@
+import argparse
 import json
 import os
 import pandas as pd
-from pystac_client import Client
+from catalog_store import build_unified, write_parquet
+from http_cache import HttpCache
+from stac_crawler import CrawlCheckpoint, StacCrawler, collection_file
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--retry-failed", action="store_true", help="only re-crawl catalogs that failed")
+parser.add_argument("--restart", action="store_true", help="ignore the checkpoint and crawl from scratch")
+args = parser.parse_args()
 
 out_dir = "datasets"
 
 url = "https://cmr.earthdata.nasa.gov/stac"
 
-root = Client.open(url, headers=[])
-
-catalogs = []
+cache = HttpCache()
+crawler = StacCrawler(cache=cache, max_workers=16, per_host=8)
 
-for link in root.get_child_links():
-    if link.rel == "child":
-        catalogs.append(link.target)
+checkpoint_file = "nasa_cmr_catalog.checkpoint.json"
+if args.restart and os.path.exists(checkpoint_file):
+    os.remove(checkpoint_file)
+checkpoint = CrawlCheckpoint(checkpoint_file, out_dir)
 
 datasets = []
 
-for catalog in catalogs:
+for cat in checkpoint.crawl(crawler, url, retry_failed=args.retry_failed):
 
     try:
-        cat = Client.open(catalog, headers=[])
+        if cat.error is not None:
+            raise cat.error
         print(cat.title)
-        for collection in cat.get_all_collections():
-            data = collection.to_dict()
+        for data in cat.collections:
             print(data["id"])
             dataset = {}
-            output = out_dir + "/" + data["id"].replace("/", "_") + ".json"
+            output = collection_file(out_dir, data["id"])
             if not os.path.exists(os.path.dirname(output)):
                 os.makedirs(os.path.dirname(output))
             with open(output, "w") as f:
@@ -79,9 +87,14 @@ for catalog in catalogs:
             dataset["license"] = data["license"]
 
             datasets.append(dataset)
+        checkpoint.record(cat)
     except Exception as e:
-        print("Error: ", catalog)
+        print("Error: ", cat.url)
         print(e)
+        checkpoint.record(cat, e)
+
+checkpoint.finish()
+cache.report()
 
 print("Total datasets: ", len(datasets))
 
@@ -93,3 +106,6 @@ df.drop(columns=["href", "metadata"]).to_csv(
 
 with open("nasa_cmr_catalog.json", "w") as f:
     json.dump(df.to_dict("records"), f, indent=4)
+
+write_parquet(df, "nasa_cmr_catalog")
+build_unified()
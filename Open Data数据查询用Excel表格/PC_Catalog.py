@@ -1,12 +1,19 @@
 import json
 import pandas as pd
+from catalog_store import build_unified, write_parquet
+from http_cache import CachedSession, HttpCache
 from pystac_client import Client
+from pystac_client.stac_api_io import StacApiIO
 
 out_dir = "datasets"
 
 endpoint = "https://planetarycomputer.microsoft.com/api/stac/v1"
 
-cat = Client.open(endpoint)
+cache = HttpCache()
+stac_io = StacApiIO()
+stac_io.session = CachedSession(cache)
+
+cat = Client.open(endpoint, stac_io=stac_io)
 
 datasets = []
 
@@ -74,6 +81,7 @@ for collection in cat.get_all_collections():
     datasets.append(dataset)
 
 print("Total datasets: ", len(datasets))
+cache.report()
 
 df = pd.DataFrame(datasets)
 df["title"] = df["title"].apply(lambda x: x.title() if x[0].islower() else x)
@@ -82,3 +90,6 @@ df.to_csv("pc_catalog.tsv", index=False, sep="\t")
 
 with open("pc_catalog.json", "w") as f:
     json.dump(df.to_dict("records"), f, indent=4)
+
+write_parquet(df, "pc_catalog")
+build_unified()
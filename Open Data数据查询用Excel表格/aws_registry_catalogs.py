@@ -0,0 +1,211 @@
+"""Build every AWS open-data-registry catalog table in a single pass.
+
+Each table is a ``CatalogTable`` with a predicate deciding which registry
+datasets it includes and a row builder turning a dataset into table rows.
+``build_catalogs`` walks the harvested registry once and fans every dataset
+out to all tables whose predicate matches, so adding a derived table does not
+cost another parse of the registry.
+
+Usage: python aws_registry_catalogs.py [registry url, zip or checkout]
+"""
+
+import json
+import sys
+from collections import namedtuple
+
+import pandas as pd
+
+from catalog_store import build_unified, write_parquet
+from http_cache import HttpCache
+from registry_harvester import harvest_registry, mark_outputs, outputs_current, url
+
+max_chars = 80  # The maximum number of characters in each column
+
+geo_tags = [
+    "gis",
+    "earth observation",
+    "events",
+    "mapping",
+    "meteorological",
+    "environmental",
+    "transportation",
+    "geospatial",
+    "satellite imagery",
+]
+
+# predicate(dataset) -> bool, build_rows(dataset, names) -> list of dicts, where
+# ``names`` is a dict shared by every dataset of one table build (see stac_catalog_rows)
+CatalogTable = namedtuple("CatalogTable", ["name", "predicate", "build_rows", "label"])
+
+
+def is_any(dataset):
+    return True
+
+
+def is_geo(dataset):
+    return bool(set(geo_tags) & set(dataset.get("Tags", [])))
+
+
+def is_stac(dataset):
+    return "stac" in dataset.get("Tags", [])
+
+
+def open_dataset_rows(dataset, names):
+    name = dataset.get("Name", "")
+    resources = dataset.get("Resources", [])
+    rows = []
+
+    for resource in resources:
+        resource = dict(resource)
+
+        before_href = resource["Description"].split("](")[0].replace("[", "")
+        if len(resource["Description"].split("](")) > 1:
+            after_href = resource["Description"].split("](")[1].split(")")[1]
+        else:  # No hyperlink
+            after_href = ""
+
+        resource["Description"] = (
+            f"{before_href}{after_href}"[:max_chars]
+            .replace("\n", "")
+            .replace(".", "")
+            .replace("or [SQS", "")
+            .replace("(ORC", "")
+            .replace("[", "")
+            .replace("(2007-2014", "(2007-2014)")
+            .replace("(2007-2013", "(2007-2013)")
+            .strip()
+        )
+
+        item = {}
+
+        if len(resources) > 1:
+            item["Name"] = f"{name} - {resource['Description']}"
+        else:
+            item["Name"] = name
+
+        for key in resource:
+            item[key] = resource[key]
+
+        item["Documentation"] = (
+            dataset["Documentation"].replace("<br/>", "").replace("\n", "")[:max_chars]
+        )
+        item["Contact"] = (
+            dataset["Contact"].replace("<br/>", "").replace("\n", "")[:max_chars]
+        )
+        item["ManagedBy"] = dataset["ManagedBy"].replace("\n", "")[:max_chars]
+        item["UpdateFrequency"] = dataset["UpdateFrequency"].replace("\n", "")[
+            :max_chars
+        ]
+        item["License"] = dataset["License"].replace("\n", "")[:max_chars]
+        item["Tags"] = ", ".join(dataset["Tags"])
+
+        rows.append(item)
+
+    return rows
+
+
+def stac_catalog_rows(dataset, names):
+    name = dataset.get("Name", "")
+    resources = [r for r in dataset.get("Resources", []) if "Explore" in r]
+    rows = []
+
+    # Explore endpoints are counted per name across datasets, so a dataset
+    # sharing its name with an earlier one also gets the description suffix
+    names[name] = names.get(name, 0) + len(resources)
+
+    for resource in resources:
+        resource = dict(resource)
+        explore = resource.pop("Explore")[0]
+        endpoint = explore[explore.find("http") : -1]
+
+        item = {}
+
+        resource["Description"] = resource["Description"].replace(
+            "Water Observations from Space ", ""
+        )
+
+        if names[name] > 1:
+            item["Name"] = f"{name} - {resource['Description'].replace(name, '')}"
+        else:
+            item["Name"] = name
+
+        item["Name"] = item["Name"].replace("/", "-").replace("-  -", "-")
+
+        item["Endpoint"] = endpoint
+
+        for key in resource:
+            item[key] = resource[key]
+
+        rows.append(item)
+
+    return rows
+
+
+aws_open_datasets = CatalogTable("aws_open_datasets", is_any, open_dataset_rows, "datasets")
+aws_geo_datasets = CatalogTable("aws_geo_datasets", is_geo, open_dataset_rows, "geospatial datasets")
+aws_stac_catalogs = CatalogTable("aws_stac_catalogs", is_stac, stac_catalog_rows, "STAC datasets")
+
+tables = [aws_open_datasets, aws_geo_datasets, aws_stac_catalogs]
+
+
+def write_table(table, rows):
+    df = pd.DataFrame(rows)
+    df = df.sort_values(by="Name")
+    df.to_csv(f"{table.name}.tsv", index=False, sep="\t")
+
+    data = json.loads(df.to_json(orient="records"))
+
+    with open(f"{table.name}.json", "w") as f:
+        json.dump(data, f, indent=4)
+
+    write_parquet(df, table.name)
+
+
+def build_catalogs(harvest, tables=tables, copy_dir="datasets"):
+    """Fan every harvested dataset out to ``tables`` in one pass and write them.
+
+    Tables whose TSV/JSON were already built from the current registry content
+    are skipped. Matching registry YAML files are copied to ``copy_dir``.
+    """
+    stale = [
+        table
+        for table in tables
+        if not outputs_current(harvest, f"{table.name}.tsv", f"{table.name}.json")
+    ]
+    if not stale:
+        print("Registry unchanged, outputs are up to date")
+        return
+
+    print(f"Total number of AWS open datasets: {len(harvest.datasets)}")
+
+    rows = {table.name: [] for table in stale}
+    names = {table.name: {} for table in stale}
+
+    # Registry file order, independent of the order files entered the harvest state
+    for file, dataset in sorted(harvest.datasets.items()):
+        if "Deprecated" in dataset:
+            continue
+
+        matched = [table for table in stale if table.predicate(dataset)]
+        if not matched:
+            continue
+
+        if copy_dir is not None:
+            harvest.copy(file, copy_dir)
+
+        for table in matched:
+            rows[table.name].extend(table.build_rows(dataset, names[table.name]))
+
+    for table in stale:
+        print(f"Total number of {table.label}: {len(rows[table.name])}")
+        write_table(table, rows[table.name])
+        mark_outputs(harvest, f"{table.name}.tsv", f"{table.name}.json")
+
+    build_unified()
+
+
+if __name__ == "__main__":
+    cache = HttpCache()
+    harvest = harvest_registry(sys.argv[1] if len(sys.argv) > 1 else url, http_cache=cache)
+    build_catalogs(harvest)
+    cache.report()
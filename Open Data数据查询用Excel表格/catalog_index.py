@@ -0,0 +1,198 @@
+"""Spatial and temporal index over the unified open-data catalog.
+
+``build_index`` parses the ``bbox`` and ``start_date``/``end_date`` columns of
+``open_data_catalog.parquet`` into numeric arrays once and persists them next
+to it as ``open_data_catalog.index.npz``:
+
+* a packed (Sort-Tile-Recursive) R-tree: boxes grouped into small nodes whose
+  bounds are checked first, so only the boxes of overlapping nodes are tested;
+* an interval index: dataset intervals sorted by start day, so a time-range
+  query is a binary search plus one vectorized comparison.
+
+Boxes crossing the antimeridian (west > east) are stored as two halves.
+Datasets without a bbox never match a spatial query and datasets without any
+date never match a temporal one; a missing start or end date is open-ended::
+
+    from catalog_index import CatalogIndex
+    index = CatalogIndex.load()
+    df = index.search(bbox=(116.0, 39.6, 116.8, 40.2), start="2020-01-01", end="2020-12-31")
+"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+unified_file = "open_data_catalog.parquet"
+
+min_day = np.iinfo(np.int64).min
+max_day = np.iinfo(np.int64).max
+
+
+def index_file(path):
+    return os.path.splitext(path)[0] + ".index.npz"
+
+
+def _days(values, missing):
+    days = pd.to_datetime(pd.Series(values), errors="coerce")
+    out = np.full(len(days), missing, dtype=np.int64)
+    valid = days.notna().to_numpy()
+    out[valid] = (days[valid].to_numpy().astype("datetime64[D]")).astype(np.int64)
+    return out
+
+
+def _to_day(value):
+    if value is None:
+        return None
+    return int(np.datetime64(pd.Timestamp(value).date(), "D").astype(np.int64))
+
+
+def _str_pack(boxes, node_size):
+    """Order boxes Sort-Tile-Recursive style; return the order and node offsets."""
+    n = len(boxes)
+    if n == 0:
+        return np.arange(0), np.array([0])
+    cx = (boxes[:, 0] + boxes[:, 2]) / 2
+    cy = (boxes[:, 1] + boxes[:, 3]) / 2
+    slabs = max(1, int(np.ceil(np.sqrt(n / node_size))))
+    slab_size = slabs * node_size
+
+    order = []
+    offsets = [0]
+    by_x = np.argsort(cx, kind="stable")
+    for start in range(0, n, slab_size):
+        slab = by_x[start : start + slab_size]
+        slab = slab[np.argsort(cy[slab], kind="stable")]
+        for node_start in range(0, len(slab), node_size):
+            order.append(slab[node_start : node_start + node_size])
+            offsets.append(offsets[-1] + len(order[-1]))
+    return np.concatenate(order), np.array(offsets)
+
+
+def build_index(path=unified_file, node_size=16):
+    """Build and persist the spatial/temporal index for the catalog at ``path``."""
+    df = pq.read_table(path, columns=["bbox", "start_date", "end_date"]).to_pandas()
+
+    # Spatial: one entry per box, two for boxes crossing the antimeridian
+    rows, boxes = [], []
+    for row, bbox in enumerate(df["bbox"]):
+        if bbox is None:
+            continue
+        west, south, east, north = (float(v) for v in bbox)
+        south, north = min(south, north), max(south, north)
+        if west > east:
+            rows += [row, row]
+            boxes += [(west, south, 180.0, north), (-180.0, south, east, north)]
+        else:
+            rows.append(row)
+            boxes.append((west, south, east, north))
+    rows = np.array(rows, dtype=np.int64)
+    boxes = np.array(boxes, dtype=np.float64).reshape(-1, 4)
+
+    order, offsets = _str_pack(boxes, node_size)
+    rows, boxes = rows[order], boxes[order]
+    node_boxes = np.array(
+        [
+            [
+                boxes[a:b, 0].min(),
+                boxes[a:b, 1].min(),
+                boxes[a:b, 2].max(),
+                boxes[a:b, 3].max(),
+            ]
+            for a, b in zip(offsets[:-1], offsets[1:])
+        ],
+        dtype=np.float64,
+    ).reshape(-1, 4)
+
+    # Temporal: intervals sorted by start day
+    starts = _days(df["start_date"], min_day)
+    ends = _days(df["end_date"], max_day)
+    has_time = (starts != min_day) | (ends != max_day)
+    time_rows = np.flatnonzero(has_time)
+    by_start = np.argsort(starts[time_rows], kind="stable")
+    time_rows = time_rows[by_start]
+
+    np.savez(
+        index_file(path),
+        rows=rows,
+        boxes=boxes,
+        node_boxes=node_boxes,
+        offsets=offsets,
+        time_rows=time_rows,
+        starts=starts[time_rows],
+        ends=ends[time_rows],
+        count=np.array(len(df)),
+    )
+    print(f"Catalog index: {len(rows)} boxes in {len(node_boxes)} nodes, {len(time_rows)} intervals")
+
+
+class CatalogIndex:
+    def __init__(self, arrays, path):
+        self.path = path
+        self.rows = arrays["rows"]
+        self.boxes = arrays["boxes"]
+        self.node_boxes = arrays["node_boxes"]
+        self.offsets = arrays["offsets"]
+        self.time_rows = arrays["time_rows"]
+        self.starts = arrays["starts"]
+        self.ends = arrays["ends"]
+        self.count = int(arrays["count"])
+        self._tables = {}
+
+    @classmethod
+    def load(cls, path=unified_file):
+        with np.load(index_file(path)) as arrays:
+            return cls({key: arrays[key] for key in arrays.files}, path)
+
+    def query_bbox(self, bbox):
+        """Sorted row positions whose bbox intersects ``bbox`` (west, south, east, north)."""
+        west, south, east, north = bbox
+        if west > east:
+            return np.union1d(
+                self.query_bbox((west, south, 180.0, north)),
+                self.query_bbox((-180.0, south, east, north)),
+            )
+        nb = self.node_boxes
+        nodes = np.flatnonzero(
+            (nb[:, 0] <= east) & (nb[:, 2] >= west) & (nb[:, 1] <= north) & (nb[:, 3] >= south)
+        )
+        if len(nodes) == 0:
+            return np.arange(0)
+        candidates = np.concatenate(
+            [np.arange(self.offsets[n], self.offsets[n + 1]) for n in nodes]
+        )
+        b = self.boxes[candidates]
+        hit = (b[:, 0] <= east) & (b[:, 2] >= west) & (b[:, 1] <= north) & (b[:, 3] >= south)
+        return np.unique(self.rows[candidates[hit]])
+
+    def query_time(self, start=None, end=None):
+        """Sorted row positions whose interval overlaps [start, end] (open-ended if None)."""
+        start_day = _to_day(start)
+        end_day = _to_day(end)
+        k = len(self.starts) if end_day is None else np.searchsorted(self.starts, end_day, "right")
+        if start_day is None:
+            return np.sort(self.time_rows[:k])
+        return np.sort(self.time_rows[:k][self.ends[:k] >= start_day])
+
+    def query(self, bbox=None, start=None, end=None):
+        """Row positions matching an AOI and/or a time range."""
+        rows = None
+        if bbox is not None:
+            rows = self.query_bbox(bbox)
+        if start is not None or end is not None:
+            in_time = self.query_time(start, end)
+            rows = in_time if rows is None else np.intersect1d(rows, in_time, assume_unique=True)
+        return np.arange(self.count) if rows is None else rows
+
+    def search(self, bbox=None, start=None, end=None, columns=("source", "id", "title")):
+        """Catalog rows matching the query, reading only ``columns`` from the Parquet file."""
+        columns = tuple(columns)
+        if columns not in self._tables:
+            self._tables[columns] = pq.read_table(self.path, columns=list(columns))
+        return self._tables[columns].take(self.query(bbox, start, end)).to_pandas()
+
+
+if __name__ == "__main__":
+    build_index(sys.argv[1] if len(sys.argv) > 1 else unified_file)
@@ -0,0 +1,192 @@
+"""Inverted full-text index with BM25 ranking over the open-data catalogs.
+
+The index is kept as one segment per source (AWS open/geo/STAC, GEE, PC,
+NASA CMR) under ``search_index/``. ``update_index`` only rebuilds the segments
+whose source table changed since they were built, so a harvester refreshing
+one source does not re-index the others; ``build_unified`` calls it at the end
+of every harvest. Queries combine the segments with global BM25 statistics::
+
+    from catalog_search import CatalogSearch
+    search = CatalogSearch.load()
+    search.search("sentinel land cov*", sources=["gee", "pc"])
+
+A query term ending in ``*`` matches every indexed term with that prefix;
+``prefix=True`` does the same for the last term (search-as-you-type).
+"""
+
+import bisect
+import json
+import math
+import os
+import re
+import sys
+from collections import Counter, defaultdict
+
+import numpy as np
+import pandas as pd
+
+index_dir = "search_index"
+
+k1 = 1.2
+b = 0.75
+
+token_pattern = re.compile(r"\w+")
+
+
+def tokenize(text):
+    return token_pattern.findall(text.lower()) if text else []
+
+
+def _document_tokens(row):
+    keywords = row["keywords"]
+    if keywords is None or (isinstance(keywords, float) and keywords != keywords):
+        keywords = []
+    parts = [row["id"], row["title"], row["title"], " ".join(keywords), row["description"]]
+    return tokenize(" ".join(part for part in parts if isinstance(part, str)))
+
+
+def build_segment(source, df):
+    """Build the inverted index segment for one source table in unified schema."""
+    postings = defaultdict(lambda: ([], []))
+    lengths = []
+    for doc, row in enumerate(df.to_dict("records")):
+        tokens = _document_tokens(row)
+        lengths.append(len(tokens))
+        for term, tf in Counter(tokens).items():
+            docs, tfs = postings[term]
+            docs.append(doc)
+            tfs.append(tf)
+    return {
+        "source": source,
+        "ids": df["id"].tolist(),
+        "titles": df["title"].tolist(),
+        "lengths": lengths,
+        "postings": dict(postings),
+    }
+
+
+def _stamp(path):
+    stat = os.stat(path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def update_index(catalog_dir="."):
+    """Rebuild the segments of sources whose table changed since the last build."""
+    from catalog_store import _find, read_source, sources
+
+    out_dir = os.path.join(catalog_dir, index_dir)
+    os.makedirs(out_dir, exist_ok=True)
+    stamps_file = os.path.join(out_dir, "stamps")
+    stamps = {}
+    if os.path.exists(stamps_file):
+        with open(stamps_file, "r") as f:
+            stamps = json.load(f)
+
+    for source, (name, _) in sources.items():
+        path = _find(catalog_dir, name)
+        segment_file = os.path.join(out_dir, f"{source}.json")
+        if path is None:
+            continue
+
+        stamp = _stamp(path)
+        if stamps.get(source) == stamp and os.path.exists(segment_file):
+            continue
+
+        segment = build_segment(source, read_source(source, catalog_dir))
+        with open(segment_file + ".tmp", "w") as f:
+            json.dump(segment, f)
+        os.replace(segment_file + ".tmp", segment_file)
+        stamps[source] = stamp
+        print(f"Search index: {source} re-indexed, {len(segment['ids'])} documents")
+
+    with open(stamps_file, "w") as f:
+        json.dump(stamps, f)
+
+
+class Segment:
+    def __init__(self, data):
+        self.source = data["source"]
+        self.ids = data["ids"]
+        self.titles = data["titles"]
+        self.lengths = np.array(data["lengths"], dtype=np.float64)
+        self.postings = data["postings"]
+        self.vocabulary = sorted(self.postings)
+
+    def expand(self, term, prefix):
+        if not prefix:
+            return [term] if term in self.postings else []
+        lo = bisect.bisect_left(self.vocabulary, term)
+        hi = bisect.bisect_left(self.vocabulary, term + "\uffff")
+        return self.vocabulary[lo:hi]
+
+
+class CatalogSearch:
+    def __init__(self, segments):
+        self.segments = segments
+        self.doc_count = sum(len(s.ids) for s in segments)
+        total = sum(s.lengths.sum() for s in segments)
+        self.avg_length = total / self.doc_count if self.doc_count else 0.0
+
+    @classmethod
+    def load(cls, catalog_dir="."):
+        out_dir = os.path.join(catalog_dir, index_dir)
+        segments = []
+        for name in sorted(os.listdir(out_dir)):
+            if name.endswith(".json"):
+                with open(os.path.join(out_dir, name), "r") as f:
+                    segments.append(Segment(json.load(f)))
+        return cls(segments)
+
+    def _terms(self, query, prefix):
+        """Query tokens as ``(term, is_prefix)`` pairs."""
+        terms = []
+        for word in query.split():
+            tokens = tokenize(word)
+            terms += [(token, False) for token in tokens[:-1]]
+            if tokens:
+                terms.append((tokens[-1], word.endswith("*")))
+        if prefix and terms:
+            terms[-1] = (terms[-1][0], True)
+        return terms
+
+    def search(self, query, sources=None, limit=20, prefix=False):
+        """Rank documents for ``query`` with BM25; returns source, id, title and score."""
+        segments = [s for s in self.segments if sources is None or s.source in sources]
+        terms = self._terms(query, prefix)
+
+        # Expand prefixes over the scored segments, but take document frequencies
+        # from every segment so IDF (and scores) match the unfiltered query
+        expanded = []
+        for term, is_prefix in terms:
+            matches = {s.source: s.expand(term, is_prefix) for s in segments}
+            for word in sorted({w for words in matches.values() for w in words}):
+                df = sum(len(s.postings[word][0]) for s in self.segments if word in s.postings)
+                idf = math.log(1 + (self.doc_count - df + 0.5) / (df + 0.5))
+                expanded.append((word, idf))
+
+        results = []
+        for segment in segments:
+            scores = np.zeros(len(segment.ids))
+            norm = k1 * (1 - b + b * segment.lengths / (self.avg_length or 1.0))
+            for word, idf in expanded:
+                if word not in segment.postings:
+                    continue
+                docs, tfs = segment.postings[word]
+                docs = np.asarray(docs)
+                tfs = np.asarray(tfs, dtype=np.float64)
+                scores[docs] += idf * tfs * (k1 + 1) / (tfs + norm[docs])
+            hits = np.flatnonzero(scores)
+            for doc in hits[np.argsort(-scores[hits], kind="stable")][:limit]:
+                results.append((segment.source, segment.ids[doc], segment.titles[doc], scores[doc]))
+
+        results.sort(key=lambda r: -r[3])
+        # A dataset listed by two sources (aws_geo rows are also in aws_open) is returned once
+        df = pd.DataFrame(results, columns=["source", "id", "title", "score"])
+        return df.drop_duplicates(subset=["id", "title"]).head(limit).reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        print(CatalogSearch.load().search(" ".join(sys.argv[1:])).to_string())
+    else:
+        update_index()
@@ -0,0 +1,257 @@
+"""Parquet storage and query API for the open-data catalogs.
+
+Every harvester writes a compressed Parquet copy of its table next to the TSV
+with ``write_parquet``. ``build_unified`` merges the six source tables into
+``open_data_catalog.parquet`` with one normalized schema:
+
+    source, id, title, provider, description, bbox, start_date, end_date,
+    keywords, license, url
+
+``build_unified`` also refreshes the spatial/temporal index (see
+catalog_index.py) and the full-text index (see catalog_search.py).
+
+``load_catalog`` reads only the requested columns (and row groups for the
+requested sources), so searching the merged catalog no longer re-parses
+every TSV::
+
+    from catalog_store import load_catalog
+    df = load_catalog(["id", "title", "keywords"], sources=["gee", "pc"])
+
+Usage: python catalog_store.py [catalog dir]
+"""
+
+import os
+import sys
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from catalog_index import build_index
+
+unified_file = "open_data_catalog.parquet"
+
+date_columns = ["state_date", "start_date", "end_date"]
+
+schema = pa.schema(
+    [
+        ("source", pa.string()),
+        ("id", pa.string()),
+        ("title", pa.string()),
+        ("provider", pa.string()),
+        ("description", pa.string()),
+        ("bbox", pa.list_(pa.float64(), 4)),
+        ("start_date", pa.date32()),
+        ("end_date", pa.date32()),
+        ("keywords", pa.list_(pa.string())),
+        ("license", pa.string()),
+        ("url", pa.string()),
+    ]
+)
+
+
+def write_parquet(df, name):
+    """Write ``df`` to ``<name>.parquet`` with typed date columns and zstd compression."""
+    df = df.copy()
+    for column in df.columns:
+        if column in date_columns:
+            df[column] = pd.to_datetime(df[column], errors="coerce").dt.date
+        elif df[column].dtype == object:
+            try:
+                pa.array(df[column], from_pandas=True)
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                # Mixed value types (e.g. True and "unknown"); keep them as text
+                df[column] = df[column].map(lambda x: None if _missing(x) else str(x))
+    df.to_parquet(f"{name}.parquet", index=False, compression="zstd")
+
+
+def _missing(value):
+    return value is None or (isinstance(value, float) and value != value)
+
+
+def _text(value):
+    return None if _missing(value) or value == "" else str(value)
+
+
+def _split(value):
+    value = _text(value)
+    return [part.strip() for part in value.split(",") if part.strip()] if value else []
+
+
+def _bbox(value):
+    if isinstance(value, (list, tuple)):
+        coords = list(value)
+    else:
+        try:
+            coords = [float(part) for part in _split(value)]
+        except ValueError:
+            return None
+    return [float(coord) for coord in coords] if len(coords) == 4 else None
+
+
+def _date(value):
+    if _missing(value) or value == "":
+        return None
+    date = pd.to_datetime(value, errors="coerce")
+    return None if pd.isna(date) else date.date()
+
+
+def _aws_row(row):
+    return {
+        "id": _text(row.get("ARN")) or _text(row.get("Name")),
+        "title": _text(row.get("Name")),
+        "provider": _text(row.get("ManagedBy")),
+        "description": _text(row.get("Description")),
+        "keywords": _split(row.get("Tags")),
+        "license": _text(row.get("License")),
+        "url": _text(row.get("Documentation")),
+    }
+
+
+def _aws_stac_row(row):
+    return {
+        "id": _text(row.get("ARN")) or _text(row.get("Name")),
+        "title": _text(row.get("Name")),
+        "description": _text(row.get("Description")),
+        "url": _text(row.get("Endpoint")),
+    }
+
+
+def _gee_row(row):
+    return {
+        "id": _text(row.get("id")),
+        "title": _text(row.get("title")),
+        "provider": _text(row.get("provider")),
+        "bbox": _bbox(row.get("bbox")),
+        "start_date": _date(row.get("state_date")),
+        "end_date": _date(row.get("end_date")),
+        "keywords": _split(row.get("keywords")),
+        "license": _text(row.get("license")),
+        "url": _text(row.get("url")),
+    }
+
+
+def _pc_row(row):
+    return {
+        "id": _text(row.get("id")),
+        "title": _text(row.get("title")),
+        "provider": _text(row.get("providers")),
+        "description": _text(row.get("description")),
+        "bbox": _bbox(row.get("bbox")),
+        "start_date": _date(row.get("start_date")),
+        "end_date": _date(row.get("end_date")),
+        "keywords": _split(row.get("keywords")),
+        "license": _text(row.get("license")),
+        "url": _text(row.get("link")),
+    }
+
+
+def _nasa_cmr_row(row):
+    return {
+        "id": _text(row.get("id")),
+        "title": _text(row.get("title")),
+        "provider": _text(row.get("catalog")),
+        "description": _text(row.get("description")),
+        "bbox": _bbox(row.get("bbox")),
+        "start_date": _date(row.get("state_date")),
+        "end_date": _date(row.get("end_date")),
+        "license": _text(row.get("license")),
+        "url": _text(row.get("url")),
+    }
+
+
+# source name -> (output basename written by its harvester, row normalizer).
+# aws_geo is a subset of aws_open and comes first so build_unified keeps its rows
+sources = {
+    "aws_geo": ("aws_geo_datasets", _aws_row),
+    "aws_open": ("aws_open_datasets", _aws_row),
+    "aws_stac": ("aws_stac_catalogs", _aws_stac_row),
+    "gee": ("gee_catalog", _gee_row),
+    "pc": ("pc_catalog", _pc_row),
+    "nasa_cmr": ("nasa_cmr_catalog", _nasa_cmr_row),
+}
+
+
+def _find(catalog_dir, name):
+    """Locate ``name``.parquet or ``name``.tsv, ignoring case (the checked-in TSVs are capitalized)."""
+    files = {f.lower(): f for f in os.listdir(catalog_dir)}
+    for ext in (".parquet", ".tsv"):
+        if name + ext in files:
+            return os.path.join(catalog_dir, files[name + ext])
+    # aws_stac_catalogs.tsv is checked in as AWS_Geo_STAC_Catalogs.tsv
+    if name == "aws_stac_catalogs" and "aws_geo_stac_catalogs.tsv" in files:
+        return os.path.join(catalog_dir, files["aws_geo_stac_catalogs.tsv"])
+    return None
+
+
+def read_source(source, catalog_dir="."):
+    """Read one source table as a DataFrame in the unified schema (None if missing)."""
+    name, normalize = sources[source]
+    path = _find(catalog_dir, name)
+    if path is None:
+        return None
+    if path.endswith(".parquet"):
+        df = pd.read_parquet(path)
+    else:
+        df = pd.read_csv(path, sep="\t", dtype=str, keep_default_na=False)
+
+    rows = []
+    for row in df.to_dict("records"):
+        record = dict.fromkeys(schema.names)
+        record.update(normalize(row))
+        record["source"] = source
+        rows.append(record)
+    return pd.DataFrame(rows, columns=schema.names)
+
+
+def build_unified(catalog_dir="."):
+    """Merge every available source table into ``open_data_catalog.parquet``."""
+    frames = []
+    for source in sources:
+        df = read_source(source, catalog_dir)
+        if df is None:
+            print(f"No table for source {source}, skipping")
+            continue
+        frames.append(df)
+
+    df = pd.concat(frames, ignore_index=True)
+    # The same dataset can come from several sources (every aws_geo row is also in aws_open)
+    total = len(df)
+    df = df.drop_duplicates(subset=["id", "url"]).reset_index(drop=True)
+    if len(df) < total:
+        print(f"Dropped {total - len(df)} duplicate datasets")
+    table = pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+    # One row group per source so source filters skip whole groups
+    with pq.ParquetWriter(os.path.join(catalog_dir, unified_file), schema, compression="zstd") as writer:
+        for source in df["source"].unique():
+            writer.write_table(table.filter(pc.equal(table["source"], source)))
+    print(f"Unified catalog: {len(df)} datasets from {len(frames)} sources")
+
+    build_index(os.path.join(catalog_dir, unified_file))
+
+    from catalog_search import update_index
+
+    update_index(catalog_dir)
+    return df
+
+
+def load_catalog(columns=None, sources=None, path=unified_file):
+    """Load the unified catalog, reading only ``columns`` for the given ``sources``."""
+    filters = [("source", "in", list(sources))] if sources else None
+    return pq.read_table(path, columns=columns, filters=filters).to_pandas()
+
+
+def find_datasets(keyword, columns=("source", "id", "title"), sources=None, path=unified_file):
+    """Datasets whose title or keywords contain ``keyword`` (case-insensitive)."""
+    needed = list(dict.fromkeys(list(columns) + ["title", "keywords"]))
+    df = load_catalog(needed, sources, path)
+    keyword = keyword.lower()
+    mask = df["title"].str.lower().str.contains(keyword, regex=False, na=False) | df[
+        "keywords"
+    ].map(lambda words: words is not None and any(keyword in w.lower() for w in words))
+    return df.loc[mask, list(columns)].reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    build_unified(sys.argv[1] if len(sys.argv) > 1 else ".")
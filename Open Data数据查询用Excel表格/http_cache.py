@@ -0,0 +1,193 @@
+"""On-disk HTTP response cache shared by the catalog harvesters.
+
+Responses to GET requests are stored under ``cache_dir`` keyed by URL. A
+cached response younger than ``ttl`` seconds is served without touching the
+network; an older one is revalidated with If-None-Match/If-Modified-Since and
+only a 304 travels over the wire when it is unchanged. The cache is bounded by
+``max_bytes`` and evicts least recently used responses first.
+
+Anything built on ``requests`` can use it through ``CachedSession``: pass
+``cache=`` to StacCrawler or harvest_registry, or set ``StacApiIO.session`` for
+pystac_client. Call ``report()`` at the end of a run to save the index and
+print the hit/miss counters.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+cache_dir = ".http_cache"
+
+
+class HttpCache:
+    def __init__(self, cache_dir=cache_dir, ttl=24 * 3600, max_bytes=1024**3):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.index_file = os.path.join(cache_dir, "index.json")
+        self.stats = {"hits": 0, "revalidated": 0, "misses": 0, "evicted": 0}
+        self._lock = threading.Lock()
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self.index = {}
+        if os.path.exists(self.index_file):
+            with open(self.index_file, "r") as f:
+                self.index = json.load(f)
+        # Drop entries whose body went missing and bodies nothing points to
+        self.index = {
+            key: entry for key, entry in self.index.items() if os.path.exists(self._body(key))
+        }
+        for name in os.listdir(cache_dir):
+            if name.endswith(".body") and name[: -len(".body")] not in self.index:
+                os.remove(os.path.join(cache_dir, name))
+        self.size = sum(entry["size"] for entry in self.index.values())
+        self._evict()
+
+    def _key(self, url):
+        return hashlib.sha1(url.encode("utf-8")).hexdigest()
+
+    def _body(self, key):
+        return os.path.join(self.cache_dir, key + ".body")
+
+    def lookup(self, url):
+        """Return ``(entry, body, fresh)`` for ``url``, or None if it is not cached."""
+        key = self._key(url)
+        with self._lock:
+            entry = self.index.get(key)
+            if entry is None:
+                return None
+            entry["accessed"] = time.time()
+        try:
+            with open(self._body(key), "rb") as f:
+                body = f.read()
+        except FileNotFoundError:  # evicted meanwhile
+            return None
+        return entry, body, time.time() - entry["fetched"] < self.ttl
+
+    def store(self, url, headers, body):
+        key = self._key(url)
+        tmp_file = self._body(key) + ".tmp"
+        with open(tmp_file, "wb") as f:
+            f.write(body)
+        os.replace(tmp_file, self._body(key))
+
+        now = time.time()
+        with self._lock:
+            old = self.index.get(key)
+            if old is not None:
+                self.size -= old["size"]
+            self.index[key] = {
+                "url": url,
+                "etag": headers.get("ETag"),
+                "last_modified": headers.get("Last-Modified"),
+                "content_type": headers.get("Content-Type"),
+                "size": len(body),
+                "fetched": now,
+                "accessed": now,
+            }
+            self.size += len(body)
+            self._evict()
+
+    def touch(self, url):
+        """Mark ``url`` as freshly validated after a 304."""
+        with self._lock:
+            entry = self.index.get(self._key(url))
+            if entry is not None:
+                entry["fetched"] = time.time()
+
+    def _evict(self):
+        if self.size <= self.max_bytes:
+            return
+        for key in sorted(self.index, key=lambda k: self.index[k]["accessed"]):
+            if self.size <= self.max_bytes:
+                break
+            entry = self.index.pop(key)
+            self.size -= entry["size"]
+            self.stats["evicted"] += 1
+            if os.path.exists(self._body(key)):
+                os.remove(self._body(key))
+
+    def count(self, stat):
+        with self._lock:
+            self.stats[stat] += 1
+
+    def save(self):
+        with self._lock:
+            tmp_file = self.index_file + ".tmp"
+            with open(tmp_file, "w") as f:
+                json.dump(self.index, f)
+            os.replace(tmp_file, self.index_file)
+
+    def report(self):
+        """Persist the index and print hit/miss counters for this run."""
+        self.save()
+        stats = self.stats
+        total = stats["hits"] + stats["revalidated"] + stats["misses"]
+        rate = (stats["hits"] + stats["revalidated"]) / total if total else 0
+        print(
+            f"HTTP cache: {stats['hits']} hits, {stats['revalidated']} revalidated, "
+            f"{stats['misses']} misses, {stats['evicted']} evicted "
+            f"({rate:.0%} served from cache, {self.size / 1024**2:.1f} MB on disk)"
+        )
+
+
+class CachedSession(requests.Session):
+    """A requests.Session that answers GET requests from an HttpCache."""
+
+    def __init__(self, cache):
+        super().__init__()
+        self.cache = cache
+
+    def send(self, request, **kwargs):
+        if request.method != "GET":
+            return super().send(request, **kwargs)
+
+        url = request.url
+        cached = self.cache.lookup(url)
+
+        if cached is not None:
+            entry, body, fresh = cached
+            if fresh:
+                self.cache.count("hits")
+                return _response(request, entry, body)
+
+            request = request.copy()
+            if entry["etag"]:
+                request.headers["If-None-Match"] = entry["etag"]
+            if entry["last_modified"]:
+                request.headers["If-Modified-Since"] = entry["last_modified"]
+
+            response = super().send(request, **kwargs)
+            if response.status_code == 304:
+                self.cache.touch(url)
+                self.cache.count("revalidated")
+                return _response(request, entry, body)
+        else:
+            response = super().send(request, **kwargs)
+
+        self.cache.count("misses")
+        if response.status_code == 200:
+            self.cache.store(url, response.headers, response.content)
+        return response
+
+
+def _response(request, entry, body):
+    response = requests.Response()
+    response.status_code = 200
+    response._content = body
+    response.headers = CaseInsensitiveDict()
+    if entry["content_type"]:
+        response.headers["Content-Type"] = entry["content_type"]
+    if entry["etag"]:
+        response.headers["ETag"] = entry["etag"]
+    if entry["last_modified"]:
+        response.headers["Last-Modified"] = entry["last_modified"]
+    response.url = request.url
+    response.request = request
+    response.encoding = "utf-8"
+    return response
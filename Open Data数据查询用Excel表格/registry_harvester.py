@@ -0,0 +1,236 @@
+"""Incremental harvester for the AWS open-data-registry.
+
+Keeps the last downloaded archive together with its ETag/Last-Modified headers,
+re-fetches it conditionally and only re-parses the YAML files whose content hash
+changed since the previous run. ``source`` may be the GitHub archive URL, a
+``file://`` URL, a local zip file or a local checkout directory.
+"""
+
+import datetime
+import hashlib
+import json
+import os
+import shutil
+import urllib.error
+import urllib.request
+import zipfile
+
+import yaml
+
+from http_cache import CachedSession
+
+# Prefer the libyaml-backed loader when PyYAML was built with it
+Loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+url = "https://github.com/awslabs/open-data-registry/archive/refs/heads/main.zip"
+cache_dir = ".registry_cache"
+
+
+class Harvest:
+    """Result of a harvest run.
+
+    ``datasets`` maps each registry YAML basename to its parsed content,
+    ``changed`` and ``removed`` hold the basenames that differ from the
+    previous run and ``fingerprint`` identifies the registry content as a whole.
+    """
+
+    def __init__(self, source, archive, cache_dir, files, changed, removed):
+        self.source = source
+        self.archive = archive
+        self.cache_dir = cache_dir
+        self.hashes = {name: entry["sha1"] for name, entry in files.items()}
+        self.datasets = {name: entry["dataset"] for name, entry in files.items()}
+        self.changed = changed
+        self.removed = removed
+        self.fingerprint = _sha1(
+            "".join(f"{name}:{self.hashes[name]}\n" for name in sorted(self.hashes)).encode()
+        )
+
+    def copy(self, name, out_dir):
+        """Copy the raw YAML file ``name`` into ``out_dir`` if it is missing or stale."""
+        out_file = os.path.join(out_dir, name)
+        if os.path.exists(out_file):
+            with open(out_file, "rb") as f:
+                if _sha1(f.read()) == self.hashes[name]:
+                    return
+        os.makedirs(out_dir, exist_ok=True)
+        if os.path.isdir(self.source):
+            shutil.copy(os.path.join(self.source, "datasets", name), out_file)
+        else:
+            with zipfile.ZipFile(self.archive) as z:
+                member = next(m for m in z.namelist() if _is_registry_yaml(m) and os.path.basename(m) == name)
+                with open(out_file, "wb") as f:
+                    f.write(z.read(member))
+
+
+def _sha1(data):
+    return hashlib.sha1(data).hexdigest()
+
+
+def _load_state(state_file):
+    if os.path.exists(state_file):
+        with open(state_file, "r") as f:
+            return json.load(f)
+    return {"files": {}}
+
+
+def _save_state(state, state_file):
+    tmp_file = state_file + ".tmp"
+    with open(tmp_file, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp_file, state_file)
+
+
+def _plain(value):
+    """YAML timestamps as ISO strings, so a dataset parsed now and one reloaded
+    from the state file serialize identically."""
+    if isinstance(value, dict):
+        return {key: _plain(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_plain(item) for item in value]
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    return value
+
+
+def _is_registry_yaml(name):
+    parts = name.replace("\\", "/").split("/")
+    return len(parts) >= 2 and parts[-2] == "datasets" and parts[-1].endswith(".yaml")
+
+
+def fetch_archive(source, archive, state, http_cache=None):
+    """Download ``source`` to ``archive`` unless it is unchanged.
+
+    Sends If-None-Match/If-Modified-Since from the previous run and keeps the
+    cached archive on a 304. With ``http_cache`` the request goes through the
+    shared HttpCache instead. Returns True if a new archive was written.
+    """
+    if http_cache is not None and source.startswith(("http://", "https://")):
+        response = CachedSession(http_cache).get(source)
+        response.raise_for_status()
+        digest = _sha1(response.content)
+        if os.path.exists(archive) and digest == state.get("archive_sha1"):
+            print("Registry archive not modified")
+            return False
+        tmp_file = archive + ".tmp"
+        with open(tmp_file, "wb") as f:
+            f.write(response.content)
+        os.replace(tmp_file, archive)
+        state["archive_sha1"] = digest
+        return True
+
+    if os.path.exists(source):
+        source = "file://" + os.path.abspath(source)
+
+    request = urllib.request.Request(source)
+    if os.path.exists(archive):
+        if state.get("etag"):
+            request.add_header("If-None-Match", state["etag"])
+        if state.get("last_modified"):
+            request.add_header("If-Modified-Since", state["last_modified"])
+
+    try:
+        response = urllib.request.urlopen(request)
+    except urllib.error.HTTPError as e:
+        if e.code == 304:
+            print("Registry archive not modified")
+            return False
+        raise
+
+    with response:
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+
+        # file:// URLs ignore conditional headers, so compare them ourselves
+        if os.path.exists(archive) and (etag or last_modified):
+            if (etag, last_modified) == (state.get("etag"), state.get("last_modified")):
+                print("Registry archive not modified")
+                return False
+
+        tmp_file = archive + ".tmp"
+        with open(tmp_file, "wb") as f:
+            shutil.copyfileobj(response, f)
+        os.replace(tmp_file, archive)
+
+    state["etag"] = etag
+    state["last_modified"] = last_modified
+    return True
+
+
+def iter_registry_files(source, archive):
+    """Yield ``(basename, raw bytes)`` for every dataset YAML in the registry."""
+    if os.path.isdir(source):
+        in_dir = os.path.join(source, "datasets")
+        for name in sorted(os.listdir(in_dir)):
+            if name.endswith(".yaml"):
+                with open(os.path.join(in_dir, name), "rb") as f:
+                    yield name, f.read()
+    else:
+        with zipfile.ZipFile(archive) as z:
+            for name in sorted(z.namelist()):
+                if _is_registry_yaml(name):
+                    yield os.path.basename(name), z.read(name)
+
+
+def harvest_registry(source=url, cache_dir=cache_dir, http_cache=None):
+    """Fetch the registry and parse only the YAML files that changed.
+
+    Parsed datasets are kept in ``cache_dir`` so unchanged files are never
+    re-parsed. ``http_cache`` is an optional shared HttpCache for the download.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    state_file = os.path.join(cache_dir, "state.json")
+    archive = os.path.join(cache_dir, "open-data-registry-main.zip")
+    state = _load_state(state_file)
+    files = state["files"]
+
+    if not os.path.isdir(source):
+        if not fetch_archive(source, archive, state, http_cache) and files:
+            return Harvest(source, archive, cache_dir, files, set(), set())
+
+    changed = set()
+    seen = set()
+
+    for name, data in iter_registry_files(source, archive):
+        seen.add(name)
+        digest = _sha1(data)
+        if name in files and files[name]["sha1"] == digest:
+            continue
+
+        files[name] = {"sha1": digest, "dataset": _plain(yaml.load(data, Loader=Loader))}
+        changed.add(name)
+
+    removed = set(files) - seen
+    for name in removed:
+        del files[name]
+
+    print(f"Registry files: {len(files)}, changed: {len(changed)}, removed: {len(removed)}")
+
+    _save_state(state, state_file)
+
+    return Harvest(source, archive, cache_dir, files, changed, removed)
+
+
+def _load_stamps(harvest):
+    stamps_file = os.path.join(harvest.cache_dir, "outputs.json")
+    if os.path.exists(stamps_file):
+        with open(stamps_file, "r") as f:
+            return json.load(f)
+    return {}
+
+
+def outputs_current(harvest, *outputs):
+    """True if every output exists and was built from the current registry content."""
+    stamps = _load_stamps(harvest)
+    return all(
+        os.path.exists(output) and stamps.get(os.path.abspath(output)) == harvest.fingerprint
+        for output in outputs
+    )
+
+
+def mark_outputs(harvest, *outputs):
+    """Record that ``outputs`` were built from the current registry content."""
+    stamps = _load_stamps(harvest)
+    for output in outputs:
+        stamps[os.path.abspath(output)] = harvest.fingerprint
+    _save_state(stamps, os.path.join(harvest.cache_dir, "outputs.json"))
@@ -0,0 +1,282 @@
+"""Concurrent crawler for static and API STAC catalogs.
+
+Replaces walking ``Client.open(child).get_all_collections()`` one catalog at a
+time. Child catalogs are crawled concurrently and, inside each catalog, child
+links are fetched a whole level at a time on a bounded thread pool. Requests
+to any one host are capped by a semaphore, failed requests are retried with
+exponential backoff and results always come back in link order, so output
+files are identical between runs regardless of scheduling.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin, urlparse
+
+import requests
+
+from http_cache import CachedSession
+
+# One child catalog of the root: its collections in link order, or the error
+# that stopped the crawl of that catalog.
+CatalogResult = namedtuple("CatalogResult", ["url", "title", "collections", "error"])
+
+retry_statuses = {429, 500, 502, 503, 504}
+
+
+class StacCrawler:
+    def __init__(
+        self,
+        max_workers=16,
+        catalog_workers=4,
+        per_host=8,
+        retries=3,
+        backoff=0.5,
+        timeout=60,
+        headers=None,
+        cache=None,
+    ):
+        self.max_workers = max_workers
+        self.catalog_workers = catalog_workers
+        self.per_host = per_host
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.headers = headers or {}
+        self.cache = cache
+        self._local = threading.local()
+        self._hosts = {}
+        self._hosts_lock = threading.Lock()
+        self._pool = None
+
+    def _session(self):
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = CachedSession(self.cache) if self.cache else requests.Session()
+            session.headers.update(self.headers)
+            self._local.session = session
+        return session
+
+    def _host_slot(self, url):
+        host = urlparse(url).netloc
+        with self._hosts_lock:
+            if host not in self._hosts:
+                self._hosts[host] = threading.BoundedSemaphore(self.per_host)
+            return self._hosts[host]
+
+    def request(self, url):
+        """GET ``url`` under the per-host limit, returning the response."""
+        with self._host_slot(url):
+            return self._session().get(url, timeout=self.timeout)
+
+    def fetch(self, url):
+        """GET ``url`` as JSON, retrying transient failures with backoff."""
+        for attempt in range(self.retries + 1):
+            try:
+                response = self.request(url)
+                if response.status_code in retry_statuses and attempt < self.retries:
+                    delay = response.headers.get("Retry-After")
+                    time.sleep(
+                        float(delay) if delay and delay.isdigit() else self.backoff * 2**attempt
+                    )
+                    continue
+                response.raise_for_status()
+                return _absolute_links(response.json(), url)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.retries:
+                    raise
+                time.sleep(self.backoff * 2**attempt)
+
+    def fetch_all(self, urls):
+        """Fetch ``urls`` concurrently; results (or exceptions) in input order."""
+
+        def fetch(url):
+            try:
+                return self.fetch(url)
+            except Exception as e:
+                return e
+
+        return list(self._pool.map(fetch, urls))
+
+    def iter_collections(self, catalog):
+        """Yield every collection below ``catalog`` in link order.
+
+        Uses the paginated collections endpoint (``rel=data``) when the catalog
+        advertises one, otherwise walks child links level by level.
+        """
+        data = _links(catalog, "data")
+        if data:
+            page_url = data[0]
+            while page_url:
+                page = self.fetch(page_url)
+                for collection in page.get("collections", []):
+                    yield _absolute_links(collection, page_url, add_self=False)
+                next_links = _links(page, "next")
+                page_url = next_links[0] if next_links else None
+            return
+
+        level = [catalog]
+        while level:
+            urls = [url for node in level for url in _links(node, "child")]
+            next_level = []
+            for url, child in zip(urls, self.fetch_all(urls)):
+                if isinstance(child, Exception):
+                    raise child
+                if child.get("type") == "Collection":
+                    yield child
+                else:
+                    next_level.append(child)
+            level = next_level
+
+    def crawl_catalog(self, url):
+        try:
+            catalog = self.fetch(url)
+            collections = list(self.iter_collections(catalog))
+            return CatalogResult(url, catalog.get("title") or catalog.get("id", url), collections, None)
+        except Exception as e:
+            return CatalogResult(url, url, [], e)
+
+    def child_catalogs(self, root_url):
+        return _links(self.fetch(root_url), "child")
+
+    def crawl(self, root_url, catalogs=None):
+        """Crawl the child catalogs of ``root_url``, yielding CatalogResults in link order.
+
+        ``catalogs`` restricts the crawl to the given child catalog URLs.
+        """
+        with ThreadPoolExecutor(self.max_workers) as pool:
+            self._pool = pool
+            try:
+                if catalogs is None:
+                    catalogs = self.child_catalogs(root_url)
+                with ThreadPoolExecutor(self.catalog_workers) as catalog_pool:
+                    yield from catalog_pool.map(self.crawl_catalog, catalogs)
+            finally:
+                self._pool = None
+
+
+def _links(obj, rel):
+    return [link["href"] for link in obj.get("links", []) if link.get("rel") == rel]
+
+
+def _absolute_links(obj, url, add_self=True):
+    """Resolve relative link hrefs against ``url`` and make sure a self link exists."""
+    links = obj.get("links", [])
+    for link in links:
+        if "href" in link:
+            link["href"] = urljoin(url, link["href"])
+    if add_self and obj.get("type") in ("Catalog", "Collection"):
+        if not any(link.get("rel") == "self" for link in links):
+            links.append({"rel": "self", "href": url, "type": "application/json"})
+            obj["links"] = links
+    return obj
+
+
+def collection_file(out_dir, collection_id):
+    """Path of the JSON file a harvester writes for ``collection_id``."""
+    return out_dir + "/" + collection_id.replace("/", "_") + ".json"
+
+
+class CrawlCheckpoint:
+    """Persistent record of which child catalogs a harvester has finished.
+
+    A catalog is marked done once its collections have been written to
+    ``out_dir``; a rerun loads those from disk and only crawls the catalogs
+    that are still pending or failed, plus any done catalog whose collection
+    files are missing. ``retry_failed`` asserts that only failed catalogs are
+    left and refuses to run while any catalog is still pending, so a retry
+    never writes out a partial catalog list. The checkpoint file is removed
+    once every catalog is done.
+    """
+
+    def __init__(self, path, out_dir):
+        self.path = path
+        self.out_dir = out_dir
+        self.state = {"catalogs": None, "status": {}}
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                self.state = json.load(f)
+            status = self.state["status"].values()
+            done = sum(entry["status"] == "done" for entry in status)
+            failed = sum(entry["status"] == "failed" for entry in status)
+            print(f"Resuming from {path}: {done} catalogs done, {failed} failed")
+
+    def _save(self):
+        tmp_file = self.path + ".tmp"
+        with open(tmp_file, "w") as f:
+            json.dump(self.state, f, indent=4)
+        os.replace(tmp_file, self.path)
+
+    def _load_done(self, url):
+        entry = self.state["status"][url]
+        collections = []
+        for collection_id in entry["ids"]:
+            with open(collection_file(self.out_dir, collection_id), "r") as f:
+                collections.append(json.load(f))
+        return CatalogResult(url, entry["title"], collections, None)
+
+    def crawl(self, crawler, root_url, retry_failed=False):
+        """Yield a CatalogResult per child catalog in link order, resuming where possible."""
+        if self.state["catalogs"] is None:
+            self.state["catalogs"] = crawler.child_catalogs(root_url)
+            self._save()
+
+        catalogs = self.state["catalogs"]
+        # A done catalog whose collection files have gone missing is crawled again
+        for url in catalogs:
+            entry = self.state["status"].get(url, {})
+            if entry.get("status") == "done" and not all(
+                os.path.exists(collection_file(self.out_dir, collection_id)) for collection_id in entry["ids"]
+            ):
+                print(f"Missing checkpointed collections for {url}, crawling it again")
+                del self.state["status"][url]
+        status = {url: self.state["status"].get(url, {}).get("status") for url in catalogs}
+
+        pending = [url for url in catalogs if status[url] is None]
+        if retry_failed and pending:
+            raise ValueError(
+                f"{len(pending)} catalogs were never crawled; rerun without --retry-failed to resume them"
+            )
+        todo = [url for url in catalogs if status[url] != "done"]
+
+        results = crawler.crawl(root_url, catalogs=todo)
+        for url in catalogs:
+            if url in todo:
+                yield next(results)
+                continue
+            try:
+                yield self._load_done(url)
+            except OSError as e:
+                # Back to pending so finish() keeps the checkpoint and a rerun crawls it
+                print(f"Missing checkpointed collections for {url}: {e}")
+                del self.state["status"][url]
+                self._save()
+
+    def record(self, result, error=None):
+        """Mark ``result`` done, or failed if it (or writing it out) raised."""
+        error = error or result.error
+        if error is None:
+            self.state["status"][result.url] = {
+                "status": "done",
+                "title": result.title,
+                "ids": [collection["id"] for collection in result.collections],
+            }
+        else:
+            self.state["status"][result.url] = {"status": "failed", "error": str(error)}
+        self._save()
+
+    def finish(self):
+        """Remove the checkpoint if every catalog is done; report failures otherwise."""
+        status = self.state["status"]
+        remaining = [
+            url
+            for url in self.state["catalogs"] or []
+            if status.get(url, {}).get("status") != "done"
+        ]
+        if remaining:
+            print(f"{len(remaining)} catalogs not done, rerun to resume or pass --retry-failed")
+        elif os.path.exists(self.path):
+            os.remove(self.path)
@@ -0,0 +1,14 @@
+"""
+pytest配置：notebook旁的项目模块与 Open Data数据查询用Excel表格/ 下的目录脚本
+都不是包，测试直接按模块名导入它们
+"""
+
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+CATALOG_DIR = os.path.join(ROOT, 'Open Data数据查询用Excel表格')
+
+for path in (ROOT, CATALOG_DIR):
+    if path not in sys.path:
+        sys.path.insert(0, path)
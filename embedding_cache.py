@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+SAM图像嵌入的磁盘缓存
+notebook 10 中 sam.set_image(image) 每次都要跑一遍ViT-H图像编码器，重启内核或
+重新运行同一幅 satellite.tif 时又要重新编码，而之后用不同点提示调用 predict
+只需要轻量的掩膜解码器。本模块把编码结果（image embedding）写入磁盘：
+
+    import embedding_cache
+    embedding_cache.install(sam)   # sam = SamGeo(..., automatic=False)
+    sam.set_image(image)           # 见过的影像/瓦片直接从磁盘载入嵌入
+
+缓存键为送入编码器的影像内容哈希 + 模型类型 + 权重文件（文件名与大小），
+换模型或换权重不会误用旧嵌入。每个嵌入一个 .npy 文件（vit_h约4 MB），
+按容量上限淘汰最近最少使用的嵌入（以文件修改时间记录访问），缓存总大小在
+内存中维护，未超出上限时写入不遍历缓存目录。
+
+命令行: python embedding_cache.py [缓存目录] [--max-mb 2048]  查看/清理缓存
+"""
+
+import hashlib
+import os
+import threading
+
+import numpy as np
+
+# 嵌入缓存目录与默认容量上限
+CACHE_DIR = 'embedding_cache'
+MAX_BYTES = 2 * 1024**3
+
+
+def model_key(model_type, checkpoint=None):
+    """模型标识：模型类型 + 权重文件名与大小（权重文件数GB，不做全文哈希）"""
+    key = str(model_type)
+    if checkpoint:
+        key += f":{os.path.basename(checkpoint)}"
+        if os.path.exists(checkpoint):
+            key += f":{os.path.getsize(checkpoint)}"
+    return key
+
+
+def image_key(model, image, original_size):
+    """
+    嵌入的缓存键
+
+    Args:
+        model (str): model_key() 返回的模型标识
+        image (numpy.ndarray): 送入编码器的（已缩放的）影像
+        original_size (tuple): 原始影像的 (高, 宽)
+    """
+    image = np.ascontiguousarray(image)
+    digest = hashlib.sha1()
+    digest.update(f"{model}|{tuple(original_size)}|{image.shape}|{image.dtype}".encode())
+    digest.update(image.data)
+    return digest.hexdigest()
+
+
+class EmbeddingCache:
+    """
+    按内容寻址的图像嵌入缓存
+
+    Args:
+        cache_dir (str): 缓存目录
+        max_bytes (int): 容量上限，写入后超出时按最近访问时间淘汰
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.stats = {'hits': 0, 'encoded': 0, 'evicted': 0}
+        self._lock = threading.Lock()
+        # 缓存总大小：首次需要时遍历一次目录，之后随写入与淘汰增量维护
+        self._size = None
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.npy")
+
+    def get(self, key):
+        """读取嵌入并刷新其访问时间；未缓存返回None"""
+        path = self.path(key)
+        try:
+            features = np.load(path)
+        except (FileNotFoundError, ValueError, EOFError):
+            return None
+        os.utime(path)
+        self.count('hits')
+        return features
+
+    def put(self, key, features):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # 先写临时文件再改名，中断时不会留下残缺的嵌入
+        tmp_file = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_file, 'wb') as f:
+            np.save(f, features)
+        written = os.path.getsize(tmp_file)
+        try:
+            replaced = os.path.getsize(path)
+        except FileNotFoundError:
+            replaced = 0
+        os.replace(tmp_file, path)
+        with self._lock:
+            self.stats['encoded'] += 1
+            if self._size is not None:
+                self._size += written - replaced
+        self.evict()
+
+    def count(self, stat):
+        with self._lock:
+            self.stats[stat] += 1
+
+    def _files(self):
+        for root, _, names in os.walk(self.cache_dir):
+            for name in names:
+                path = os.path.join(root, name)
+                if name.endswith('.tmp'):
+                    os.remove(path)  # 上次中断遗留
+                    continue
+                stat = os.stat(path)
+                yield stat.st_mtime, stat.st_size, path
+
+    def size(self):
+        with self._lock:
+            if self._size is None:
+                self._size = sum(size for _, size, _ in self._files())
+            return self._size
+
+    def evict(self):
+        """超出容量上限时删除最近最少使用的嵌入；未超出时不遍历目录"""
+        if self.size() <= self.max_bytes:
+            return self._size
+        files = sorted(self._files())
+        total = sum(size for _, size, _ in files)
+        for _, size, path in files:
+            if total <= self.max_bytes:
+                break
+            os.remove(path)
+            total -= size
+            self.count('evicted')
+        with self._lock:
+            self._size = total
+        return total
+
+    def report(self):
+        stats = self.stats
+        total = stats['hits'] + stats['encoded']
+        rate = stats['hits'] / total if total else 0
+        print(f"嵌入: 缓存命中 {stats['hits']}, 重新编码 {stats['encoded']} ({rate:.0%} 来自缓存), "
+              f"淘汰 {stats['evicted']}, 占用 {self.size() / 1024**2:.1f} MB")
+
+
+def install(sam, cache=None):
+    """
+    让SamGeo实例的set_image先查嵌入缓存，未命中才运行图像编码器
+
+    替换的是其SamPredictor的set_torch_image：影像读取、颜色转换和缩放仍由
+    samgeo/segment_anything完成，只跳过编码器本身，predict等行为不变。
+    automatic=True时缓存作用于自动掩膜生成器内部的predictor（逐个裁剪块）。
+
+    Args:
+        sam (samgeo.SamGeo): SamGeo实例
+        cache (EmbeddingCache): 使用的缓存，默认 embedding_cache/
+
+    Returns:
+        EmbeddingCache: 已安装的缓存
+    """
+    import torch
+
+    if cache is None:
+        cache = EmbeddingCache()
+
+    predictor = getattr(sam, 'predictor', None)
+    if predictor is None:
+        predictor = sam.mask_generator.predictor
+    model = model_key(getattr(sam, 'model_type', 'vit_h'), getattr(sam, 'checkpoint', None))
+    encode = predictor.set_torch_image
+
+    def set_torch_image(transformed_image, original_image_size):
+        key = image_key(model, transformed_image.cpu().numpy(), original_image_size)
+        features = cache.get(key)
+        if features is None:
+            encode(transformed_image, original_image_size)
+            # SAM-HQ等变体的编码结果不止一个张量，这类模型不缓存
+            if isinstance(predictor.features, torch.Tensor):
+                cache.put(key, predictor.features.detach().cpu().numpy())
+            return
+
+        predictor.reset_image()
+        predictor.original_size = tuple(original_image_size)
+        predictor.input_size = tuple(transformed_image.shape[-2:])
+        predictor.features = torch.from_numpy(features).to(predictor.device)
+        predictor.is_image_set = True
+
+    predictor.set_torch_image = set_torch_image
+    sam.embedding_cache = cache
+    return cache
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="查看或按容量清理SAM嵌入缓存")
+    parser.add_argument("cache_dir", nargs="?", default=CACHE_DIR, help="缓存目录")
+    parser.add_argument("--max-mb", type=float, default=None, help="清理到该容量（MB）以下")
+    args = parser.parse_args()
+
+    cache = EmbeddingCache(args.cache_dir)
+    if args.max_mb is not None:
+        cache.max_bytes = int(args.max_mb * 1024**2)
+        cache.evict()
+    cache.report()
@@ -6,10 +6,23 @@
 
 import json
 import base64
+import hashlib
 import os
+import shutil
+import threading
 from pathlib import Path
 import re
 
+# 支持提取的图像类型及对应扩展名
+IMAGE_MIME_TYPES = {
+    'image/png': 'png',
+    'image/jpeg': 'jpg',
+}
+
+# 增量提取使用的清单文件和内容寻址存储目录（位于输出目录下）
+MANIFEST_FILE = '.manifest.json'
+OBJECTS_DIR = '.objects'
+
 def extract_images_from_notebook(notebook_path, output_dir="images"):
     """
     从Jupyter notebook中提取所有图像
@@ -49,39 +62,104 @@ def extract_images_from_notebook(notebook_path, output_dir="images"):
                     if 'data' in output:
                         data = output['data']
                         
-                        # 处理PNG图像
-                        if 'image/png' in data:
-                            image_count += 1
-                            image_data = data['image/png']
-                            
-                            # 解码base64图像数据
-                            image_bytes = base64.b64decode(image_data)
-                            
-                            # 生成文件名
-                            filename = f"{notebook_name}_cell_{cell_idx}_output_{output_idx}_{image_count}.png"
-                            filepath = nb_output_dir / filename
-                            
-                            # 保存图像
-                            with open(filepath, 'wb') as img_file:
-                                img_file.write(image_bytes)
-                            
-                            extracted_images.append(str(filepath))
-                            print(f"提取图像: {filepath}")
-                        
-                        # 处理JPEG图像
-                        if 'image/jpeg' in data:
-                            image_count += 1
-                            image_data = data['image/jpeg']
-                            
-                            image_bytes = base64.b64decode(image_data)
-                            filename = f"{notebook_name}_cell_{cell_idx}_output_{output_idx}_{image_count}.jpg"
-                            filepath = nb_output_dir / filename
-                            
-                            with open(filepath, 'wb') as img_file:
-                                img_file.write(image_bytes)
-                            
-                            extracted_images.append(str(filepath))
-                            print(f"提取图像: {filepath}")
+                        # 依次处理PNG和JPEG图像
+                        for mime_type in IMAGE_MIME_TYPES:
+                            if mime_type in data:
+                                image_count += 1
+                                filepath = save_image(
+                                    data[mime_type], mime_type, nb_output_dir,
+                                    notebook_name, cell_idx, output_idx, image_count
+                                )
+                                extracted_images.append(str(filepath))
+        
+        print(f"从 {notebook_path} 中提取了 {len(extracted_images)} 个图像")
+        return extracted_images
+        
+    except Exception as e:
+        print(f"处理 {notebook_path} 时出错: {e}")
+        return []
+
+def iter_notebook_images(notebook_path):
+    """
+    增量解析notebook，逐个产出其中的图像输出
+    
+    使用ijson按事件流解析，每次只在内存中保留当前这一个图像的base64数据。
+    
+    Args:
+        notebook_path (str): notebook文件路径
+    
+    Yields:
+        tuple: (cell_idx, output_idx, image_count, mime_type, image_data)
+    """
+    
+    import ijson
+    
+    # ijson事件前缀：cells.item.outputs.item.data.<mime>
+    output_prefix = 'cells.item.outputs.item'
+    mime_prefixes = {f'{output_prefix}.data.{mime}': mime for mime in IMAGE_MIME_TYPES}
+    
+    with open(notebook_path, 'rb') as f:
+        image_count = 0
+        cell_idx = -1
+        output_idx = -1
+        cell_type = None
+        pending_lines = None
+        
+        for prefix, event, value in ijson.parse(f):
+            if prefix == 'cells.item' and event == 'start_map':
+                cell_idx += 1
+                output_idx = -1
+                cell_type = None
+            elif prefix == 'cells.item.cell_type':
+                cell_type = value
+            elif prefix == output_prefix and event == 'start_map':
+                output_idx += 1
+            elif cell_type in (None, 'code'):
+                if prefix in mime_prefixes:
+                    # 旧版notebook可能把base64数据存成字符串列表
+                    if event == 'start_array':
+                        pending_lines = []
+                        continue
+                    if event == 'end_array':
+                        value = ''.join(pending_lines)
+                        pending_lines = None
+                    elif event != 'string':
+                        continue
+                    
+                    image_count += 1
+                    yield cell_idx, output_idx, image_count, mime_prefixes[prefix], value
+                elif pending_lines is not None and event == 'string':
+                    pending_lines.append(value)
+
+def extract_images_streaming(notebook_path, output_dir="images"):
+    """
+    以流式方式从Jupyter notebook中提取所有图像
+    
+    使用ijson增量解析notebook，每遇到一个image/png或image/jpeg输出就立即解码并写盘，
+    内存占用只与单个图像大小有关，与notebook整体大小无关。
+    文件命名规则与extract_images_from_notebook保持一致。
+    
+    Args:
+        notebook_path (str): notebook文件路径
+        output_dir (str): 输出目录
+    
+    Returns:
+        list: 提取的图像文件列表
+    """
+    
+    notebook_name = Path(notebook_path).stem
+    nb_output_dir = Path(output_dir) / notebook_name
+    nb_output_dir.mkdir(parents=True, exist_ok=True)
+    
+    extracted_images = []
+    
+    try:
+        for cell_idx, output_idx, image_count, mime_type, image_data in iter_notebook_images(notebook_path):
+            filepath = save_image(
+                image_data, mime_type, nb_output_dir,
+                notebook_name, cell_idx, output_idx, image_count
+            )
+            extracted_images.append(str(filepath))
         
         print(f"从 {notebook_path} 中提取了 {len(extracted_images)} 个图像")
         return extracted_images
@@ -90,13 +168,190 @@ def extract_images_from_notebook(notebook_path, output_dir="images"):
         print(f"处理 {notebook_path} 时出错: {e}")
         return []
 
-def extract_all_notebooks(notebooks_dir=".", output_dir="images"):
+def extract_images_incremental(notebook_path, output_dir="images", entry=None):
+    """
+    增量提取notebook中的图像
+    
+    根据上次运行记录的清单条目跳过未变化的notebook；对变化的notebook流式重新提取，
+    内容未变的图像文件保持不动，已不存在的输出对应的旧文件会被删除。
+    图像内容按SHA1存放在 <output_dir>/.objects/ 下，各notebook目录中的文件是指向它的硬链接，
+    因此多个notebook中相同的图像只占用一份磁盘空间。
+    
+    Args:
+        notebook_path (str): notebook文件路径
+        output_dir (str): 输出目录
+        entry (dict): 该notebook在清单中的上次记录，首次运行为None
+    
+    Returns:
+        tuple: (提取的图像文件列表, 新的清单条目)
+    """
+    
+    notebook_name = Path(notebook_path).stem
+    nb_output_dir = Path(output_dir) / notebook_name
+    objects_dir = Path(output_dir) / OBJECTS_DIR
+    entry = entry or {}
+    old_images = entry.get('images', {})
+    old_files = entry.get('files', {})
+    
+    stat = os.stat(notebook_path)
+    
+    def recorded_images():
+        return [str(nb_output_dir / filename) for filename in old_images]
+    
+    def unchanged():
+        # 每个图像的大小和mtime都与上次写出时一致（被修改或截断的文件会重新检查）
+        return all(_file_stat(nb_output_dir / filename) == old_files.get(filename) for filename in old_images)
+    
+    # mtime和大小均未变化，直接跳过
+    if entry.get('mtime') == stat.st_mtime and entry.get('size') == stat.st_size and unchanged():
+        print(f"未变化，跳过: {notebook_path}")
+        return recorded_images(), entry
+    
+    # mtime变化但内容未变（例如重新checkout），只更新mtime
+    notebook_hash = file_sha1(notebook_path)
+    if entry.get('sha1') == notebook_hash and unchanged():
+        print(f"内容未变化，跳过: {notebook_path}")
+        return recorded_images(), dict(entry, mtime=stat.st_mtime, size=stat.st_size)
+    
+    nb_output_dir.mkdir(parents=True, exist_ok=True)
+    objects_dir.mkdir(parents=True, exist_ok=True)
+    
+    images = {}
+    files = {}
+    written = 0
+    
+    try:
+        for cell_idx, output_idx, image_count, mime_type, image_data in iter_notebook_images(notebook_path):
+            if isinstance(image_data, list):
+                image_data = ''.join(image_data)
+            image_bytes = base64.b64decode(image_data)
+            image_hash = hashlib.sha1(image_bytes).hexdigest()
+            
+            ext = IMAGE_MIME_TYPES[mime_type]
+            filename = f"{notebook_name}_cell_{cell_idx}_output_{output_idx}_{image_count}.{ext}"
+            filepath = nb_output_dir / filename
+            images[filename] = image_hash
+            
+            # 磁盘上内容相同的已有文件保持不动：按实际文件的大小比较，
+            # 大小和mtime与上次记录不同时再比较SHA1
+            file_stat = _file_stat(filepath)
+            if file_stat is not None and file_stat[0] == len(image_bytes) and (
+                    file_stat == old_files.get(filename) or file_sha1(filepath) == image_hash):
+                files[filename] = file_stat
+                continue
+            
+            # 按内容哈希存储一份，再硬链接到notebook目录；损坏的文件若是对象的
+            # 硬链接，对象也已损坏，一并重写
+            object_path = objects_dir / f"{image_hash}.{ext}"
+            object_stat = _file_stat(object_path)
+            if object_stat is None or object_stat[0] != len(image_bytes) \
+                    or (file_stat is not None and os.path.samefile(filepath, object_path)):
+                _atomic_write(object_path, image_bytes)
+            _atomic_link(object_path, filepath)
+            files[filename] = _file_stat(filepath)
+            
+            written += 1
+            print(f"提取图像: {filepath}")
+    
+    except Exception as e:
+        print(f"处理 {notebook_path} 时出错: {e}")
+        return recorded_images(), entry
+    
+    # 删除输出已不存在的旧图像
+    for filename in set(old_images) - set(images):
+        orphan = nb_output_dir / filename
+        if orphan.exists():
+            orphan.unlink()
+            print(f"删除过期图像: {orphan}")
+    
+    print(f"从 {notebook_path} 中提取了 {len(images)} 个图像，其中 {written} 个有更新")
+    
+    new_entry = {
+        'mtime': stat.st_mtime,
+        'size': stat.st_size,
+        'sha1': notebook_hash,
+        'images': images,
+        'files': files,
+    }
+    return [str(nb_output_dir / filename) for filename in images], new_entry
+
+def _tmp_path(path):
+    """与目标同目录、各进程/线程唯一的临时文件名"""
+    return path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+
+def _atomic_write(path, data):
+    """先写临时文件再改名，中途崩溃不会留下截断的文件，并发写同一路径也互不干扰"""
+    tmp_path = _tmp_path(path)
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+def _atomic_link(object_path, filepath):
+    """把内容对象硬链接（跨文件系统时复制）到目标路径，原子替换已有文件"""
+    tmp_path = _tmp_path(filepath)
+    try:
+        os.link(object_path, tmp_path)
+    except OSError:
+        shutil.copyfile(object_path, tmp_path)
+    os.replace(tmp_path, filepath)
+
+def _file_stat(path):
+    """文件的 [大小, mtime_ns]，不存在时为None（列表形式，便于与清单中的记录比较）"""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return [stat.st_size, stat.st_mtime_ns]
+
+def save_image(image_data, mime_type, nb_output_dir, notebook_name, cell_idx, output_idx, image_count):
+    """
+    解码base64图像数据并写入文件
+    
+    Args:
+        image_data (str | list): base64编码的图像数据
+        mime_type (str): 图像MIME类型
+        nb_output_dir (Path): notebook专用输出目录
+        notebook_name (str): notebook名称
+        cell_idx (int): 单元格序号
+        output_idx (int): 输出序号
+        image_count (int): 图像计数
+    
+    Returns:
+        Path: 保存的图像文件路径
+    """
+    
+    # 旧版notebook可能把base64数据存成字符串列表
+    if isinstance(image_data, list):
+        image_data = ''.join(image_data)
+    
+    # 解码base64图像数据
+    image_bytes = base64.b64decode(image_data)
+    
+    # 生成文件名
+    ext = IMAGE_MIME_TYPES[mime_type]
+    filename = f"{notebook_name}_cell_{cell_idx}_output_{output_idx}_{image_count}.{ext}"
+    filepath = nb_output_dir / filename
+    
+    # 保存图像（先删除旧文件，避免改写增量模式下共享的硬链接）
+    if filepath.exists():
+        filepath.unlink()
+    with open(filepath, 'wb') as img_file:
+        img_file.write(image_bytes)
+    
+    print(f"提取图像: {filepath}")
+    return filepath
+
+def extract_all_notebooks(notebooks_dir=".", output_dir="images", streaming=False, workers=1,
+                          incremental=False):
     """
     提取目录中所有notebook的图像
     
     Args:
         notebooks_dir (str): notebook文件目录
         output_dir (str): 输出目录
+        streaming (bool): 是否使用流式解析（适合大型notebook）
+        workers (int): 并行进程数，1为串行，0或None为CPU核数
+        incremental (bool): 是否根据清单增量提取（隐含流式解析）
     """
     
     notebooks_dir = Path(notebooks_dir)
@@ -111,16 +366,149 @@ def extract_all_notebooks(notebooks_dir=".", output_dir="images"):
     
     print(f"找到 {len(notebook_files)} 个notebook文件")
     
-    for notebook_path in notebook_files:
-        print(f"\n处理: {notebook_path}")
-        extracted = extract_images_from_notebook(notebook_path, output_dir)
-        all_extracted.extend(extracted)
+    if incremental:
+        manifest = load_manifest(output_dir)
+        entries = [manifest.get(Path(p).stem) for p in notebook_files]
+        
+        if workers == 1:
+            results = []
+            for notebook_path, entry in zip(notebook_files, entries):
+                print(f"\n处理: {notebook_path}")
+                results.append(extract_images_incremental(notebook_path, output_dir, entry))
+        else:
+            results = extract_notebooks_parallel(
+                notebook_files, output_dir, extract_images_incremental, workers, entries
+            )
+        
+        # 已删除的notebook，清理其全部图像
+        current = {Path(p).stem for p in notebook_files}
+        for notebook_name in set(manifest) - current:
+            for filename in manifest.pop(notebook_name).get('images', {}):
+                orphan = Path(output_dir) / notebook_name / filename
+                if orphan.exists():
+                    orphan.unlink()
+                    print(f"删除过期图像: {orphan}")
+            try:
+                (Path(output_dir) / notebook_name).rmdir()
+            except OSError:
+                pass
+        
+        for notebook_path, (extracted, entry) in zip(notebook_files, results):
+            manifest[Path(notebook_path).stem] = entry
+            all_extracted.extend(extracted)
+        
+        save_manifest(manifest, output_dir)
+    else:
+        extract = extract_images_streaming if streaming else extract_images_from_notebook
+        
+        if workers == 1:
+            for notebook_path in notebook_files:
+                print(f"\n处理: {notebook_path}")
+                extracted = extract(notebook_path, output_dir)
+                all_extracted.extend(extracted)
+        else:
+            for extracted in extract_notebooks_parallel(notebook_files, output_dir, extract, workers):
+                all_extracted.extend(extracted)
     
     print(f"\n总计提取了 {len(all_extracted)} 个图像")
     
     # 生成图像索引文件
     generate_image_index(all_extracted, output_dir)
 
+def extract_notebooks_parallel(notebook_files, output_dir, extract, workers=None, entries=None):
+    """
+    使用进程池并行提取多个notebook的图像
+    
+    按文件大小从大到小提交任务，避免大型notebook排在最后拖慢整体进度；
+    结果按notebook_files的原始顺序返回，保证生成的索引稳定。
+    
+    Args:
+        notebook_files (list): notebook文件路径列表
+        output_dir (str): 输出目录
+        extract (callable): 单个notebook的提取函数
+        workers (int): 并行进程数，0或None为CPU核数
+        entries (list): 与notebook_files对应的清单条目，增量提取时作为第三个参数传给extract
+    
+    Returns:
+        list: 每个notebook的提取结果
+    """
+    
+    from concurrent.futures import ProcessPoolExecutor
+    
+    # 提前创建输出目录，避免多个进程同时创建
+    Path(output_dir).mkdir(parents=True, exist_ok=True)
+    
+    workers = workers or os.cpu_count()
+    print(f"使用 {workers} 个进程并行处理")
+    
+    jobs = list(enumerate(notebook_files))
+    jobs.sort(key=lambda job: os.path.getsize(job[1]), reverse=True)
+    
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {}
+        for idx, notebook_path in jobs:
+            args = (notebook_path, output_dir)
+            if entries is not None:
+                args += (entries[idx],)
+            futures[idx] = executor.submit(extract, *args)
+        return [futures[idx].result() for idx in range(len(notebook_files))]
+
+def file_sha1(path):
+    """
+    分块计算文件的SHA1
+    
+    Args:
+        path (str): 文件路径
+    
+    Returns:
+        str: 十六进制SHA1值
+    """
+    
+    sha1 = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            sha1.update(chunk)
+    return sha1.hexdigest()
+
+def load_manifest(output_dir):
+    """
+    读取增量提取清单
+    
+    Args:
+        output_dir (str): 输出目录
+    
+    Returns:
+        dict: notebook名称到清单条目的映射
+    """
+    
+    manifest_file = Path(output_dir) / MANIFEST_FILE
+    if not manifest_file.exists():
+        return {}
+    with open(manifest_file, 'r', encoding='utf-8') as f:
+        return json.load(f).get('notebooks', {})
+
+def save_manifest(manifest, output_dir):
+    """
+    写入增量提取清单，并清理不再被引用的内容对象
+    
+    Args:
+        manifest (dict): notebook名称到清单条目的映射
+        output_dir (str): 输出目录
+    """
+    
+    manifest_file = Path(output_dir) / MANIFEST_FILE
+    tmp_file = manifest_file.with_suffix('.tmp')
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump({'version': 1, 'notebooks': manifest}, f, indent=4, ensure_ascii=False)
+    os.replace(tmp_file, manifest_file)
+    
+    objects_dir = Path(output_dir) / OBJECTS_DIR
+    if objects_dir.exists():
+        referenced = {h for entry in manifest.values() for h in entry.get('images', {}).values()}
+        for object_path in objects_dir.iterdir():
+            if object_path.stem not in referenced:
+                object_path.unlink()
+
 def generate_image_index(image_list, output_dir):
     """
     生成图像索引文件
@@ -155,5 +543,18 @@ def generate_image_index(image_list, output_dir):
     print(f"图像索引已生成: {index_file}")
 
 if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="从Jupyter notebook中提取图像")
+    parser.add_argument("notebooks_dir", nargs="?", default=".", help="notebook文件目录")
+    parser.add_argument("-o", "--output-dir", default="images", help="输出目录")
+    parser.add_argument("--streaming", action="store_true", help="使用流式解析（适合大型notebook）")
+    parser.add_argument("-j", "--workers", type=int, default=1, help="并行进程数，0为CPU核数")
+    parser.add_argument("--incremental", action="store_true", help="根据清单增量提取，跳过未变化的内容")
+    args = parser.parse_args()
+    
     # 提取所有notebook的图像
-    extract_all_notebooks()
+    extract_all_notebooks(
+        args.notebooks_dir, args.output_dir, streaming=args.streaming, workers=args.workers,
+        incremental=args.incremental
+    )
@@ -14,6 +14,7 @@ pip install localtileserver
 pip install rasterio
 pip install matplotlib folium
 pip install geopandas pycrs osmnx
+pip install ijson pyarrow
 pip install leafmap
 pip install segment-geospatial
 pip install --find-links=https://girder.github.io/large_image_wheels --no-cache GDAL
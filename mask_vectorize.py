@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+按窗口并行的掩膜栅格矢量化
+samgeo 的 sam.raster_to_vector 单线程一次性矢量化整幅掩膜并写Shapefile，
+城市尺度的合并掩膜（notebook 12 的 masks/merged.tif）上这一步比推理还慢。
+本模块把掩膜切成窗口，在进程池中逐窗口矢量化，再只对接触窗口内部边界的
+多边形做跨窗口融合：
+
+    from mask_vectorize import raster_to_vector
+    raster_to_vector("masks/merged.tif", "masks/merged.parquet", simplify=0.5)
+
+多边形先在全局像素坐标（整数）中生成，相邻窗口的公共边坐标完全一致，
+融合结果精确无缝隙，最后一次性仿射变换到地图坐标。输出格式按扩展名：
+.parquet 为GeoParquet，.fgb 为FlatGeobuf，其他交给GDAL（如 .gpkg/.shp）。
+各阶段耗时（矢量化/融合/简化/写出）随结果返回。
+
+命令行: python mask_vectorize.py 掩膜.tif 输出.parquet [--window 2048] [--workers N] [--simplify 0.5]
+"""
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from segment_pipeline import tile_layout
+
+# 工作进程内打开的掩膜栅格，由_open_source在每个进程中打开一次
+_sources = {}
+
+
+def _open_source(path):
+    import rasterio
+
+    _sources[path] = rasterio.open(path)
+
+
+def _polygons(rings, ring_counts):
+    """GeoJSON多边形环（每个多边形先外环后内环）一次性构造为shapely多边形数组"""
+    import shapely
+
+    lengths = [len(ring) for ring in rings]
+    coords = np.array([point for ring in rings for point in ring], dtype=np.float64)
+    rings = shapely.linearrings(coords, indices=np.repeat(np.arange(len(lengths)), lengths))
+    return shapely.polygons(rings, indices=np.repeat(np.arange(len(ring_counts)), ring_counts))
+
+
+def polygonize_window(path, window, band=1):
+    """
+    矢量化一个窗口内的非零像素（4连通）
+
+    Returns:
+        tuple | None: (WKB数组, 像素值, 是否接触窗口内部边界)，坐标为全局像素坐标；
+            窗口内没有非零像素时返回None
+    """
+    import rasterio.features
+    import shapely
+    from affine import Affine
+
+    if path not in _sources:
+        _open_source(path)
+    src = _sources[path]
+    data = src.read(band, window=window)
+    mask = data != 0
+    if src.nodata is not None:
+        mask &= data != src.nodata
+    if not mask.any():
+        return None
+
+    col_off, row_off = int(window.col_off), int(window.row_off)
+    transform = Affine.translation(col_off, row_off)
+    rings, ring_counts, values = [], [], []
+    for geom, value in rasterio.features.shapes(data, mask=mask, transform=transform):
+        rings += geom['coordinates']
+        ring_counts.append(len(geom['coordinates']))
+        values.append(value)
+    geoms = _polygons(rings, ring_counts)
+
+    # 只有贴着相邻窗口的那条边的多边形才可能被窗口切开
+    minx, miny, maxx, maxy = shapely.bounds(geoms).T
+    right, bottom = col_off + int(window.width), row_off + int(window.height)
+    touching = (
+        ((minx <= col_off) & (col_off > 0))
+        | ((miny <= row_off) & (row_off > 0))
+        | ((maxx >= right) & (right < src.width))
+        | ((maxy >= bottom) & (bottom < src.height))
+    )
+    return shapely.to_wkb(geoms), np.array(values), touching
+
+
+def _components(n, a, b):
+    """边 (a, b) 构成的图的连通分量标签（每个分量取最小节点序号）"""
+    labels = np.arange(n)
+    while True:
+        low = np.minimum(labels[a], labels[b])
+        before = labels.copy()
+        np.minimum.at(labels, a, low)
+        np.minimum.at(labels, b, low)
+        labels = labels[labels]
+        if np.array_equal(labels, before):
+            return labels
+
+
+def dissolve_seams(geoms, values, touching):
+    """
+    融合被窗口边界切开的多边形
+
+    候选只包括接触窗口内部边界的多边形；像素值相同且有公共边（不只是
+    角点相接，与窗口内的4连通一致）的候选属于同一目标。
+
+    Returns:
+        tuple: (几何数组, 像素值数组)
+    """
+    import shapely
+
+    index = np.flatnonzero(touching)
+    candidates = geoms[index]
+    tree = shapely.STRtree(candidates)
+    a, b = tree.query(candidates, predicate='intersects')
+    keep = (a < b) & (values[index][a] == values[index][b])
+    a, b = a[keep], b[keep]
+    shared = shapely.length(shapely.intersection(candidates[a], candidates[b])) > 0
+    a, b = a[shared], b[shared]
+    if len(a) == 0:
+        return geoms, values
+
+    labels = _components(len(index), a, b)
+    order = np.argsort(labels, kind='stable')
+    starts = np.flatnonzero(np.r_[True, labels[order][1:] != labels[order][:-1]])
+    merged = []
+    for group in np.split(order, starts[1:]):
+        merged.append(candidates[group[0]] if len(group) == 1
+                      else shapely.union_all(candidates[group]))
+
+    rest = np.ones(len(geoms), dtype=bool)
+    rest[index] = False
+    firsts = index[order[starts]]
+    return (np.concatenate([geoms[rest], np.array(merged, dtype=object)]),
+            np.concatenate([values[rest], values[firsts]]))
+
+
+def write_vector(gdf, output):
+    """按扩展名写出：.parquet GeoParquet，.fgb FlatGeobuf，其他由GDAL推断"""
+    ext = os.path.splitext(output)[1].lower()
+    if ext in ('.parquet', '.geoparquet'):
+        gdf.to_parquet(output)
+    elif ext == '.fgb':
+        gdf.to_file(output, driver='FlatGeobuf')
+    else:
+        gdf.to_file(output)
+
+
+def raster_to_vector(source, output, band=1, window_size=2048, workers=None, simplify=None,
+                     verbose=True):
+    """
+    并行矢量化掩膜栅格并写出
+
+    Args:
+        source (str): 掩膜GeoTIFF路径（0与nodata为背景）
+        output (str): 输出路径，见 write_vector
+        band (int): 波段号
+        window_size (int): 窗口大小（像素），最好是块大小的整数倍
+        workers (int): 进程数，默认CPU核数；1则在当前进程中运行
+        simplify (float): 简化容差（地图单位），融合之后进行并保持拓扑；None不简化
+        verbose (bool): 打印各阶段耗时
+
+    Returns:
+        dict: 窗口数、多边形数、跨窗口融合的目标数与各阶段耗时（秒）
+    """
+    import geopandas as gpd
+    import rasterio
+    import shapely
+
+    with rasterio.open(source) as src:
+        width, height, crs, transform = src.width, src.height, src.crs, src.transform
+    # 取核心窗口：互不重叠且恰好覆盖整幅栅格
+    windows = [core for _, core in tile_layout(width, height, window_size)]
+    workers = workers or os.cpu_count() or 1
+    timings = {}
+
+    start = time.perf_counter()
+    if workers == 1 or len(windows) == 1:
+        results = [polygonize_window(source, window, band) for window in windows]
+        _sources.pop(source).close()
+    else:
+        with ProcessPoolExecutor(workers, initializer=_open_source, initargs=(source,)) as pool:
+            results = list(pool.map(polygonize_window, [source] * len(windows), windows,
+                                    [band] * len(windows), chunksize=max(1, len(windows) // (4 * workers))))
+    results = [r for r in results if r is not None]
+    if results:
+        geoms = shapely.from_wkb(np.concatenate([r[0] for r in results]))
+        values = np.concatenate([r[1] for r in results])
+        touching = np.concatenate([r[2] for r in results])
+    else:
+        geoms, values, touching = np.array([], dtype=object), np.array([]), np.array([], dtype=bool)
+    timings['polygonize'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    pieces = int(touching.sum())
+    geoms, values = dissolve_seams(geoms, values, touching) if pieces else (geoms, values)
+    # 像素坐标 -> 地图坐标，一次向量化仿射变换
+    a, b, c, d, e, f = transform[:6]
+    geoms = shapely.transform(geoms, lambda xy: np.column_stack([
+        a * xy[:, 0] + b * xy[:, 1] + c, d * xy[:, 0] + e * xy[:, 1] + f]))
+    timings['dissolve'] = time.perf_counter() - start
+
+    if simplify:
+        start = time.perf_counter()
+        geoms = shapely.simplify(geoms, simplify, preserve_topology=True)
+        timings['simplify'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    gdf = gpd.GeoDataFrame({'value': values}, geometry=geoms, crs=crs)
+    out_dir = os.path.dirname(output)
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+    write_vector(gdf, output)
+    timings['write'] = time.perf_counter() - start
+
+    stats = {
+        'windows': len(windows),
+        'polygons': len(gdf),
+        'seam_pieces': pieces,
+        'seconds': timings,
+    }
+    if verbose:
+        steps = "，".join(f"{name} {seconds:.2f} 秒" for name, seconds in timings.items())
+        print(f"{len(windows)} 个窗口，{len(gdf)} 个多边形 -> {output}（{steps}）")
+    return stats
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="按窗口并行矢量化掩膜栅格")
+    parser.add_argument("source", help="掩膜GeoTIFF")
+    parser.add_argument("output", help="输出 .parquet/.fgb/.gpkg 等")
+    parser.add_argument("--band", type=int, default=1, help="波段号")
+    parser.add_argument("--window", type=int, default=2048, help="窗口大小（像素）")
+    parser.add_argument("--workers", type=int, default=None, help="进程数")
+    parser.add_argument("--simplify", type=float, default=None, help="简化容差（地图单位）")
+    args = parser.parse_args()
+
+    raster_to_vector(args.source, args.output, band=args.band, window_size=args.window,
+                     workers=args.workers, simplify=args.simplify)
@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+Maxar Open Data 事件全部影像足迹的并发采集
+notebook 03A 中 leafmap.maxar_all_items 逐个子集合、逐个影像顺序请求静态STAC，
+一个事件要15分钟以上。本模块在有界线程池中并发请求：
+
+    from maxar_harvest import harvest_event
+    harvest_event('Kahramanmaras-turkey-earthquake-23', 'maxar_footprints.parquet')
+
+先并发读取事件的全部子集合（每个采集批次一个），得到影像列表并保存为清单；
+再并发读取影像JSON，收到的影像每满一批就写成一个GeoParquet分片
+（<输出>.parts/ 目录，先写临时文件再改名）。每个子集合读完即更新清单；
+重试后仍失败的子集合或影像记入清单并跳过，采集继续，失败项随结果返回。
+中断或有失败项时保留分片目录，重新运行会跳过已读取的子集合和分片中已有
+的影像，只重试剩下的。全部成功后合并分片写出输出文件并删除分片目录：
+.parquet 为GeoParquet，.fgb 为FlatGeobuf，其他由GDAL推断。输出文件已存在
+且没有未完成的分片目录时直接返回，refresh=True 重新采集。
+
+命令行: python maxar_harvest.py 事件ID 输出.parquet [--workers 32] [--root URL] [--refresh]
+"""
+
+import json
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import urljoin, urlparse
+
+import requests
+
+from mask_vectorize import write_vector
+
+# Maxar Open Data 静态STAC根目录
+ROOT_URL = 'https://maxar-opendata.s3.amazonaws.com/events/'
+
+# 临时错误时重试的HTTP状态码
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+MANIFEST_FILE = 'manifest.json'
+
+
+class Harvester:
+    """
+    有界并发的静态STAC读取器
+
+    Args:
+        workers (int): 并发请求数
+        retries (int): 临时错误的重试次数
+        backoff (float): 首次重试等待秒数，之后指数增长
+        timeout (float): 单次请求超时（秒）
+    """
+
+    def __init__(self, workers=32, retries=3, backoff=0.5, timeout=30):
+        self.workers = workers
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.stats = {'requests': 0, 'retries': 0}
+        self._lock = threading.Lock()
+
+    def get_json(self, url):
+        for attempt in range(self.retries + 1):
+            try:
+                response = self.session.get(url, timeout=self.timeout)
+                with self._lock:
+                    self.stats['requests'] += 1
+                if response.status_code not in RETRY_STATUSES or attempt == self.retries:
+                    response.raise_for_status()
+                    return response.json()
+                delay = response.headers.get('Retry-After')
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.retries:
+                    raise
+                delay = None
+            with self._lock:
+                self.stats['retries'] += 1
+            time.sleep(float(delay) if delay and delay.isdigit() else self.backoff * 2 ** attempt)
+
+    def links(self, url, rel):
+        """STAC文档中某一关系的全部链接（绝对地址）"""
+        document = self.get_json(url)
+        return [urljoin(url, link['href']) for link in document.get('links', []) if link.get('rel') == rel]
+
+    def run(self, function, args, limit=None):
+        """
+        并发执行 function(arg)，按完成顺序产出 (arg, 结果, 异常)
+
+        在途任务数不超过 limit（默认 4 × workers），参数可以是生成器。
+        单个任务失败不会中断其他任务：失败时结果为None，异常为其抛出的异常。
+        """
+        limit = limit or 4 * self.workers
+        args = iter(args)
+        with ThreadPoolExecutor(self.workers) as pool:
+            pending = {}
+            for arg in args:
+                pending[pool.submit(function, arg)] = arg
+                if len(pending) >= limit:
+                    break
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    arg = pending.pop(future)
+                    error = future.exception()
+                    yield arg, (None if error else future.result()), error
+                for arg in args:
+                    pending[pool.submit(function, arg)] = arg
+                    if len(pending) >= limit:
+                        break
+
+
+def _scalar(value):
+    """嵌套的属性值存为JSON文本，保持各分片的列类型一致"""
+    return json.dumps(value) if isinstance(value, (dict, list)) else value
+
+
+def item_row(item, url, child, assets=('visual',)):
+    """
+    STAC影像 -> 足迹表的一行（与 leafmap.maxar_items 的列一致，另含 child 与 href）
+
+    Args:
+        item (dict): 影像JSON
+        url (str): 影像JSON地址，相对的资源地址据此解析
+        child (str): 所属子集合ID
+        assets (list): 保留地址的资源名，None为全部资源
+    """
+    from shapely.geometry import shape
+
+    row = {'id': item['id'], 'child': child, 'href': url}
+    row.update({key: _scalar(value) for key, value in item.get('properties', {}).items()})
+    for name, asset in item.get('assets', {}).items():
+        if assets is None or name in assets:
+            row[name] = urljoin(url, asset['href'])
+    row['geometry'] = shape(item['geometry'])
+    return row
+
+
+def _child_id(url):
+    """子集合ID：<ID>_collection.json 或 <ID>/collection.json"""
+    path = urlparse(url).path
+    name = os.path.basename(path)
+    if name == 'collection.json':
+        return os.path.basename(os.path.dirname(path))
+    return name.replace('_collection.json', '').replace('.json', '')
+
+
+def read_footprints(path):
+    """读取 write_vector 写出的文件"""
+    import geopandas as gpd
+
+    if os.path.splitext(path)[1].lower() in ('.parquet', '.geoparquet'):
+        return gpd.read_parquet(path)
+    return gpd.read_file(path)
+
+
+def _save_manifest(path, manifest):
+    with open(path + '.tmp', 'w') as f:
+        json.dump(manifest, f)
+    os.replace(path + '.tmp', path)
+
+
+def harvest_event(collection_id, output, workers=32, root=ROOT_URL, assets=('visual',),
+                  batch_size=500, refresh=False, verbose=True):
+    """
+    并发采集一个事件全部子集合的影像足迹，可断点续跑
+
+    Args:
+        collection_id (str): 事件ID，如 'Kahramanmaras-turkey-earthquake-23'
+        output (str): 输出路径（.parquet/.fgb/.gpkg等）
+        workers (int): 并发请求数
+        root (str): 静态STAC的事件根目录（测试时可指向本地HTTP服务）
+        assets (list): 保留地址的资源名，None为全部资源
+        batch_size (int): 每个GeoParquet分片的影像数
+        refresh (bool): 忽略已有的输出与分片，重新采集整个事件
+        verbose (bool): 打印进度与吞吐
+
+    Returns:
+        dict: 子集合数、影像数、本次新读取的影像数、失败项（地址 -> 错误）、
+            请求数、耗时与每秒影像数；输出已存在而直接返回时只有 items 与 skipped
+    """
+    import geopandas as gpd
+    import pandas as pd
+
+    start = time.perf_counter()
+    parts_dir = output + '.parts'
+    if refresh:
+        shutil.rmtree(parts_dir, ignore_errors=True)
+    elif os.path.exists(output) and not os.path.exists(parts_dir):
+        if verbose:
+            print(f"{output} 已存在，跳过采集（refresh=True 重新采集）")
+        return {'items': len(read_footprints(output)), 'skipped': True}
+    harvester = Harvester(workers)
+    os.makedirs(parts_dir, exist_ok=True)
+
+    # 清单：子集合地址 -> 影像地址列表（已读取的子集合续跑时不再请求），
+    # 以及上次失败的地址 -> 错误
+    manifest_path = os.path.join(parts_dir, MANIFEST_FILE)
+    manifest = {'children': {}, 'failed': {}}
+    if os.path.exists(manifest_path):
+        with open(manifest_path, 'r') as f:
+            manifest = json.load(f)
+    manifest.setdefault('children', {})
+    failed = manifest['failed'] = {}
+
+    event_url = urljoin(root if root.endswith('/') else root + '/', f"{collection_id}/collection.json")
+    children = harvester.links(event_url, 'child')
+    missing = [url for url in children if url not in manifest['children']]
+    for url, items, error in harvester.run(lambda url: harvester.links(url, 'item'), missing):
+        if error is None:
+            manifest['children'][url] = items
+        else:
+            failed[url] = str(error)
+        _save_manifest(manifest_path, manifest)
+
+    # 已写入分片的影像
+    parts = sorted(name for name in os.listdir(parts_dir) if name.endswith('.parquet'))
+    done = set()
+    for name in parts:
+        done.update(pd.read_parquet(os.path.join(parts_dir, name), columns=['href'])['href'])
+
+    listed = [child for child in children if child in manifest['children']]
+    todo = [(url, _child_id(child)) for child in listed for url in manifest['children'][child]
+            if url not in done]
+    total = sum(len(manifest['children'][child]) for child in listed)
+    if verbose:
+        print(f"{collection_id}: {len(children)} 个子集合，{total} 景影像，"
+              f"已有 {total - len(todo)}，待读取 {len(todo)}")
+
+    def fetch(task):
+        url, child = task
+        return item_row(harvester.get_json(url), url, child, assets)
+
+    rows = []
+    fetched = 0
+    harvest_start = time.perf_counter()
+
+    def flush():
+        part = os.path.join(parts_dir, f"part-{len(parts):05d}.parquet")
+        gdf = gpd.GeoDataFrame(rows, geometry='geometry', crs='EPSG:4326')
+        gdf.to_parquet(part + '.tmp')
+        os.replace(part + '.tmp', part)
+        parts.append(os.path.basename(part))
+        rows.clear()
+
+    for (url, _), row, error in harvester.run(fetch, todo):
+        if error is not None:
+            failed[url] = str(error)
+            continue
+        rows.append(row)
+        fetched += 1
+        if len(rows) >= batch_size:
+            flush()
+            if verbose:
+                rate = fetched / (time.perf_counter() - harvest_start)
+                print(f"\r影像 {total - len(todo) + fetched}/{total}，{rate:.0f} 景/秒", end='')
+    if rows:
+        flush()
+    _save_manifest(manifest_path, manifest)
+
+    frames = [gpd.read_parquet(os.path.join(parts_dir, name)) for name in parts]
+    gdf = pd.concat(frames, ignore_index=True) if frames else gpd.GeoDataFrame(geometry=[], crs='EPSG:4326')
+    write_vector(gdf, output)
+    # 有失败项时保留分片与清单，下次运行只重试失败的部分
+    if not failed:
+        shutil.rmtree(parts_dir)
+
+    elapsed = time.perf_counter() - start
+    stats = {
+        'children': len(children),
+        'items': len(gdf),
+        'fetched': fetched,
+        'failed': dict(failed),
+        'requests': harvester.stats['requests'],
+        'retries': harvester.stats['retries'],
+        'seconds': elapsed,
+        'items_per_second': fetched / (time.perf_counter() - harvest_start) if fetched else 0.0,
+    }
+    if verbose:
+        print(f"\n完成: {stats['items']} 景影像 -> {output}（本次读取 {fetched}，"
+              f"{stats['requests']} 次请求，{elapsed:.1f} 秒，{stats['items_per_second']:.0f} 景/秒）")
+        if failed:
+            print(f"{len(failed)} 个子集合/影像读取失败，重新运行以重试:")
+            for url, error in list(failed.items())[:10]:
+                print(f"  {url}: {error}")
+    return stats
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="并发采集Maxar事件的全部影像足迹")
+    parser.add_argument("collection_id", help="事件ID")
+    parser.add_argument("output", help="输出 .parquet/.fgb/.gpkg 等")
+    parser.add_argument("--workers", type=int, default=32, help="并发请求数")
+    parser.add_argument("--root", default=ROOT_URL, help="静态STAC事件根目录")
+    parser.add_argument("--all-assets", action="store_true", help="保留全部资源地址")
+    parser.add_argument("--refresh", action="store_true", help="忽略已有输出，重新采集")
+    args = parser.parse_args()
+
+    harvest_event(args.collection_id, args.output, workers=args.workers, root=args.root,
+                  assets=None if args.all_assets else ('visual',), refresh=args.refresh)
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Maxar Open Data 事件影像足迹的本地索引
+notebook 06 中每次 leafmap.maxar_search 都重新下载整个事件的足迹GeoJSON
+（maxar_collection_url）再逐行过滤。本模块把足迹按采集时间排序存为本地
+GeoParquet，载入后建立STRtree空间索引和采集时间的有序索引，前后时相的AOI
+查询只是两次索引查找：
+
+    from maxar_index import maxar_search
+    pre = maxar_search(collection, bbox=bbox, end_date='2023-02-06')
+    post = maxar_search(collection, bbox=bbox, start_date='2023-02-06')
+
+超过 max_age 的本地足迹会用条件请求（If-None-Match/If-Modified-Since）检查
+远端，未变化时不下载；有变化时以远端为准重建本地存储，并报告新增/删除的影像数。
+
+命令行: python maxar_index.py 事件ID [--refresh]   更新并打印本地足迹统计
+"""
+
+import io
+import json
+import os
+import time
+
+import numpy as np
+import requests
+
+# 本地足迹缓存目录
+CACHE_DIR = 'maxar_cache'
+
+# 与 leafmap.maxar_collection_url(collection, dtype='geojson') 相同的数据源
+COLLECTION_URL = 'https://raw.githubusercontent.com/giswqs/maxar-open-data/master/datasets/{}.geojson'
+
+# 唯一标识一景影像的列
+KEY_COLUMNS = ['catalog_id', 'quadkey']
+
+
+def _utc(value):
+    """日期字符串/时间戳 -> UTC时间戳（无时区的按UTC处理）"""
+    import pandas as pd
+
+    value = pd.Timestamp(value)
+    return value.tz_localize('UTC') if value.tzinfo is None else value.tz_convert('UTC')
+
+
+class FootprintStore:
+    """
+    一个事件的本地足迹存储与索引
+
+    Args:
+        collection (str): 事件ID，如 'Kahramanmaras-turkey-earthquake-23'
+        cache_dir (str): 缓存目录，每个事件一个 .parquet 与一个 .json 元数据
+        url (str): 足迹GeoJSON地址，默认 COLLECTION_URL
+    """
+
+    def __init__(self, collection, cache_dir=CACHE_DIR, url=None):
+        self.collection = collection
+        self.url = url or COLLECTION_URL.format(collection)
+        self.path = os.path.join(cache_dir, f"{collection}.parquet")
+        self.meta_path = os.path.join(cache_dir, f"{collection}.json")
+        self.meta = {}
+        self.gdf = None
+        if os.path.exists(self.meta_path) and os.path.exists(self.path):
+            with open(self.meta_path, 'r') as f:
+                self.meta = json.load(f)
+            self._load()
+
+    def _load(self):
+        import geopandas as gpd
+
+        self._index(gpd.read_parquet(self.path))
+
+    def _index(self, gdf):
+        """按采集时间排序并建立空间与时间索引"""
+        import shapely
+
+        # .values 为UTC的datetime64，可直接二分查找
+        gdf = gdf.iloc[np.argsort(gdf['datetime'].values, kind='stable')].reset_index(drop=True)
+        self.gdf = gdf
+        self.times = gdf['datetime'].values
+        self.tree = shapely.STRtree(gdf.geometry.values)
+
+    def age(self):
+        """距上次检查远端的秒数；本地没有足迹时为无穷大"""
+        if self.gdf is None:
+            return float('inf')
+        return time.time() - self.meta.get('checked', 0)
+
+    def refresh(self, timeout=60):
+        """
+        条件请求远端足迹，有变化时更新本地存储与索引
+
+        Returns:
+            dict: 新增与删除的影像数；远端未变化时均为0
+        """
+        import geopandas as gpd
+        import pandas as pd
+
+        headers = {}
+        if self.gdf is not None:
+            if self.meta.get('etag'):
+                headers['If-None-Match'] = self.meta['etag']
+            if self.meta.get('last_modified'):
+                headers['If-Modified-Since'] = self.meta['last_modified']
+        response = requests.get(self.url, headers=headers, timeout=timeout)
+        changes = {'added': 0, 'removed': 0}
+        if response.status_code != 304:
+            response.raise_for_status()
+            remote = gpd.read_file(io.BytesIO(response.content))
+            remote['datetime'] = pd.to_datetime(remote['datetime'], utc=True)
+            if self.gdf is None:
+                changes['added'] = len(remote)
+            else:
+                changes = self._diff(remote)
+            # 同一景影像的属性也可能更新，内容以远端为准
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            self._index(remote)
+            self.gdf.to_parquet(self.path + '.tmp')
+            os.replace(self.path + '.tmp', self.path)
+            self.meta['etag'] = response.headers.get('ETag')
+            self.meta['last_modified'] = response.headers.get('Last-Modified')
+
+        self.meta['checked'] = time.time()
+        self.meta['count'] = len(self.gdf)
+        with open(self.meta_path, 'w') as f:
+            json.dump(self.meta, f)
+        return changes
+
+    def _diff(self, remote):
+        """远端相对本地新增与删除的影像数"""
+        import pandas as pd
+
+        keys = [column for column in KEY_COLUMNS if column in remote.columns]
+        local_keys = pd.MultiIndex.from_frame(self.gdf[keys].astype(str))
+        remote_keys = pd.MultiIndex.from_frame(remote[keys].astype(str))
+        return {
+            'added': int((~remote_keys.isin(local_keys)).sum()),
+            'removed': int((~local_keys.isin(remote_keys)).sum()),
+        }
+
+    def search(self, bbox=None, start_date=None, end_date=None, within=False):
+        """
+        按范围与采集时间查询影像足迹，语义与 leafmap.maxar_search 一致
+
+        Args:
+            bbox (list): [西, 南, 东, 北]，None不限范围
+            start_date (str): 起始日期（含）
+            end_date (str): 结束日期（含，日期本身按当天0时）
+            within (bool): True只返回完全在bbox内的足迹，否则返回相交的
+
+        Returns:
+            GeoDataFrame: 符合条件的足迹，按采集时间排序
+        """
+        import shapely
+
+        lo, hi = 0, len(self.times)
+        if start_date is not None:
+            lo = np.searchsorted(self.times, _utc(start_date).to_datetime64(), side='left')
+        if end_date is not None:
+            hi = np.searchsorted(self.times, _utc(end_date).to_datetime64(), side='right')
+        if bbox is None:
+            return self.gdf.iloc[lo:hi]
+
+        predicate = 'contains' if within else 'intersects'
+        hits = np.sort(self.tree.query(shapely.box(*bbox), predicate=predicate))
+        hits = hits[(hits >= lo) & (hits < hi)]
+        return self.gdf.iloc[hits]
+
+
+# 进程内已载入的足迹存储，重复查询不再读盘
+_stores = {}
+
+
+def load_store(collection, cache_dir=CACHE_DIR, max_age=86400, refresh=False):
+    """
+    取得事件的足迹存储：首次使用时下载，超过 max_age 秒（或 refresh=True）时增量更新
+    """
+    key = (collection, os.path.abspath(cache_dir))
+    store = _stores.get(key)
+    if store is None:
+        store = _stores[key] = FootprintStore(collection, cache_dir)
+    if refresh or store.age() > max_age:
+        store.refresh()
+    return store
+
+
+def maxar_footprints(collection, cache_dir=CACHE_DIR, max_age=86400, refresh=False):
+    """事件的全部影像足迹（按采集时间排序）"""
+    return load_store(collection, cache_dir, max_age, refresh).gdf
+
+
+def maxar_search(collection, start_date=None, end_date=None, bbox=None, within=False,
+                 cache_dir=CACHE_DIR, max_age=86400, refresh=False):
+    """
+    leafmap.maxar_search 的索引版本
+
+    Args:
+        collection (str): 事件ID
+        start_date, end_date, bbox, within: 见 FootprintStore.search
+        cache_dir (str): 本地足迹缓存目录
+        max_age (float): 本地足迹超过该秒数时检查远端更新
+        refresh (bool): 立即检查远端更新
+
+    Returns:
+        GeoDataFrame: 符合条件的足迹
+    """
+    store = load_store(collection, cache_dir, max_age, refresh)
+    return store.search(bbox=bbox, start_date=start_date, end_date=end_date, within=within)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="更新Maxar事件的本地足迹索引")
+    parser.add_argument("collection", help="事件ID")
+    parser.add_argument("--cache-dir", default=CACHE_DIR, help="缓存目录")
+    parser.add_argument("--refresh", action="store_true", help="立即检查远端更新")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    store = FootprintStore(args.collection, args.cache_dir)
+    changes = store.refresh() if args.refresh or store.gdf is None else {'added': 0, 'removed': 0}
+    times = store.gdf['datetime']
+    print(f"{args.collection}: {len(store.gdf)} 景影像（新增 {changes['added']}，删除 {changes['removed']}），"
+          f"{times.min():%Y-%m-%d} 至 {times.max():%Y-%m-%d}，{time.perf_counter() - start:.2f} 秒")
@@ -0,0 +1,691 @@
+#!/usr/bin/env python3
+"""
+OSM查询缓存（cache/目录）的紧凑存储与淘汰管理
+leafmap的add_osm_from_*系列函数通过osmnx把Overpass/Nominatim响应以
+<URL的SHA1>.json原样存入cache/，每个节点都是冗长的JSON对象且从不清理。
+本模块以相同的SHA1键把响应改存为压缩的列式npz文件：
+节点ID与坐标（按OSM的1e-7度精度存为整数）、路径的节点引用均为打包数组，
+标签、关系等其余内容存为压缩JSON，可无损还原为原始响应。
+已有的JSON响应读取时转换，原文件保留不动（仓库中随notebook提交的响应
+不会被删除）；npz、节点/路径表与索引是本地生成的文件，不纳入版本控制。
+
+在notebook中调用 install() 即可让osmnx读写该缓存:
+
+    import osm_cache
+    cache = osm_cache.install()
+
+已缓存的Overpass响应可不经JSON解析直接得到几何（节点/路径表内存映射）:
+
+    gdf = cache.last_table().to_gdf()
+
+命令行: python osm_cache.py [cache目录] [--max-mb N] [--ttl-days N] [--remove-json]
+（转换目录下遗留的JSON响应并按容量/过期时间清理；--remove-json 转换后删除JSON）
+"""
+
+import hashlib
+import io
+import json
+import os
+import shutil
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+# 缓存目录与索引文件（索引名不是SHA1，osmnx不会把它当作缓存响应）
+CACHE_DIR = 'cache'
+INDEX_FILE = 'index.json'
+
+# 元素类型编码：打包存储的节点、路径，以及整体存为JSON的其他元素
+NODE, WAY, OTHER = 0, 1, 2
+
+# OSM坐标精度为小数点后7位，按整数存储可无损还原
+COORD_SCALE = 10**7
+
+# 内存映射节点/路径表：<SHA1>.table/目录下每个数组一个.npy文件，标签另存tags.json
+TABLE_SUFFIX = '.table'
+TABLE_ARRAYS = ['node_id', 'node_lat', 'node_lon', 'way_id', 'way_offsets', 'way_refs']
+
+# 闭合路径带有这些键时视为线（除非area=yes），其余闭合路径视为面
+LINEAR_KEYS = {'highway', 'barrier', 'railway', 'power'}
+
+
+def cache_key(url):
+    """osmnx使用的缓存键：请求URL的SHA1"""
+    return hashlib.sha1(url.encode('utf-8')).hexdigest()
+
+
+def _is_node(element):
+    return (element.get('type') == 'node' and isinstance(element.get('id'), int)
+            and isinstance(element.get('lat'), float) and isinstance(element.get('lon'), float))
+
+
+def _is_way(element):
+    return (element.get('type') == 'way' and isinstance(element.get('id'), int)
+            and isinstance(element.get('nodes'), list))
+
+
+def _deltas(values):
+    """差分编码：相邻ID接近，差值压缩率远高于原值"""
+    values = np.asarray(values, dtype=np.int64)
+    return np.diff(values, prepend=np.int64(0)) if len(values) else values
+
+
+def pack_response(data):
+    """
+    把Overpass响应打包为数组字典（供np.savez_compressed写入）
+
+    Args:
+        data: 解析后的响应JSON（Overpass为带elements的字典，Nominatim为列表）
+
+    Returns:
+        dict: 数组名 -> numpy数组
+    """
+    if not (isinstance(data, dict) and isinstance(data.get('elements'), list)):
+        # 非Overpass响应（如Nominatim地理编码结果）整体存为JSON
+        meta = {'raw': data}
+        return {'meta': np.frombuffer(json.dumps(meta).encode('utf-8'), dtype=np.uint8)}
+
+    elements = data['elements']
+    kinds = np.empty(len(elements), dtype=np.uint8)
+    node_ids, lats, lons = [], [], []
+    way_ids, way_lengths, way_refs = [], [], []
+    others = []
+    # 节点/路径除打包字段外的其余内容（主要是tags），按元素位置记录
+    extra_index, extras = [], []
+
+    for i, element in enumerate(elements):
+        if _is_node(element):
+            kinds[i] = NODE
+            node_ids.append(element['id'])
+            lats.append(element['lat'])
+            lons.append(element['lon'])
+            rest = {k: v for k, v in element.items() if k not in ('type', 'id', 'lat', 'lon')}
+        elif _is_way(element):
+            kinds[i] = WAY
+            way_ids.append(element['id'])
+            way_lengths.append(len(element['nodes']))
+            way_refs.extend(element['nodes'])
+            rest = {k: v for k, v in element.items() if k not in ('type', 'id', 'nodes')}
+        else:
+            kinds[i] = OTHER
+            others.append(element)
+            continue
+        if rest:
+            extra_index.append(i)
+            extras.append(rest)
+
+    header = {k: v for k, v in data.items() if k != 'elements'}
+    meta = {'header': header, 'others': others, 'extra_index': extra_index, 'extras': extras}
+    return {
+        'kinds': kinds,
+        'node_ids': _deltas(node_ids),
+        'node_lat': np.round(np.array(lats, dtype=np.float64) * COORD_SCALE).astype(np.int32),
+        'node_lon': np.round(np.array(lons, dtype=np.float64) * COORD_SCALE).astype(np.int32),
+        'way_ids': _deltas(way_ids),
+        'way_offsets': np.concatenate([[0], np.cumsum(way_lengths, dtype=np.int64)]),
+        'way_refs': _deltas(way_refs),
+        'meta': np.frombuffer(json.dumps(meta).encode('utf-8'), dtype=np.uint8),
+    }
+
+
+def unpack_response(arrays):
+    """pack_response的逆过程，还原出与原始响应相同的JSON对象"""
+    meta = json.loads(arrays['meta'].tobytes().decode('utf-8'))
+    if 'raw' in meta:
+        return meta['raw']
+
+    lats = (arrays['node_lat'] / COORD_SCALE).tolist()
+    lons = (arrays['node_lon'] / COORD_SCALE).tolist()
+    nodes = [
+        {'type': 'node', 'id': i, 'lat': lat, 'lon': lon}
+        for i, lat, lon in zip(np.cumsum(arrays['node_ids']).tolist(), lats, lons)
+    ]
+    offsets = arrays['way_offsets'].tolist()
+    refs = np.cumsum(arrays['way_refs']).tolist()
+    ways = [
+        {'type': 'way', 'id': i, 'nodes': refs[start:end]}
+        for i, start, end in zip(np.cumsum(arrays['way_ids']).tolist(), offsets, offsets[1:])
+    ]
+
+    # 按原始顺序合并三类元素，再补回tags等其余字段
+    sources = (iter(nodes), iter(ways), iter(meta['others']))
+    elements = [next(sources[kind]) for kind in arrays['kinds'].tolist()]
+    for i, rest in zip(meta['extra_index'], meta['extras']):
+        elements[i].update(rest)
+
+    data = dict(meta['header'])
+    data['elements'] = elements
+    return data
+
+
+def build_table(arrays, table_dir):
+    """
+    把npz中的打包数组展开为可内存映射的节点/路径表
+
+    节点按ID排序以便二分查找坐标；标签只保留带标签的节点和路径。
+
+    Args:
+        arrays: pack_response生成的数组（np.load打开的npz）
+        table_dir (str): 输出目录
+
+    Returns:
+        int: 表占用的字节数
+    """
+    meta = json.loads(arrays['meta'].tobytes().decode('utf-8'))
+    kinds = arrays['kinds']
+    node_id = np.cumsum(arrays['node_ids'])
+    order = np.argsort(node_id, kind='stable')
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+
+    # 元素位置 -> 在同类元素中的序号
+    ordinal = np.empty(len(kinds), dtype=np.int64)
+    for kind in (NODE, WAY, OTHER):
+        mask = kinds == kind
+        ordinal[mask] = np.arange(np.count_nonzero(mask))
+
+    node_tags, way_tags = [], []
+    for i, rest in zip(meta['extra_index'], meta['extras']):
+        if not rest.get('tags'):
+            continue
+        if kinds[i] == NODE:
+            node_tags.append([int(rank[ordinal[i]]), rest['tags']])
+        else:
+            way_tags.append([int(ordinal[i]), rest['tags']])
+    node_tags.sort(key=lambda item: item[0])
+    relations = [e for e in meta['others'] if e.get('type') == 'relation']
+
+    columns = {
+        'node_id': node_id[order],
+        'node_lat': arrays['node_lat'][order],
+        'node_lon': arrays['node_lon'][order],
+        'way_id': np.cumsum(arrays['way_ids']),
+        'way_offsets': arrays['way_offsets'],
+        'way_refs': np.cumsum(arrays['way_refs']),
+    }
+
+    tmp_dir = table_dir + '.tmp'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    for name in TABLE_ARRAYS:
+        np.save(os.path.join(tmp_dir, name + '.npy'), columns[name])
+    with open(os.path.join(tmp_dir, 'tags.json'), 'w', encoding='utf-8') as f:
+        json.dump({'nodes': node_tags, 'ways': way_tags, 'relations': relations}, f)
+    os.replace(tmp_dir, table_dir)
+    return sum(os.path.getsize(os.path.join(table_dir, name)) for name in os.listdir(table_dir))
+
+
+def _is_area(tags):
+    area = tags.get('area')
+    if area == 'yes':
+        return True
+    return area != 'no' and not LINEAR_KEYS & tags.keys()
+
+
+class OsmTable:
+    """
+    内存映射的OSM节点/路径表
+
+    数组通过mmap按需读入，不会为每个节点创建字典；路径几何由
+    节点ID -> 坐标的向量化查找直接构建。
+    """
+
+    def __init__(self, table_dir):
+        self.table_dir = table_dir
+        for name in TABLE_ARRAYS:
+            setattr(self, name, np.load(os.path.join(table_dir, name + '.npy'), mmap_mode='r'))
+        with open(os.path.join(table_dir, 'tags.json'), 'r', encoding='utf-8') as f:
+            tags = json.load(f)
+        self.node_tags = tags['nodes']
+        self.way_tags = tags['ways']
+        self.relations = tags['relations']
+
+    def coords(self, refs):
+        """节点ID数组 -> (lon, lat)坐标数组，响应中不存在的节点为NaN"""
+        refs = np.asarray(refs, dtype=np.int64)
+        xy = np.full((len(refs), 2), np.nan)
+        if len(self.node_id) == 0:
+            return xy
+        idx = np.minimum(np.searchsorted(self.node_id, refs), len(self.node_id) - 1)
+        found = self.node_id[idx] == refs
+        idx = idx[found]
+        xy[found, 0] = self.node_lon[idx] / COORD_SCALE
+        xy[found, 1] = self.node_lat[idx] / COORD_SCALE
+        return xy
+
+    def way_geometries(self, ways=None, polygon=None):
+        """
+        向量化构建路径几何
+
+        Args:
+            ways: 路径序号数组，默认全部路径
+            polygon: 每条路径是否构建为面的布尔数组，默认闭合路径为面；
+                只有闭合且节点齐全的路径才会成为面，其余为折线
+
+        Returns:
+            numpy.ndarray: shapely几何数组，节点不足的路径为None
+        """
+        import shapely
+
+        offsets = np.asarray(self.way_offsets)
+        ways = np.arange(len(offsets) - 1) if ways is None else np.asarray(ways, dtype=np.int64)
+        starts, ends = offsets[ways], offsets[ways + 1]
+        counts = ends - starts
+        total = int(counts.sum())
+
+        # 所有选中路径的节点引用拼成一个数组，一次查出全部坐标
+        way_index = np.repeat(np.arange(len(ways)), counts)
+        positions = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts) + np.repeat(starts, counts)
+        refs = self.way_refs[positions]
+        xy = self.coords(refs)
+        valid = ~np.isnan(xy[:, 0])
+        n_valid = np.bincount(way_index[valid], minlength=len(ways))
+
+        first = np.cumsum(counts) - counts
+        closed = np.zeros(len(ways), dtype=bool)
+        nonempty = counts > 0
+        closed[nonempty] = refs[first[nonempty]] == refs[first[nonempty] + counts[nonempty] - 1]
+        if polygon is None:
+            polygon = closed
+        as_polygon = np.asarray(polygon, dtype=bool) & closed & (n_valid == counts) & (counts >= 4)
+        as_line = ~as_polygon & (n_valid >= 2)
+
+        geometries = np.full(len(ways), None, dtype=object)
+        builders = [
+            (as_polygon, lambda c, i: shapely.polygons(shapely.linearrings(c, indices=i))),
+            (as_line, lambda c, i: shapely.linestrings(c, indices=i)),
+        ]
+        for mask, build in builders:
+            keep = valid & mask[way_index]
+            if not keep.any():
+                continue
+            # shapely要求几何序号连续，先压缩再写回对应位置
+            built, compact = np.unique(way_index[keep], return_inverse=True)
+            geometries[built] = build(xy[keep], compact)
+        return geometries
+
+    def _relation_geometry(self, relation, way_order):
+        import shapely
+
+        members = [m for m in relation.get('members', []) if m.get('type') == 'way']
+        refs = np.array([m['ref'] for m in members], dtype=np.int64)
+        if len(refs) == 0 or len(self.way_id) == 0:
+            return None
+        pos = np.minimum(np.searchsorted(self.way_id[way_order], refs), len(way_order) - 1)
+        found = self.way_id[way_order][pos] == refs
+        lines = self.way_geometries(way_order[pos[found]], polygon=np.zeros(found.sum(), dtype=bool))
+        roles = np.array([m.get('role', '') for m in members])[found]
+
+        # 外环/内环可能由多条路径拼接，用polygonize组装
+        outer = shapely.polygonize(lines[(roles != 'inner') & (lines != None)])  # noqa: E711
+        inner = shapely.polygonize(lines[(roles == 'inner') & (lines != None)])  # noqa: E711
+        geometry = shapely.union_all(shapely.get_parts(outer))
+        if not shapely.is_empty(inner):
+            geometry = geometry.difference(shapely.union_all(shapely.get_parts(inner)))
+        return None if geometry.is_empty else geometry
+
+    def to_gdf(self):
+        """
+        带标签的节点（点）、路径（线/面）和多边形关系组成的GeoDataFrame
+
+        索引为(element_type, osmid)，列为几何与各标签，与osmnx的结果一致。
+        """
+        import geopandas as gpd
+        import pandas as pd
+        import shapely
+
+        node_pos = np.array([pos for pos, _ in self.node_tags], dtype=np.int64)
+        points = shapely.points(self.node_lon[node_pos] / COORD_SCALE, self.node_lat[node_pos] / COORD_SCALE)
+
+        way_pos = np.array([pos for pos, _ in self.way_tags], dtype=np.int64)
+        areas = np.array([_is_area(tags) for _, tags in self.way_tags], dtype=bool)
+        ways = self.way_geometries(way_pos, polygon=areas)
+
+        way_order = np.argsort(self.way_id, kind='stable')
+        relations = [r for r in self.relations
+                     if r.get('tags', {}).get('type') in ('multipolygon', 'boundary')]
+        relation_geometries = [self._relation_geometry(r, way_order) for r in relations]
+
+        index = pd.MultiIndex.from_arrays(
+            [
+                ['node'] * len(node_pos) + ['way'] * len(way_pos) + ['relation'] * len(relations),
+                np.concatenate([
+                    self.node_id[node_pos],
+                    self.way_id[way_pos],
+                    np.array([r['id'] for r in relations], dtype=np.int64),
+                ]),
+            ],
+            names=['element_type', 'osmid'],
+        )
+        tags = [t for _, t in self.node_tags] + [t for _, t in self.way_tags] + [r['tags'] for r in relations]
+        geometry = list(points) + list(ways) + relation_geometries
+        gdf = gpd.GeoDataFrame(pd.DataFrame(tags, index=index), geometry=geometry, crs='EPSG:4326')
+        return gdf[gdf.geometry.notna()]
+
+
+def _osm_base(data):
+    """响应数据的时间（osm3s.timestamp_osm_base），没有则返回None"""
+    if not isinstance(data, dict):
+        return None
+    stamp = data.get('osm3s', {}).get('timestamp_osm_base')
+    if not stamp:
+        return None
+    try:
+        return datetime.fromisoformat(stamp.replace('Z', '+00:00')).timestamp()
+    except ValueError:
+        return None
+
+
+class OverpassCache:
+    """
+    以SHA1为键的紧凑OSM响应缓存
+
+    Args:
+        cache_dir (str): 缓存目录（与osmnx的cache_folder一致）
+        max_bytes (int): 磁盘容量上限，超出时按最近最少使用淘汰
+        ttl (float): 数据有效期（秒），按osm3s.timestamp_osm_base计算，
+            没有该时间戳的响应按写入时间计算；None表示永不过期
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=512 * 1024**2, ttl=None):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.index_file = os.path.join(cache_dir, INDEX_FILE)
+        self.stats = {'hits': 0, 'misses': 0, 'expired': 0, 'evicted': 0, 'converted': 0}
+        # install()后osmnx本次会话依次请求的缓存键，见 last_table()
+        self._requested = []
+        self._lock = threading.Lock()
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self.index = {}
+        if os.path.exists(self.index_file):
+            with open(self.index_file, 'r') as f:
+                self.index = json.load(f)
+        # 丢弃文件已不存在的条目以及索引中没有的孤立文件
+        self.index = {key: entry for key, entry in self.index.items()
+                      if os.path.exists(self._path(key))}
+        for name in os.listdir(cache_dir):
+            key, ext = os.path.splitext(name)
+            if ext == '.npz' and key not in self.index:
+                os.remove(os.path.join(cache_dir, name))
+            elif ext == TABLE_SUFFIX and key not in self.index:
+                shutil.rmtree(os.path.join(cache_dir, name), ignore_errors=True)
+        self.size = sum(entry['size'] for entry in self.index.values())
+        self._evict()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + '.npz')
+
+    def _legacy_path(self, key):
+        return os.path.join(self.cache_dir, key + '.json')
+
+    def _table_path(self, key):
+        return os.path.join(self.cache_dir, key + TABLE_SUFFIX)
+
+    def _expired(self, entry):
+        if self.ttl is None:
+            return False
+        born = entry['osm_base'] if entry['osm_base'] is not None else entry['stored']
+        return time.time() - born > self.ttl
+
+    def get(self, key):
+        """按SHA1键读取响应；未命中或已过期返回None"""
+        with self._lock:
+            entry = self.index.get(key)
+            if entry is not None and self._expired(entry):
+                self._remove(key)
+                self.stats['expired'] += 1
+                entry = None
+            if entry is not None:
+                entry['accessed'] = time.time()
+
+        if entry is None:
+            # osmnx原样保存的JSON响应：读取后转为紧凑格式，原文件保留
+            legacy = self._legacy_path(key)
+            if os.path.exists(legacy):
+                with open(legacy, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                self.put(key, data, stored=os.path.getmtime(legacy))
+                self.stats['converted'] += 1
+                if key in self.index:
+                    self.stats['hits'] += 1
+                    return data
+            self.stats['misses'] += 1
+            return None
+
+        try:
+            with np.load(self._path(key)) as arrays:
+                data = unpack_response(arrays)
+        except FileNotFoundError:  # 期间被淘汰
+            self.stats['misses'] += 1
+            return None
+        self.stats['hits'] += 1
+        return data
+
+    def put(self, key, data, stored=None):
+        """以紧凑格式保存响应"""
+        buffer = io.BytesIO()
+        np.savez_compressed(buffer, **pack_response(data))
+        body = buffer.getvalue()
+
+        osm_base = _osm_base(data)
+        now = time.time()
+        entry = {
+            'size': len(body),
+            'osm_base': osm_base,
+            'stored': stored or now,
+            'accessed': now,
+        }
+        if self._expired(entry):
+            return
+
+        tmp_file = self._path(key) + '.tmp'
+        with open(tmp_file, 'wb') as f:
+            f.write(body)
+        os.replace(tmp_file, self._path(key))
+
+        with self._lock:
+            old = self.index.get(key)
+            if old is not None:
+                self.size -= old['size']
+                # 响应已更新，旧的节点/路径表作废
+                shutil.rmtree(self._table_path(key), ignore_errors=True)
+            self.index[key] = entry
+            self.size += len(body)
+            self._evict()
+
+    def table(self, key):
+        """
+        按SHA1键返回内存映射的OsmTable，不把响应解析为字典
+
+        首次访问时由npz展开节点/路径表并计入缓存容量；未命中返回None。
+        """
+        with self._lock:
+            entry = self.index.get(key)
+            hit = entry is not None and not self._expired(entry)
+            if hit:
+                entry['accessed'] = time.time()
+        if hit:
+            self.stats['hits'] += 1
+        elif self.get(key) is None:  # 处理过期、遗留JSON及未命中计数
+            return None
+
+        table_dir = self._table_path(key)
+        if not os.path.isdir(table_dir):
+            with np.load(self._path(key)) as arrays:
+                if 'kinds' not in arrays.files:
+                    raise ValueError(f"{key} 不是Overpass响应")
+                table_size = build_table(arrays, table_dir)
+            with self._lock:
+                entry = self.index.get(key)
+                if entry is not None:
+                    entry['size'] += table_size
+                    self.size += table_size
+        return OsmTable(table_dir)
+
+    def request(self, key):
+        """记录osmnx本次会话请求的缓存键"""
+        with self._lock:
+            if not self._requested or self._requested[-1] != key:
+                self._requested.append(key)
+
+    def last_table(self):
+        """
+        install()后osmnx最近一次请求的Overpass响应的节点/路径表
+
+        跳过其间的Nominatim等非Overpass响应；没有已缓存的Overpass响应时返回None。
+        """
+        for key in reversed(self._requested):
+            try:
+                table = self.table(key)
+            except ValueError:  # 不是Overpass响应
+                continue
+            if table is not None:
+                return table
+        return None
+
+    def get_url(self, url):
+        return self.get(cache_key(url))
+
+    def table_url(self, url):
+        return self.table(cache_key(url))
+
+    def put_url(self, url, data):
+        self.put(cache_key(url), data)
+
+    def convert_legacy(self, remove=False):
+        """
+        把目录下osmnx保存的JSON响应转为紧凑格式
+
+        Args:
+            remove (bool): 转换后删除JSON文件（只应用于未纳入版本控制的缓存目录）
+
+        Returns:
+            int: 删除JSON后节省的字节数；不删除时为0
+        """
+        saved = 0
+        for name in sorted(os.listdir(self.cache_dir)):
+            key, ext = os.path.splitext(name)
+            if ext != '.json' or name == INDEX_FILE or len(key) != 40:
+                continue
+            legacy = self._legacy_path(key)
+            if key not in self.index:
+                with open(legacy, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                self.put(key, data, stored=os.path.getmtime(legacy))
+                self.stats['converted'] += 1
+            if remove and key in self.index:
+                saved += os.path.getsize(legacy) - self.index[key]['size']
+                os.remove(legacy)
+        return saved
+
+    def _remove(self, key):
+        entry = self.index.pop(key)
+        self.size -= entry['size']
+        if os.path.exists(self._path(key)):
+            os.remove(self._path(key))
+        shutil.rmtree(self._table_path(key), ignore_errors=True)
+
+    def _evict(self):
+        if self.ttl is not None:
+            for key in [k for k, entry in self.index.items() if self._expired(entry)]:
+                self._remove(key)
+                self.stats['expired'] += 1
+        if self.size <= self.max_bytes:
+            return
+        for key in sorted(self.index, key=lambda k: self.index[k]['accessed']):
+            if self.size <= self.max_bytes:
+                break
+            self._remove(key)
+            self.stats['evicted'] += 1
+
+    def save(self):
+        with self._lock:
+            tmp_file = self.index_file + '.tmp'
+            with open(tmp_file, 'w') as f:
+                json.dump(self.index, f)
+            os.replace(tmp_file, self.index_file)
+
+    def report(self):
+        """保存索引并打印本次运行的命中率"""
+        self.save()
+        stats = self.stats
+        total = stats['hits'] + stats['misses']
+        rate = stats['hits'] / total if total else 0
+        print(f"OSM缓存: 命中 {stats['hits']}, 未命中 {stats['misses']} ({rate:.0%}), "
+              f"过期 {stats['expired']}, 淘汰 {stats['evicted']}, 转换 {stats['converted']}, "
+              f"共 {len(self.index)} 个响应 {self.size / 1024**2:.1f} MB")
+
+
+def install(cache=None):
+    """
+    让osmnx（leafmap的OSM函数所用）通过OverpassCache读写缓存
+
+    Args:
+        cache (OverpassCache): 使用的缓存，默认使用osmnx的cache_folder
+
+    Returns:
+        OverpassCache: 已安装的缓存
+    """
+    import osmnx as ox
+
+    if cache is None:
+        cache = OverpassCache(str(getattr(ox.settings, 'cache_folder', CACHE_DIR)))
+
+    # osmnx 2.x在_http模块中读写缓存，1.x在downloader模块中
+    try:
+        from osmnx import _http as module
+    except ImportError:
+        from osmnx import downloader as module
+
+    def use_cache():
+        return getattr(ox.settings, 'use_cache', True)
+
+    def retrieve_from_cache(url, check_remark=True):
+        if not use_cache():
+            return None
+        cache.request(cache_key(url))
+        data = cache.get_url(url)
+        # 带remark的响应表示服务器端出错，不作为有效缓存
+        if check_remark and isinstance(data, dict) and 'remark' in data:
+            return None
+        return data
+
+    def save_to_cache(url, response_json, ok):
+        if not use_cache() or ok not in (True, 200):
+            return
+        if isinstance(response_json, dict) and 'remark' in response_json:
+            return
+        cache.put_url(url, response_json)
+        cache.save()
+        cache.request(cache_key(url))
+
+    module._retrieve_from_cache = retrieve_from_cache
+    module._save_to_cache = save_to_cache
+    return cache
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="转换并清理OSM查询缓存")
+    parser.add_argument("cache_dir", nargs="?", default=CACHE_DIR, help="缓存目录")
+    parser.add_argument("--max-mb", type=float, default=512, help="容量上限（MB）")
+    parser.add_argument("--ttl-days", type=float, default=None,
+                        help="数据有效期（天），按osm3s.timestamp_osm_base计算")
+    parser.add_argument("--remove-json", action="store_true",
+                        help="转换后删除JSON响应（仅用于未纳入版本控制的缓存目录）")
+    args = parser.parse_args()
+
+    cache = OverpassCache(
+        args.cache_dir,
+        max_bytes=int(args.max_mb * 1024**2),
+        ttl=args.ttl_days * 24 * 3600 if args.ttl_days is not None else None,
+    )
+    saved = cache.convert_legacy(remove=args.remove_json)
+    if saved:
+        print(f"转换遗留JSON响应，节省 {saved / 1024**2:.1f} MB")
+    cache.report()
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+SamGeo的批量提示预测
+notebook 10 中每组点提示调用一次 sam.predict：每次都单独把坐标从EPSG:4326
+投影到像素，运行一次解码器，再写出一幅整图大小的 maskN.tif。标注场景里
+一幅影像往往有成百上千组提示，本模块一次处理全部提示组：
+
+    from prompt_batch import predict_prompts
+    sam.set_image(image)
+    predict_prompts(sam, "prompts.gpkg", "masks.gpkg", group="id")   # 一个矢量图层
+    predict_prompts(sam, prompts_gdf, "masks.tif")                   # 每组一个波段
+
+提示为GeoDataFrame（或矢量文件）：点/多点为点提示，其他几何取外包框作为框提示；
+group 列相同的行组成一个提示组（默认每行一组），label 列为点标签（默认1，前景）。
+全部坐标一次性投影到影像坐标系并换算为像素；各组按提示类型分桶，点数不同的
+组以标签-1（SAM的填充点）补齐后成批送入解码器。图像嵌入只计算一次。
+
+命令行: python prompt_batch.py 影像.tif 提示.gpkg 输出.(gpkg|tif) [--group id] [--label label]
+"""
+
+import os
+import time
+
+import numpy as np
+
+
+def _pixel(inverse, xs, ys):
+    cols, rows = inverse * (np.asarray(xs, dtype=np.float64), np.asarray(ys, dtype=np.float64))
+    return np.column_stack([cols, rows])
+
+
+def load_prompts(prompts, crs, transform, group=None, label=None):
+    """
+    把提示表换算为像素坐标的提示组
+
+    Args:
+        prompts (GeoDataFrame | str): 提示几何或矢量文件路径
+        crs: 影像坐标系
+        transform (Affine): 影像仿射变换
+        group (str): 提示组列名，None则每行一组
+        label (str): 点标签列名（1前景，0背景），None则全部为1
+
+    Returns:
+        list: 按首次出现顺序的提示组，每组为 dict(group, points (N,2), labels (N,), box (4,)|None)
+    """
+    import geopandas as gpd
+    import shapely
+
+    gdf = gpd.read_file(prompts) if isinstance(prompts, str) else prompts
+    if gdf.crs is not None and crs is not None:
+        gdf = gdf.to_crs(crs)
+
+    geoms = gdf.geometry.values
+    keys = gdf[group].to_numpy() if group else np.arange(len(gdf))
+    names, first, codes = np.unique(keys, return_index=True, return_inverse=True)
+    labels = gdf[label].to_numpy(dtype=np.int64) if label else np.ones(len(gdf), dtype=np.int64)
+    inverse = ~transform
+
+    # 点提示：多点拆成多个点，坐标整体一次换算
+    is_point = np.isin(shapely.get_type_id(geoms), (0, 4))
+    rows = np.flatnonzero(is_point)
+    coords, index = shapely.get_coordinates(geoms[rows], return_index=True)
+    rows = rows[index]
+    points = _pixel(inverse, coords[:, 0], coords[:, 1])
+
+    # 框提示：外包框的左上/右下角换算为像素
+    box_rows = np.flatnonzero(~is_point)
+    bounds = shapely.bounds(geoms[box_rows])
+    corners = np.hstack([
+        _pixel(inverse, bounds[:, 0], bounds[:, 3]),
+        _pixel(inverse, bounds[:, 2], bounds[:, 1]),
+    ])
+    boxes = np.column_stack([
+        np.minimum(corners[:, 0], corners[:, 2]), np.minimum(corners[:, 1], corners[:, 3]),
+        np.maximum(corners[:, 0], corners[:, 2]), np.maximum(corners[:, 1], corners[:, 3]),
+    ])
+
+    point_order = np.argsort(codes[rows], kind='stable')
+    point_groups = np.split(point_order, np.searchsorted(codes[rows][point_order], np.arange(1, len(names))))
+    box_of = {}
+    for code, box in zip(codes[box_rows], boxes):
+        if code in box_of:
+            raise ValueError(f"提示组 {names[code]} 有多个框，SAM每个提示最多一个框")
+        box_of[code] = box
+
+    result = []
+    for code in np.argsort(first, kind='stable'):
+        selected = point_groups[code]
+        result.append({
+            'group': names[code],
+            'points': points[selected],
+            'labels': labels[rows[selected]],
+            'box': box_of.get(code),
+        })
+    return result
+
+
+def prompt_batches(groups, batch_size):
+    """
+    把提示组按类型（有无点、有无框）分桶并切分批次
+
+    Yields:
+        tuple: (组序号, 点 (B,N,2)|None, 标签 (B,N)|None, 框 (B,4)|None)，
+            点数不足N的组以标签-1的填充点补齐
+    """
+    buckets = {}
+    for i, prompt in enumerate(groups):
+        kind = (len(prompt['points']) > 0, prompt['box'] is not None)
+        if kind == (False, False):
+            raise ValueError(f"提示组 {prompt['group']} 没有点也没有框")
+        buckets.setdefault(kind, []).append(i)
+
+    for (has_points, has_box), indices in buckets.items():
+        for start in range(0, len(indices), batch_size):
+            batch = indices[start:start + batch_size]
+            points = labels = boxes = None
+            if has_points:
+                n = max(len(groups[i]['points']) for i in batch)
+                points = np.zeros((len(batch), n, 2), dtype=np.float32)
+                labels = np.full((len(batch), n), -1, dtype=np.int64)
+                for j, i in enumerate(batch):
+                    k = len(groups[i]['points'])
+                    points[j, :k] = groups[i]['points']
+                    labels[j, :k] = groups[i]['labels']
+            if has_box:
+                boxes = np.array([groups[i]['box'] for i in batch], dtype=np.float32)
+            yield batch, points, labels, boxes
+
+
+def predict_batch(predictor, points, labels, boxes, multimask_output=False):
+    """
+    一次解码器前向处理一批提示
+
+    Returns:
+        tuple: (掩膜 (B,H,W) bool, 得分 (B,))；multimask_output时每组取得分最高的掩膜
+    """
+    import torch
+
+    size = predictor.original_size
+    device = predictor.device
+    coords = point_labels = box = None
+    if points is not None:
+        coords = predictor.transform.apply_coords_torch(torch.as_tensor(points, device=device), size)
+        point_labels = torch.as_tensor(labels, device=device)
+    if boxes is not None:
+        box = predictor.transform.apply_boxes_torch(torch.as_tensor(boxes, device=device), size)
+
+    with torch.no_grad():
+        masks, scores, _ = predictor.predict_torch(
+            coords, point_labels, box, multimask_output=multimask_output
+        )
+    best = scores.argmax(dim=1)
+    index = torch.arange(len(best), device=best.device)
+    return masks[index, best].cpu().numpy(), scores[index, best].float().cpu().numpy()
+
+
+def _mask_shapes(mask, transform):
+    """只在掩膜的外包窗口内矢量化"""
+    import rasterio.features
+    from rasterio.windows import Window, transform as window_transform
+    from shapely.geometry import shape
+
+    rows = np.flatnonzero(mask.any(axis=1))
+    cols = np.flatnonzero(mask.any(axis=0))
+    if len(rows) == 0:
+        return []
+    window = Window(cols[0], rows[0], cols[-1] - cols[0] + 1, rows[-1] - rows[0] + 1)
+    crop = mask[rows[0]:rows[-1] + 1, cols[0]:cols[-1] + 1].astype(np.uint8)
+    return [
+        shape(geom)
+        for geom, _ in rasterio.features.shapes(crop, mask=crop > 0,
+                                                transform=window_transform(window, transform))
+    ]
+
+
+def predict_prompts(sam, prompts, output, group=None, label=None, batch_size=32,
+                    multimask_output=False, mask_multiplier=255, verbose=True):
+    """
+    对一幅影像批量运行大量提示组，结果写为多波段栅格或一个矢量图层
+
+    Args:
+        sam (samgeo.SamGeo): 已调用 set_image 的SamGeo实例（automatic=False）
+        prompts (GeoDataFrame | str): 提示几何或矢量文件路径，见 load_prompts
+        output (str): .tif/.tiff 输出多波段栅格（每组一个波段，波段描述为组名），
+            其他扩展名输出矢量图层（每个掩膜多边形一行，含 group 与 score 列）
+        group (str): 提示组列名
+        label (str): 点标签列名
+        batch_size (int): 每次解码的提示组数
+        multimask_output (bool): 每组生成3个候选掩膜并取得分最高者
+        mask_multiplier (int): 栅格输出的掩膜像素值
+        verbose (bool): 打印耗时
+
+    Returns:
+        dict: 提示组数、掩膜多边形数（矢量输出）、耗时与每秒提示组数
+    """
+    import geopandas as gpd
+    import rasterio
+
+    predictor = sam.predictor
+    if not predictor.is_image_set:
+        raise RuntimeError("请先调用 sam.set_image(image)")
+    with rasterio.open(sam.source) as src:
+        profile = src.profile.copy()
+    crs, transform = profile['crs'], profile['transform']
+
+    start = time.perf_counter()
+    groups = load_prompts(prompts, crs, transform, group=group, label=label)
+    raster = output.lower().endswith(('.tif', '.tiff'))
+    out_dir = os.path.dirname(output)
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+
+    dst = None
+    if raster:
+        profile.update(count=len(groups), dtype='uint8', nodata=0, compress='deflate',
+                       tiled=True, blockxsize=256, blockysize=256, interleave='band')
+        profile.pop('photometric', None)
+        dst = rasterio.open(output, 'w', **profile)
+    records = []
+    try:
+        for batch, points, labels, boxes in prompt_batches(groups, batch_size):
+            masks, scores = predict_batch(predictor, points, labels, boxes, multimask_output)
+            for i, mask, score in zip(batch, masks, scores):
+                name = groups[i]['group']
+                if raster:
+                    dst.write((mask * mask_multiplier).astype('uint8'), i + 1)
+                    dst.set_band_description(i + 1, str(name))
+                else:
+                    records += [(name, float(score), geom) for geom in _mask_shapes(mask, transform)]
+    finally:
+        if dst is not None:
+            dst.close()
+
+    stats = {'groups': len(groups)}
+    if not raster:
+        gdf = gpd.GeoDataFrame(records, columns=['group', 'score', 'geometry'], crs=crs)
+        gdf.to_file(output)
+        stats['polygons'] = len(gdf)
+    stats['seconds'] = time.perf_counter() - start
+    stats['groups_per_second'] = stats['groups'] / stats['seconds'] if stats['seconds'] else 0.0
+    if verbose:
+        print(f"{stats['groups']} 个提示组，{stats['seconds']:.1f} 秒，"
+              f"{stats['groups_per_second']:.1f} 组/秒 -> {output}")
+    return stats
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="批量运行SAM点/框提示")
+    parser.add_argument("image", help="输入GeoTIFF")
+    parser.add_argument("prompts", help="提示矢量文件")
+    parser.add_argument("output", help="输出 .tif（多波段）或矢量文件")
+    parser.add_argument("--group", default=None, help="提示组列名")
+    parser.add_argument("--label", default=None, help="点标签列名")
+    parser.add_argument("--checkpoint", default=None, help="SAM权重文件")
+    parser.add_argument("--model-type", default="vit_h", help="SAM模型类型")
+    parser.add_argument("--batch-size", type=int, default=32, help="每次解码的提示组数")
+    args = parser.parse_args()
+
+    from samgeo import SamGeo
+
+    sam = SamGeo(model_type=args.model_type, checkpoint=args.checkpoint, automatic=False)
+    sam.set_image(args.image)
+    predict_prompts(sam, args.prompts, args.output, group=args.group, label=args.label,
+                    batch_size=args.batch_size)
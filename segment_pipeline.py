@@ -0,0 +1,607 @@
+#!/usr/bin/env python3
+"""
+大幅影像文本提示分割的流式流水线
+12_Text_Prompts (Batch).ipynb 原流程先用 split_raster 把整幅影像切成瓦片写入
+tiles/，再用 LangSAM.predict_batch 逐个读取并把掩膜写入 masks/，最后合并；
+三个阶段依次等待，每个中间结果都落盘。这里改为三段并行的流水线：
+
+    读取线程: 按窗口从源GeoTIFF惰性读取瓦片（预读有上限）
+    主线程:   逐个瓦片运行 GroundingDINO + SAM
+    写入线程: 把掩膜窗口直接写进合并后的输出栅格
+
+第一个瓦片读出即开始分割，内存只保留预读的少量瓦片，磁盘上只有最终输出。
+
+瓦片之间可以重叠（overlap）。每个瓦片只写出自己的核心区域（相邻瓦片重叠带
+以中线为界划分），核心区域内的像素总能带着至少 overlap/2 的上下文被分割，
+被瓦片边缘截断的目标由相邻瓦片补全；实例框则按框中心所在核心区域去重，
+并把被瓦片内侧边缘截断的片段与相邻瓦片的实例拼接（见 SeamStitcher）。
+
+    from segment_pipeline import segment_raster
+    segment_raster(sam, "Image.tif", "masks/merged.tif", "tree", tile_size=800, overlap=128)
+
+没有GPU的多核机器上用 segment_raster_cpu：瓦片分发到进程池，每个工作进程
+只加载一次模型并限定自己的算子线程数，避免多个进程争抢同一批核心。
+"""
+
+import contextlib
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# 队列结束标记
+DONE = object()
+
+
+def _axis_tiles(size, tile, overlap):
+    """
+    一个方向上的瓦片划分
+
+    Returns:
+        list: (起点, 长度, 核心起点, 核心终点)，核心区域首尾相接覆盖[0, size)
+    """
+    if tile <= overlap:
+        raise ValueError(f"瓦片大小 {tile} 必须大于重叠 {overlap}")
+    if size <= tile:
+        return [(0, size, 0, size)]
+    starts = list(range(0, size - tile + 1, tile - overlap))
+    if starts[-1] + tile < size:
+        starts.append(size - tile)  # 最后一个瓦片贴齐边缘，保持完整大小
+    # 相邻瓦片重叠带的中线作为核心区域分界
+    seams = [(starts[i + 1] + starts[i] + tile) // 2 for i in range(len(starts) - 1)]
+    bounds = [0] + seams + [size]
+    return [(start, tile, bounds[i], bounds[i + 1]) for i, start in enumerate(starts)]
+
+
+def tile_layout(width, height, tile_size, overlap=0):
+    """
+    覆盖整幅影像的（可重叠）瓦片窗口及其核心窗口，按行优先顺序
+
+    Returns:
+        list: (读取窗口, 核心窗口)
+    """
+    from rasterio.windows import Window
+
+    tile_w, tile_h = tile_size if isinstance(tile_size, (tuple, list)) else (tile_size, tile_size)
+    layout = []
+    for row, h, core_top, core_bottom in _axis_tiles(height, tile_h, overlap):
+        for col, w, core_left, core_right in _axis_tiles(width, tile_w, overlap):
+            layout.append((Window(col, row, w, h),
+                           Window(core_left, core_top, core_right - core_left, core_bottom - core_top)))
+    return layout
+
+
+def tile_windows(width, height, tile_size, overlap=0):
+    """按行优先顺序生成覆盖整幅影像的窗口"""
+    for window, _ in tile_layout(width, height, tile_size, overlap):
+        yield window
+
+
+def read_tile(src, window):
+    """读取一个窗口为 HxWx3 的uint8 RGB数组"""
+    data = src.read(indexes=list(range(1, min(src.count, 3) + 1)), window=window)
+    if data.shape[0] == 1:
+        data = np.repeat(data, 3, axis=0)
+    return np.ascontiguousarray(data.transpose(1, 2, 0)).astype(np.uint8, copy=False)
+
+
+def _to_numpy(value):
+    """torch张量或数组 -> numpy数组"""
+    if hasattr(value, 'detach'):
+        value = value.detach().cpu().numpy()
+    return np.asarray(value)
+
+
+def predict_tile(sam, image, text_prompt, box_threshold=0.24, text_threshold=0.24):
+    """
+    对一个瓦片运行文本提示分割
+
+    Args:
+        sam: samgeo.text_sam.LangSAM 实例
+        image (numpy.ndarray): HxWx3 RGB瓦片
+
+    Returns:
+        tuple: (掩膜 NxHxW bool, 框 Nx4（瓦片像素坐标）, 置信度 N)；未检测到目标时返回None
+    """
+    from PIL import Image
+
+    image_pil = Image.fromarray(image)
+    boxes, logits, _ = sam.predict_dino(image_pil, text_prompt, box_threshold, text_threshold)
+    if len(boxes) == 0:
+        return None
+    masks = _to_numpy(sam.predict_sam(image_pil, boxes))
+    masks = masks.reshape(len(boxes), image.shape[0], image.shape[1]) > 0
+    return masks, _to_numpy(boxes).astype(np.float64), _to_numpy(logits).astype(np.float64)
+
+
+def segment_window(sam, tile, window, core, text_prompt, box_threshold, text_threshold):
+    """
+    分割一个瓦片并裁剪出其核心区域的掩膜
+
+    Returns:
+        tuple: (状态, 结果)。状态为 'skipped'（全黑无数据瓦片，不运行模型）、
+            'empty'（未检测到目标）或 'segmented'，此时结果为
+            (核心区域掩膜 bool, 框, 置信度)
+    """
+    if not tile.any():
+        return 'skipped', None
+    prediction = predict_tile(sam, tile, text_prompt, box_threshold, text_threshold)
+    if prediction is None:
+        return 'empty', None
+    masks, boxes, scores = prediction
+    # 只保留核心区域：核心区域互不重叠，重叠带由离它更近的瓦片负责
+    top = core.row_off - window.row_off
+    left = core.col_off - window.col_off
+    mask = masks[:, top:top + core.height, left:left + core.width].any(axis=0)
+    return 'segmented', (mask, boxes, scores)
+
+
+def _box_intersection(a, b):
+    """两组框 (N,4)、(M,4) 两两相交面积 (N,M)"""
+    w = np.minimum(a[:, None, 2], b[None, :, 2]) - np.maximum(a[:, None, 0], b[None, :, 0])
+    h = np.minimum(a[:, None, 3], b[None, :, 3]) - np.maximum(a[:, None, 1], b[None, :, 1])
+    return np.clip(w, 0, None) * np.clip(h, 0, None)
+
+
+def _box_area(boxes):
+    return (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+
+
+class SeamStitcher:
+    """
+    跨瓦片接缝的实例去重与拼接
+
+    框为全局像素坐标 (xmin, ymin, xmax, ymax)。每个瓦片的实例先按框中心
+    所在的核心区域去重（重叠带中同一目标只由拥有其中心的瓦片保留）；
+    被瓦片内侧边缘截断的实例再与已有实例比较，交集占较小框的比例超过
+    阈值即合并为外包框，从而把跨接缝的目标拼成一个。
+
+    Args:
+        threshold (float): 合并所需的交集/较小框面积比例
+        edge (float): 距瓦片内侧边缘多少像素以内视为被截断
+    """
+
+    def __init__(self, threshold=0.5, edge=2):
+        self.threshold = threshold
+        self.edge = edge
+        self.boxes = np.empty((0, 4))
+        self.scores = np.empty(0)
+        self.truncated = np.empty(0, dtype=bool)
+
+    def add(self, boxes, scores, window, core, width, height):
+        """
+        加入一个瓦片的实例
+
+        Args:
+            boxes: 瓦片像素坐标的框 (N,4)
+            scores: 置信度 (N,)
+            window: 瓦片读取窗口
+            core: 瓦片核心窗口
+            width, height: 整幅影像大小（影像外边缘不算截断）
+
+        Returns:
+            int: 新增（未与已有实例合并）的实例数
+        """
+        boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4) + [
+            window.col_off, window.row_off, window.col_off, window.row_off]
+        scores = np.asarray(scores, dtype=np.float64).reshape(-1)
+
+        # 框中心所在核心区域的瓦片拥有该实例
+        cx = (boxes[:, 0] + boxes[:, 2]) / 2
+        cy = (boxes[:, 1] + boxes[:, 3]) / 2
+        own = ((cx >= core.col_off) & (cx < core.col_off + core.width)
+               & (cy >= core.row_off) & (cy < core.row_off + core.height))
+        boxes, scores = boxes[own], scores[own]
+
+        left, top = window.col_off, window.row_off
+        right, bottom = left + window.width, top + window.height
+        truncated = (((boxes[:, 0] <= left + self.edge) & (left > 0))
+                     | ((boxes[:, 1] <= top + self.edge) & (top > 0))
+                     | ((boxes[:, 2] >= right - self.edge) & (right < width))
+                     | ((boxes[:, 3] >= bottom - self.edge) & (bottom < height)))
+
+        merged = np.zeros(len(boxes), dtype=bool)
+        if len(self.boxes) and len(boxes):
+            # 只与和本瓦片相交或相接的已有实例比较
+            tile_box = np.array([[left - self.edge, top - self.edge, right + self.edge, bottom + self.edge]])
+            near = np.flatnonzero(_box_intersection(self.boxes, tile_box)[:, 0] > 0)
+            if len(near):
+                ratio = self._match(boxes, truncated, self.boxes[near], self.truncated[near])
+                best = ratio.argmax(axis=1)
+                merged = ratio[np.arange(len(boxes)), best] > self.threshold
+                target = near[best[merged]]
+                np.minimum.at(self.boxes[:, 0], target, boxes[merged, 0])
+                np.minimum.at(self.boxes[:, 1], target, boxes[merged, 1])
+                np.maximum.at(self.boxes[:, 2], target, boxes[merged, 2])
+                np.maximum.at(self.boxes[:, 3], target, boxes[merged, 3])
+                np.maximum.at(self.scores, target, scores[merged])
+                np.logical_or.at(self.truncated, target, truncated[merged])
+
+        new = ~merged
+        self.boxes = np.concatenate([self.boxes, boxes[new]])
+        self.scores = np.concatenate([self.scores, scores[new]])
+        self.truncated = np.concatenate([self.truncated, truncated[new]])
+        return int(new.sum())
+
+    def _match(self, a, a_truncated, b, b_truncated):
+        """两组框的片段匹配度 (N,M)，超过threshold视为同一目标"""
+        # 相互重叠：交集占较小框的比例，任一方被截断才视为片段
+        inter = _box_intersection(a, b)
+        smaller = np.minimum(_box_area(a)[:, None], _box_area(b)[None, :])
+        ratio = np.where(smaller > 0, inter / np.maximum(smaller, 1e-9), 0)
+        ratio[~(a_truncated[:, None] | b_truncated[None, :])] = 0
+
+        # 无重叠的瓦片在接缝两侧各截得一段：框沿接缝相接，且沿接缝方向的范围大部分重合
+        ax0, ay0, ax1, ay1 = (a[:, None, i] for i in range(4))
+        bx0, by0, bx1, by1 = (b[None, :, i] for i in range(4))
+        overlap_x = (np.minimum(ax1, bx1) - np.maximum(ax0, bx0)) / np.maximum(np.minimum(ax1 - ax0, bx1 - bx0), 1e-9)
+        overlap_y = (np.minimum(ay1, by1) - np.maximum(ay0, by0)) / np.maximum(np.minimum(ay1 - ay0, by1 - by0), 1e-9)
+        gap_x = np.maximum(ax0, bx0) - np.minimum(ax1, bx1)
+        gap_y = np.maximum(ay0, by0) - np.minimum(ay1, by1)
+        abut = np.where((gap_x >= 0) & (gap_x <= self.edge), overlap_y, 0)
+        abut = np.maximum(abut, np.where((gap_y >= 0) & (gap_y <= self.edge), overlap_x, 0))
+        abut[~(a_truncated[:, None] & b_truncated[None, :])] = 0
+        return np.maximum(ratio, abut)
+
+    def to_gdf(self, transform, crs):
+        """实例框转换为地理坐标的GeoDataFrame"""
+        import geopandas as gpd
+        import shapely
+
+        # 框的四个角点（像素坐标）经仿射变换得到地理坐标
+        xs = self.boxes[:, [0, 2, 2, 0]]
+        ys = self.boxes[:, [1, 1, 3, 3]]
+        t = transform
+        coords = np.stack([t.a * xs + t.b * ys + t.c, t.d * xs + t.e * ys + t.f], axis=-1)
+        geometry = shapely.polygons(coords)
+        return gpd.GeoDataFrame({'score': self.scores}, geometry=geometry, crs=crs)
+
+
+def _put(q, item, abort):
+    """放入有界队列；流水线中止时放弃并返回False，不会永久阻塞"""
+    while not abort.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+
+def _reader(path, layout, tiles, abort):
+    """读取线程：惰性读取窗口放入有界队列，队列满时阻塞"""
+    import rasterio
+
+    try:
+        with rasterio.open(path) as src:
+            for window, core in layout:
+                if not _put(tiles, (window, core, read_tile(src, window)), abort):
+                    return
+    except Exception as e:
+        _put(tiles, e, abort)
+    _put(tiles, DONE, abort)
+
+
+def _writer(dst, results, errors, abort):
+    """写入线程：把掩膜窗口写入输出栅格；出错后继续取出并丢弃，直到结束标记"""
+    while True:
+        item = results.get()
+        if item is DONE:
+            return
+        if errors:
+            continue
+        window, mask = item
+        try:
+            dst.write(mask, 1, window=window)
+        except Exception as e:
+            errors.append(e)
+            abort.set()
+
+
+def output_profile(src, dtype='uint8'):
+    """与源影像对齐的单波段掩膜栅格配置；未写入的块保持稀疏，读出为0"""
+    return {
+        'driver': 'GTiff',
+        'width': src.width,
+        'height': src.height,
+        'count': 1,
+        'dtype': dtype,
+        'crs': src.crs,
+        'transform': src.transform,
+        'nodata': 0,
+        'tiled': True,
+        'blockxsize': 256,
+        'blockysize': 256,
+        'compress': 'deflate',
+        'sparse_ok': True,
+    }
+
+
+def _prepare(image, output, tile_size, overlap, dtype):
+    import rasterio
+
+    out_dir = os.path.dirname(output)
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+    with rasterio.open(image) as src:
+        profile = output_profile(src, dtype)
+    layout = tile_layout(profile['width'], profile['height'], tile_size, overlap)
+    stats = {'tiles': len(layout), 'segmented': 0, 'empty': 0, 'skipped': 0, 'objects': 0}
+    return profile, layout, stats
+
+
+def _record(status, payload, window, core, stitcher, stats, profile, mask_multiplier, dtype):
+    """累计统计并拼接实例，返回要写出的核心区域掩膜（无目标时为None）"""
+    stats[status] += 1
+    if status != 'segmented':
+        return None
+    mask, boxes, scores = payload
+    stitcher.add(boxes, scores, window, core, profile['width'], profile['height'])
+    return (mask * mask_multiplier).astype(dtype)
+
+
+def _progress(done, total, start):
+    elapsed = time.perf_counter() - start
+    print(f"\r瓦片 {done}/{total}，{done / elapsed:.2f} 瓦片/秒", end='')
+
+
+def _finish(stats, stitcher, profile, boxes_output, start, verbose):
+    stats['objects'] = len(stitcher.boxes)
+    if boxes_output is not None:
+        stitcher.to_gdf(profile['transform'], profile['crs']).to_file(boxes_output)
+
+    stats['seconds'] = time.perf_counter() - start
+    stats['tiles_per_second'] = stats['tiles'] / stats['seconds'] if stats['seconds'] else 0.0
+    if verbose:
+        print(f"\n完成: {stats['tiles']} 个瓦片（{stats['skipped']} 个无数据跳过），"
+              f"{stats['segmented']} 个检测到目标，共 {stats['objects']} 个目标，"
+              f"{stats['seconds']:.1f} 秒，{stats['tiles_per_second']:.2f} 瓦片/秒")
+    return stats
+
+
+def segment_raster(sam, image, output, text_prompt, box_threshold=0.24, text_threshold=0.24,
+                   tile_size=1000, overlap=0, prefetch=4, mask_multiplier=255, dtype='uint8',
+                   boxes_output=None, verbose=True):
+    """
+    流式分割整幅影像并直接写出合并后的掩膜
+
+    Args:
+        sam: samgeo.text_sam.LangSAM 实例
+        image (str): 输入GeoTIFF路径
+        output (str): 输出掩膜GeoTIFF路径（与输入对齐）
+        text_prompt (str): 文本提示
+        box_threshold (float): GroundingDINO框阈值
+        text_threshold (float): GroundingDINO文本阈值
+        tile_size (int | tuple): 瓦片大小（像素）
+        overlap (int): 相邻瓦片的重叠像素数，应不小于目标尺寸，使跨接缝的目标完整
+        prefetch (int): 读取线程最多预读的瓦片数，同时限制待写出的掩膜数
+        mask_multiplier (int): 掩膜像素值
+        dtype (str): 输出数据类型
+        boxes_output (str): 去重拼接后的实例框输出路径（GeoPackage/GeoJSON等），None不输出
+        verbose (bool): 打印进度与吞吐
+
+    Returns:
+        dict: 瓦片数、检测到目标的瓦片数、去重拼接后的目标数、耗时与吞吐
+    """
+    import rasterio
+
+    profile, layout, stats = _prepare(image, output, tile_size, overlap, dtype)
+    stitcher = SeamStitcher()
+    tiles = queue.Queue(maxsize=prefetch)
+    results = queue.Queue(maxsize=prefetch)
+    errors = []
+    abort = threading.Event()
+
+    start = time.perf_counter()
+    with rasterio.open(output, 'w', **profile) as dst:
+        reader = threading.Thread(target=_reader, args=(image, layout, tiles, abort), daemon=True)
+        writer = threading.Thread(target=_writer, args=(dst, results, errors, abort), daemon=True)
+        reader.start()
+        writer.start()
+        try:
+            done = 0
+            while True:
+                try:
+                    item = tiles.get(timeout=0.1)
+                except queue.Empty:
+                    # 写入失败后读取线程会提前退出，不再送来结束标记
+                    if errors:
+                        raise errors[0]
+                    continue
+                if item is DONE:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                window, core, tile = item
+                done += 1
+
+                status, payload = segment_window(sam, tile, window, core, text_prompt,
+                                                 box_threshold, text_threshold)
+                mask = _record(status, payload, window, core, stitcher, stats, profile,
+                               mask_multiplier, dtype)
+                if errors:
+                    raise errors[0]
+                if mask is not None:
+                    results.put((core, mask))
+                if verbose:
+                    _progress(done, len(layout), start)
+        finally:
+            # 写入线程总会取到结束标记；读取线程在abort后退出，不再阻塞在满队列上
+            abort.set()
+            results.put(DONE)
+            writer.join()
+            reader.join()
+        if errors:
+            raise errors[0]
+
+    return _finish(stats, stitcher, profile, boxes_output, start, verbose)
+
+
+def load_langsam(model_type='vit_h'):
+    """默认的模型工厂：在工作进程中创建LangSAM（无GPU时自动使用CPU）"""
+    from samgeo.text_sam import LangSAM
+
+    return LangSAM(model_type=model_type)
+
+
+# 工作进程内的模型与源影像句柄，由_init_worker在每个进程中创建一次
+_worker = {}
+
+
+# 限制各数学库线程池大小的环境变量
+THREAD_ENV_VARS = ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS')
+
+
+@contextlib.contextmanager
+def _thread_env(threads):
+    """
+    在父进程中临时设置线程数环境变量，由spawn出的工作进程继承
+
+    工作进程为了反序列化初始化函数会先导入本模块（以及numpy），BLAS线程池
+    在那时就已创建，所以这些变量必须在子进程启动前就存在于环境中。
+    """
+    saved = {var: os.environ.get(var) for var in THREAD_ENV_VARS}
+    os.environ.update({var: str(threads) for var in THREAD_ENV_VARS})
+    try:
+        yield
+    finally:
+        for var, value in saved.items():
+            if value is None:
+                os.environ.pop(var, None)
+            else:
+                os.environ[var] = value
+
+
+def _init_worker(model_factory, image, threads):
+    try:
+        import torch
+
+        torch.set_num_threads(threads)
+        torch.set_num_interop_threads(1)
+    except ImportError:
+        pass
+    import rasterio
+
+    _worker['sam'] = model_factory()
+    _worker['src'] = rasterio.open(image)
+
+
+def _segment_in_worker(window, core, text_prompt, box_threshold, text_threshold):
+    """工作进程：自行读取窗口并分割，掩膜按位打包后传回主进程"""
+    tile = read_tile(_worker['src'], window)
+    status, payload = segment_window(_worker['sam'], tile, window, core, text_prompt,
+                                     box_threshold, text_threshold)
+    if status == 'segmented':
+        mask, boxes, scores = payload
+        payload = (np.packbits(mask), mask.shape, boxes, scores)
+    return status, payload
+
+
+def segment_raster_cpu(image, output, text_prompt, workers=None, threads_per_worker=None,
+                       model_factory=load_langsam, box_threshold=0.24, text_threshold=0.24,
+                       tile_size=1000, overlap=0, mask_multiplier=255, dtype='uint8',
+                       boxes_output=None, verbose=True):
+    """
+    多进程CPU分割：瓦片分发到进程池，结果由主进程拼接并写出
+
+    各工作进程只加载一次模型、打开一次源影像，并自行读取分到的窗口，
+    主进程只传递窗口坐标；同时在途的瓦片数为工作进程数的两倍，内存有界。
+
+    Args:
+        image, output, text_prompt, box_threshold, text_threshold, tile_size, overlap,
+        mask_multiplier, dtype, boxes_output, verbose: 同 segment_raster
+        workers (int): 工作进程数，默认 CPU核数 // 4
+        threads_per_worker (int): 每个进程的算子内线程数，默认 CPU核数 // workers
+        model_factory: 在工作进程中创建模型的可pickle函数，默认 load_langsam
+
+    Returns:
+        dict: 同 segment_raster，另含 workers、threads_per_worker 和 startup_seconds
+            （首个瓦片完成前的模型加载时间）
+    """
+    import rasterio
+
+    cores = os.cpu_count() or 1
+    workers = workers or max(1, cores // 4)
+    threads = threads_per_worker or max(1, cores // workers)
+
+    profile, layout, stats = _prepare(image, output, tile_size, overlap, dtype)
+    stats.update(workers=workers, threads_per_worker=threads)
+    stitcher = SeamStitcher()
+    if verbose:
+        print(f"{workers} 个工作进程 × {threads} 线程（共 {cores} 核）")
+
+    start = time.perf_counter()
+    # spawn而非fork：子进程不继承父进程中已初始化的torch线程池
+    context = multiprocessing.get_context('spawn')
+    # 工作进程按需启动，整个进程池存续期间都保持线程数环境变量
+    with _thread_env(threads), \
+            ProcessPoolExecutor(workers, mp_context=context, initializer=_init_worker,
+                                initargs=(model_factory, image, threads)) as pool, \
+            rasterio.open(output, 'w', **profile) as dst:
+        tasks = iter(layout)
+        pending = deque()
+
+        def submit():
+            for window, core in tasks:
+                future = pool.submit(_segment_in_worker, window, core, text_prompt,
+                                     box_threshold, text_threshold)
+                pending.append((window, core, future))
+                return
+
+        for _ in range(2 * workers):
+            submit()
+
+        done = 0
+        # 按瓦片顺序取结果，拼接结果与单进程一致
+        while pending:
+            window, core, future = pending.popleft()
+            status, payload = future.result()
+            submit()
+            done += 1
+            if done == 1:
+                stats['startup_seconds'] = time.perf_counter() - start
+            if status == 'segmented':
+                bits, shape, boxes, scores = payload
+                mask = np.unpackbits(bits, count=shape[0] * shape[1]).reshape(shape).astype(bool)
+                payload = (mask, boxes, scores)
+            mask = _record(status, payload, window, core, stitcher, stats, profile,
+                           mask_multiplier, dtype)
+            if mask is not None:
+                dst.write(mask, 1, window=core)
+            if verbose:
+                _progress(done, len(layout), start)
+
+    return _finish(stats, stitcher, profile, boxes_output, start, verbose)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="流式文本提示分割大幅影像")
+    parser.add_argument("image", help="输入GeoTIFF")
+    parser.add_argument("output", help="输出掩膜GeoTIFF")
+    parser.add_argument("text_prompt", help="文本提示，如 tree")
+    parser.add_argument("--tile-size", type=int, default=1000, help="瓦片大小（像素）")
+    parser.add_argument("--overlap", type=int, default=0, help="瓦片重叠（像素）")
+    parser.add_argument("--boxes", default=None, help="实例框输出文件（如 boxes.gpkg）")
+    parser.add_argument("--box-threshold", type=float, default=0.24)
+    parser.add_argument("--text-threshold", type=float, default=0.24)
+    parser.add_argument("--prefetch", type=int, default=4, help="预读瓦片数")
+    parser.add_argument("--cpu", action="store_true", help="多进程CPU模式")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="CPU模式的工作进程数")
+    parser.add_argument("--threads", type=int, default=None, help="CPU模式每个进程的线程数")
+    args = parser.parse_args()
+
+    options = dict(box_threshold=args.box_threshold, text_threshold=args.text_threshold,
+                   tile_size=args.tile_size, overlap=args.overlap, boxes_output=args.boxes)
+    if args.cpu:
+        segment_raster_cpu(args.image, args.output, args.text_prompt, workers=args.workers,
+                           threads_per_worker=args.threads, **options)
+    else:
+        segment_raster(load_langsam(), args.image, args.output, args.text_prompt,
+                       prefetch=args.prefetch, **options)
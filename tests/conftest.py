@@ -0,0 +1,104 @@
+"""
+测试共用的本地HTTP服务：按路径返回固定内容，代替S3/GitHub/瓦片服务等远端
+"""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+
+class FixtureServer:
+    """
+    本地HTTP服务
+
+    routes 把路径映射到内容（bytes/str/dict/list，dict与list按JSON返回）或
+    函数 route(request) -> (状态码, 响应头, 内容)，request 有 path 与 headers。
+    未注册的路径返回404。每次请求记入 log，并记录同时在途的最大请求数。
+    """
+
+    def __init__(self, delay=0.0):
+        self.routes = {}
+        self.log = []
+        self.delay = delay
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self.httpd.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}/"
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+
+    def fail(self, path, times, status=503):
+        """让 path 的前 times 次请求返回 status，之后按原路由返回"""
+        route = self.routes[path]
+        remaining = [times]
+
+        def failing(request):
+            with self._lock:
+                remaining[0] -= 1
+                failed = remaining[0] >= 0
+            if failed:
+                return status, {}, b'unavailable'
+            return self._respond(route, request)
+
+        self.routes[path] = failing
+
+    def requests(self, path):
+        return [headers for logged, headers in self.log if logged == path]
+
+    def _respond(self, route, request):
+        if callable(route):
+            return route(request)
+        if isinstance(route, (dict, list)):
+            return 200, {'Content-Type': 'application/json'}, json.dumps(route).encode()
+        if isinstance(route, str):
+            route = route.encode()
+        return 200, {}, route
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                path = self.path.split('?')[0]
+                with server._lock:
+                    server.log.append((path, dict(self.headers)))
+                    server.active += 1
+                    server.max_active = max(server.max_active, server.active)
+                try:
+                    if server.delay:
+                        time.sleep(server.delay)
+                    route = server.routes.get(path)
+                    if route is None:
+                        status, headers, body = 404, {}, b'not found'
+                    else:
+                        status, headers, body = server._respond(route, self)
+                finally:
+                    with server._lock:
+                        server.active -= 1
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def http_server():
+    server = FixtureServer()
+    yield server
+    server.close()
@@ -0,0 +1,61 @@
+import os
+import threading
+
+import numpy as np
+
+import embedding_cache
+from embedding_cache import EmbeddingCache, image_key, model_key
+
+
+def features(seed):
+    return np.random.default_rng(seed).random((1, 4, 16, 16), dtype=np.float32)
+
+
+def test_roundtrip_and_keys(tmp_path):
+    cache = EmbeddingCache(str(tmp_path))
+    image = np.zeros((32, 32, 3), dtype=np.uint8)
+    key = image_key(model_key('vit_h'), image, (64, 64))
+    assert cache.get(key) is None
+    cache.put(key, features(0))
+    np.testing.assert_array_equal(cache.get(key), features(0))
+    assert cache.stats == {'hits': 1, 'encoded': 1, 'evicted': 0}
+    # 换模型或原始尺寸得到不同的键
+    assert key != image_key(model_key('vit_b'), image, (64, 64))
+    assert key != image_key(model_key('vit_h'), image, (32, 32))
+
+
+def test_evict_only_walks_over_limit(tmp_path, monkeypatch):
+    cache = EmbeddingCache(str(tmp_path))
+    cache.put('aa0', features(0))
+    entry = os.path.getsize(cache.path('aa0'))
+    cache.max_bytes = int(2.5 * entry)
+    for i in range(1, 4):
+        os.utime(cache.path(f'aa{i - 1}'), (i, i))
+        cache.put(f'aa{i}', features(i))
+    # 第4个嵌入写入时超出上限，淘汰最早访问的两个
+    assert cache.stats['evicted'] == 2
+    assert cache.size() == 2 * entry
+    assert cache.get('aa0') is None and cache.get('aa3') is not None
+
+    def walk(*args):
+        raise AssertionError("put() 遍历了缓存目录")
+
+    monkeypatch.setattr(embedding_cache.os, 'walk', walk)
+    cache.put('aa3', features(5))
+    assert cache.size() == 2 * entry
+
+
+def test_stats_are_thread_safe(tmp_path):
+    cache = EmbeddingCache(str(tmp_path))
+    cache.put('key', features(0))
+
+    def read():
+        for _ in range(200):
+            cache.get('key')
+
+    threads = [threading.Thread(target=read) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert cache.stats['hits'] == 1600
@@ -0,0 +1,104 @@
+import os
+
+import geopandas as gpd
+import pytest
+
+from maxar_harvest import harvest_event, read_footprints
+
+EVENT = 'Test-event-23'
+CHILDREN = {'10300100A': 25, '10400100B': 15}
+
+
+@pytest.fixture
+def bucket(http_server):
+    """代替Maxar Open Data静态STAC的本地服务"""
+    routes = http_server.routes
+    routes[f'/{EVENT}/collection.json'] = {
+        'type': 'Collection', 'id': EVENT,
+        'links': [{'rel': 'child', 'href': f'./{child}/collection.json'} for child in CHILDREN],
+    }
+    for n, (child, count) in enumerate(CHILDREN.items()):
+        routes[f'/{EVENT}/{child}/collection.json'] = {
+            'type': 'Collection', 'id': child,
+            'links': [{'rel': 'item', 'href': f'./{child}/{i}.json'} for i in range(count)],
+        }
+        for i in range(count):
+            routes[f'/{EVENT}/{child}/{child}/{i}.json'] = {
+                'type': 'Feature', 'id': f'{child}-{i}',
+                'geometry': {'type': 'Polygon', 'coordinates': [[[i, n], [i + 1, n], [i + 1, n + 1], [i, n]]]},
+                'properties': {'datetime': f'2023-02-{10 + n}T08:00:00Z', 'catalog_id': child,
+                               'view:off_nadir': 12.5, 'proj:bbox': [i, n, i + 1, n + 1]},
+                'assets': {'visual': {'href': f'./{i}-visual.tif'}, 'ms_analytic': {'href': f'./{i}-ms.tif'}},
+            }
+    return http_server
+
+
+def harvest(bucket, output, **kwargs):
+    return harvest_event(EVENT, str(output), workers=8, root=bucket.url, batch_size=10, verbose=False,
+                         **kwargs)
+
+
+def test_harvest_event(bucket, tmp_path):
+    output = tmp_path / 'footprints.parquet'
+    stats = harvest(bucket, output)
+    total = sum(CHILDREN.values())
+    assert stats['items'] == stats['fetched'] == total and stats['failed'] == {}
+    assert not os.path.exists(str(output) + '.parts')
+
+    gdf = gpd.read_parquet(output)
+    assert gdf['id'].is_unique and len(gdf) == total
+    assert set(gdf['child']) == set(CHILDREN)
+    row = gdf.set_index('id').loc['10300100A-3']
+    assert row['visual'] == f"{bucket.url}{EVENT}/10300100A/10300100A/3-visual.tif"
+    assert 'ms_analytic' not in gdf.columns
+    assert row['proj:bbox'] == '[3, 0, 4, 1]'
+
+
+def test_failed_item_is_retried_on_next_run(bucket, tmp_path):
+    output = tmp_path / 'footprints.parquet'
+    missing = f'/{EVENT}/10400100B/10400100B/7.json'
+    document = bucket.routes.pop(missing)
+
+    stats = harvest(bucket, output)
+    total = sum(CHILDREN.values())
+    assert stats['items'] == total - 1
+    assert list(stats['failed']) == [bucket.url + missing[1:]]
+    assert os.path.exists(str(output) + '.parts')
+
+    bucket.routes[missing] = document
+    before = len(bucket.log)
+    stats = harvest(bucket, output)
+    assert stats['fetched'] == 1 and stats['items'] == total and stats['failed'] == {}
+    item_requests = [path for path, _ in bucket.log[before:] if not path.endswith('collection.json')]
+    assert item_requests == [missing]
+    assert not os.path.exists(str(output) + '.parts')
+
+    # 已完成的事件直接返回，refresh=True 重新采集
+    before = len(bucket.log)
+    assert harvest(bucket, output) == {'items': total, 'skipped': True}
+    assert len(bucket.log) == before
+    assert harvest(bucket, output, refresh=True)['fetched'] == total
+
+
+def test_failed_child_collection_is_retried(bucket, tmp_path):
+    output = tmp_path / 'footprints.parquet'
+    path = f'/{EVENT}/10300100A/collection.json'
+    document = bucket.routes.pop(path)
+
+    stats = harvest(bucket, output)
+    assert stats['items'] == CHILDREN['10400100B']
+    assert list(stats['failed']) == [bucket.url + path[1:]]
+
+    bucket.routes[path] = document
+    stats = harvest(bucket, output)
+    assert stats['fetched'] == CHILDREN['10300100A']
+    assert stats['items'] == sum(CHILDREN.values())
+    assert len(bucket.requests(f'/{EVENT}/10400100B/collection.json')) == 1
+
+
+def test_flatgeobuf_output(bucket, tmp_path):
+    output = tmp_path / 'footprints.fgb'
+    harvest(bucket, output)
+    gdf = read_footprints(str(output))
+    assert len(gdf) == sum(CHILDREN.values())
+    assert gdf.crs.to_epsg() == 4326
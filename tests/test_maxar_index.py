@@ -0,0 +1,144 @@
+import hashlib
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+import shapely
+
+import maxar_index
+from maxar_index import FootprintStore, maxar_search
+
+COLLECTION = 'Test-earthquake-23'
+
+
+def make_features(n, seed=0):
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp('2023-01-20T00:00:00Z')
+    features = []
+    for i in range(n):
+        x, y = rng.uniform(36, 38), rng.uniform(36, 38)
+        w, h = rng.uniform(0.01, 0.1, 2)
+        # 部分影像正好在午夜采集，检验日期边界
+        offset = pd.Timedelta(days=int(rng.integers(0, 40)))
+        if i % 7:
+            offset += pd.Timedelta(seconds=int(rng.integers(1, 86400)))
+        features.append({
+            'type': 'Feature',
+            'geometry': shapely.geometry.mapping(shapely.box(x, y, x + w, y + h)),
+            'properties': {
+                'catalog_id': f'1040010{i // 50:04d}', 'quadkey': f'{i:08d}',
+                'datetime': (start + offset).strftime('%Y-%m-%dT%H:%M:%SZ'), 'tile:clouds_percent': i % 100,
+            },
+        })
+    return features
+
+
+class Remote:
+    """足迹GeoJSON的远端：带ETag，支持If-None-Match条件请求"""
+
+    def __init__(self, features):
+        self.set(features)
+        self.statuses = []
+
+    def set(self, features):
+        self.body = json.dumps({'type': 'FeatureCollection', 'features': features}).encode()
+        self.etag = '"' + hashlib.md5(self.body).hexdigest() + '"'
+
+    def __call__(self, request):
+        if request.headers.get('If-None-Match') == self.etag:
+            self.statuses.append(304)
+            return 304, {'ETag': self.etag}, b''
+        self.statuses.append(200)
+        return 200, {'ETag': self.etag, 'Content-Type': 'application/geo+json'}, self.body
+
+
+@pytest.fixture
+def remote(http_server, monkeypatch):
+    remote = Remote(make_features(4000))
+    http_server.routes[f'/{COLLECTION}.geojson'] = remote
+    monkeypatch.setattr(maxar_index, 'COLLECTION_URL', http_server.url + '{}.geojson')
+    return remote
+
+
+def brute_force(features, bbox=None, start_date=None, end_date=None, within=False):
+    """逐个足迹过滤，作为对照"""
+    keys = []
+    query = shapely.box(*bbox) if bbox else None
+    for feature in features:
+        props = feature['properties']
+        when = pd.Timestamp(props['datetime'])
+        if start_date is not None and when < pd.Timestamp(start_date, tz='UTC'):
+            continue
+        if end_date is not None and when > pd.Timestamp(end_date, tz='UTC'):
+            continue
+        if query is not None:
+            geom = shapely.geometry.shape(feature['geometry'])
+            if not (query.contains(geom) if within else query.intersects(geom)):
+                continue
+        keys.append(props['quadkey'])
+    return sorted(keys)
+
+
+@pytest.mark.parametrize('bbox,start_date,end_date,within', [
+    ([36.5, 36.5, 37.0, 37.0], None, None, False),
+    ([36.5, 36.5, 37.0, 37.0], None, None, True),
+    ([36.2, 36.9, 36.6, 37.4], None, '2023-02-06', False),
+    ([36.2, 36.9, 36.6, 37.4], '2023-02-06', None, True),
+    (None, '2023-02-01', '2023-02-10', False),
+    ([37.0, 37.0, 37.05, 37.05], '2023-02-06', '2023-02-06', False),
+])
+def test_search_matches_brute_force(remote, tmp_path, bbox, start_date, end_date, within):
+    features = json.loads(remote.body)['features']
+    gdf = maxar_search(COLLECTION, start_date=start_date, end_date=end_date, bbox=bbox, within=within,
+                       cache_dir=str(tmp_path))
+    assert sorted(gdf['quadkey']) == brute_force(features, bbox, start_date, end_date, within)
+    assert gdf['datetime'].is_monotonic_increasing
+
+
+def test_date_boundaries_are_inclusive(remote, tmp_path):
+    store = FootprintStore(COLLECTION, str(tmp_path))
+    store.refresh()
+    midnight = store.gdf['datetime'] == pd.Timestamp('2023-02-06T00:00:00Z')
+    assert midnight.any()
+    # 结束日期按当天0时：0时整的影像包含在内，当天晚些时候的不包含
+    before = store.search(end_date='2023-02-06')
+    after = store.search(start_date='2023-02-06')
+    assert set(store.gdf[midnight]['quadkey']) <= set(before['quadkey']) & set(after['quadkey'])
+    assert before['datetime'].max() == pd.Timestamp('2023-02-06T00:00:00Z')
+    assert len(before) + len(after) == len(store.gdf) + midnight.sum()
+
+
+def test_refresh_uses_conditional_requests(remote, tmp_path):
+    store = FootprintStore(COLLECTION, str(tmp_path))
+    assert store.refresh() == {'added': 4000, 'removed': 0}
+
+    # 新实例从本地存储载入，条件请求得到304，不重新下载
+    store = FootprintStore(COLLECTION, str(tmp_path))
+    assert len(store.gdf) == 4000
+    assert store.refresh() == {'added': 0, 'removed': 0}
+    assert remote.statuses == [200, 304]
+
+    # 远端变化：删除5景、新增10景、修改一景的属性，本地以远端为准重建
+    features = make_features(4000)[5:] + make_features(4010, seed=1)[4000:]
+    for i, feature in enumerate(features[-10:]):
+        feature['properties']['quadkey'] = f'new{i:05d}'
+    features[0]['properties']['tile:clouds_percent'] = 99
+    remote.set(features)
+    assert store.refresh() == {'added': 10, 'removed': 5}
+    assert remote.statuses == [200, 304, 200]
+    assert len(store.gdf) == 4005
+    row = store.gdf.set_index('quadkey').loc[features[0]['properties']['quadkey']]
+    assert row['tile:clouds_percent'] == 99
+
+    store = FootprintStore(COLLECTION, str(tmp_path))
+    assert len(store.gdf) == 4005
+
+
+def test_load_store_checks_remote_only_when_stale(remote, tmp_path):
+    maxar_index._stores.clear()
+    maxar_search(COLLECTION, cache_dir=str(tmp_path))
+    maxar_search(COLLECTION, cache_dir=str(tmp_path))
+    assert remote.statuses == [200]
+    maxar_search(COLLECTION, cache_dir=str(tmp_path), max_age=0)
+    assert remote.statuses == [200, 304]
@@ -0,0 +1,59 @@
+import threading
+
+import numpy as np
+import pytest
+import rasterio
+from rasterio.io import DatasetWriter
+from rasterio.transform import from_origin
+
+from segment_pipeline import segment_raster
+
+
+class FakeSam:
+    """每个瓦片都返回一个覆盖整个瓦片的目标"""
+
+    def predict_dino(self, image, text_prompt, box_threshold, text_threshold):
+        w, h = image.size
+        return np.array([[0, 0, w, h]], dtype=float), np.array([0.9]), ['tree']
+
+    def predict_sam(self, image, boxes):
+        w, h = image.size
+        return np.ones((len(boxes), h, w), dtype=bool)
+
+
+@pytest.fixture
+def image(tmp_path):
+    path = tmp_path / 'image.tif'
+    with rasterio.open(path, 'w', driver='GTiff', width=256, height=256, count=3, dtype='uint8',
+                       crs='EPSG:3857', transform=from_origin(0, 256, 1, 1)) as dst:
+        dst.write(np.full((3, 256, 256), 100, dtype=np.uint8))
+    return str(path)
+
+
+def test_segment_raster(image, tmp_path):
+    output = str(tmp_path / 'mask.tif')
+    stats = segment_raster(FakeSam(), image, output, 'tree', tile_size=64, verbose=False)
+    assert stats['tiles'] == 16 and stats['segmented'] == 16
+    with rasterio.open(output) as src:
+        assert (src.read(1) == 255).all()
+
+
+def test_segment_raster_writer_failure(image, tmp_path, monkeypatch):
+    def fail(self, *args, **kwargs):
+        raise IOError('disk full')
+
+    monkeypatch.setattr(DatasetWriter, 'write', fail)
+    output = str(tmp_path / 'mask.tif')
+    outcome = []
+
+    def run():
+        try:
+            segment_raster(FakeSam(), image, output, 'tree', tile_size=16, prefetch=1, verbose=False)
+        except Exception as e:
+            outcome.append(e)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    thread.join(timeout=20)
+    assert not thread.is_alive(), "写入失败后流水线阻塞"
+    assert len(outcome) == 1 and isinstance(outcome[0], IOError)
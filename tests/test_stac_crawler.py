@@ -0,0 +1,181 @@
+import json
+import os
+import random
+
+import pytest
+
+from stac_crawler import CrawlCheckpoint, StacCrawler, collection_file
+
+CATALOGS = {
+    'cat0': ['a1', 'a2', 'a3'],
+    'cat1': ['b1', 'b2'],
+    'cat2': ['c1', 'c2', 'c3', 'c4'],
+}
+# cat1 还有一层子目录，按层遍历
+NESTED = {'cat1': ['b3', 'b4']}
+
+
+def jittered(document):
+    """随机延迟返回，使完成顺序与链接顺序不同"""
+    def route(request):
+        import time
+
+        time.sleep(random.uniform(0, 0.02))
+        return 200, {'Content-Type': 'application/json'}, json.dumps(document).encode()
+    return route
+
+
+@pytest.fixture
+def catalog(http_server):
+    routes = http_server.routes
+    routes['/catalog.json'] = {
+        'type': 'Catalog', 'id': 'root',
+        'links': [{'rel': 'child', 'href': f'{name}/catalog.json'} for name in CATALOGS],
+    }
+    for name, ids in CATALOGS.items():
+        links = [{'rel': 'child', 'href': f'{cid}.json'} for cid in ids]
+        if name in NESTED:
+            links.append({'rel': 'child', 'href': 'sub/catalog.json'})
+            routes[f'/{name}/sub/catalog.json'] = jittered({
+                'type': 'Catalog', 'id': f'{name}-sub',
+                'links': [{'rel': 'child', 'href': f'{cid}.json'} for cid in NESTED[name]],
+            })
+            for cid in NESTED[name]:
+                routes[f'/{name}/sub/{cid}.json'] = jittered({'type': 'Collection', 'id': cid, 'links': []})
+        routes[f'/{name}/catalog.json'] = jittered({'type': 'Catalog', 'id': name, 'title': name.upper(),
+                                                    'links': links})
+        for cid in ids:
+            routes[f'/{name}/{cid}.json'] = jittered({'type': 'Collection', 'id': cid, 'links': []})
+    return http_server
+
+
+def expected_ids(name):
+    return CATALOGS[name] + NESTED.get(name, [])
+
+
+def crawler(**kwargs):
+    options = dict(max_workers=8, catalog_workers=3, per_host=4, retries=2, backoff=0.01, timeout=5)
+    options.update(kwargs)
+    return StacCrawler(**options)
+
+
+def harvest(checkpoint, stac, root, retry_failed=False, stop_after=None):
+    """与 Gee_Catalog.py 相同的用法：写出集合文件并记录检查点"""
+    results = []
+    for result in checkpoint.crawl(stac, root, retry_failed=retry_failed):
+        if result.error is None:
+            for collection in result.collections:
+                with open(collection_file(checkpoint.out_dir, collection['id']), 'w') as f:
+                    json.dump(collection, f)
+        checkpoint.record(result)
+        results.append(result)
+        if stop_after is not None and len(results) == stop_after:
+            break
+    return results
+
+
+def test_crawl_order_is_deterministic(catalog):
+    root = catalog.url + 'catalog.json'
+    runs = []
+    for _ in range(3):
+        results = list(crawler().crawl(root))
+        runs.append([(r.title, [c['id'] for c in r.collections]) for r in results])
+    assert runs[0] == runs[1] == runs[2]
+    assert runs[0] == [(name.upper(), expected_ids(name)) for name in CATALOGS]
+    # 相对链接被解析为绝对地址，并补上self链接
+    collection = list(crawler().crawl(root))[0].collections[0]
+    assert collection['links'] == [{'rel': 'self', 'href': catalog.url + 'cat0/a1.json',
+                                    'type': 'application/json'}]
+
+
+def test_per_host_limit(catalog):
+    catalog.delay = 0.05
+    list(crawler(max_workers=16, catalog_workers=3, per_host=2).crawl(catalog.url + 'catalog.json'))
+    assert catalog.max_active == 2
+
+
+def test_retry_recovers_from_server_errors(catalog):
+    catalog.fail('/cat2/c3.json', 2, status=503)
+    catalog.fail('/cat0/catalog.json', 1, status=502)
+    results = list(crawler().crawl(catalog.url + 'catalog.json'))
+    assert all(r.error is None for r in results)
+    assert [c['id'] for c in results[2].collections] == expected_ids('cat2')
+    assert len(catalog.requests('/cat2/c3.json')) == 3
+
+
+def test_persistent_failure_is_reported_per_catalog(catalog):
+    catalog.fail('/cat1/b2.json', 10, status=500)
+    results = list(crawler().crawl(catalog.url + 'catalog.json'))
+    assert results[1].error is not None and results[1].collections == []
+    assert [c['id'] for c in results[2].collections] == expected_ids('cat2')
+    assert len(catalog.requests('/cat1/b2.json')) == 3  # 首次 + 2次重试
+
+
+def test_checkpoint_resumes_interrupted_crawl(catalog, tmp_path):
+    root = catalog.url + 'catalog.json'
+    path = str(tmp_path / 'crawl.checkpoint.json')
+    harvest(CrawlCheckpoint(path, str(tmp_path)), crawler(), root, stop_after=1)
+    assert os.path.exists(path)
+    first = len(catalog.log)
+
+    checkpoint = CrawlCheckpoint(path, str(tmp_path))
+    results = harvest(checkpoint, crawler(), root)
+    checkpoint.finish()
+    assert [[c['id'] for c in r.collections] for r in results] == [expected_ids(n) for n in CATALOGS]
+    # 已完成的cat0从磁盘载入，不再请求
+    assert not any(p.startswith('/cat0/') for p, _ in catalog.log[first:])
+    assert not os.path.exists(path)
+
+
+def test_retry_failed_refuses_pending_catalogs(catalog, tmp_path):
+    root = catalog.url + 'catalog.json'
+    path = str(tmp_path / 'crawl.checkpoint.json')
+    catalog.fail('/cat0/a2.json', 10, status=500)
+    # cat0失败，cat1完成，cat2中断未爬取
+    harvest(CrawlCheckpoint(path, str(tmp_path)), crawler(), root, stop_after=2)
+
+    with pytest.raises(ValueError):
+        harvest(CrawlCheckpoint(path, str(tmp_path)), crawler(), root, retry_failed=True)
+
+    # 先续跑（cat0仍然失败），此后只剩失败的目录，--retry-failed 输出完整列表
+    checkpoint = CrawlCheckpoint(path, str(tmp_path))
+    harvest(checkpoint, crawler(), root)
+    checkpoint.finish()
+    assert os.path.exists(path)
+    catalog.routes['/cat0/a2.json'] = {'type': 'Collection', 'id': 'a2', 'links': []}
+    checkpoint = CrawlCheckpoint(path, str(tmp_path))
+    results = harvest(checkpoint, crawler(), root, retry_failed=True)
+    checkpoint.finish()
+    assert [[c['id'] for c in r.collections] for r in results] == [expected_ids(n) for n in CATALOGS]
+    assert not os.path.exists(path)
+
+
+def test_missing_collection_files_are_crawled_again(catalog, tmp_path):
+    root = catalog.url + 'catalog.json'
+    path = str(tmp_path / 'crawl.checkpoint.json')
+    harvest(CrawlCheckpoint(path, str(tmp_path)), crawler(), root, stop_after=2)
+    os.remove(collection_file(str(tmp_path), 'b1'))
+
+    checkpoint = CrawlCheckpoint(path, str(tmp_path))
+    results = harvest(checkpoint, crawler(), root)
+    checkpoint.finish()
+    assert [[c['id'] for c in r.collections] for r in results] == [expected_ids(n) for n in CATALOGS]
+    assert catalog.requests('/cat1/b1.json')
+    assert not os.path.exists(path)
+
+
+def test_unreadable_collection_file_keeps_checkpoint(catalog, tmp_path):
+    root = catalog.url + 'catalog.json'
+    path = str(tmp_path / 'crawl.checkpoint.json')
+    harvest(CrawlCheckpoint(path, str(tmp_path)), crawler(), root, stop_after=1)
+    # 文件存在但无法读取（这里换成同名目录）
+    os.remove(collection_file(str(tmp_path), 'a1'))
+    os.mkdir(collection_file(str(tmp_path), 'a1'))
+
+    checkpoint = CrawlCheckpoint(path, str(tmp_path))
+    results = harvest(checkpoint, crawler(), root)
+    checkpoint.finish()
+    assert [r.title for r in results] == ['CAT1', 'CAT2']
+    assert os.path.exists(path)
+    with open(path) as f:
+        assert 'status' not in json.load(f)['status'].get(catalog.url + 'cat0/catalog.json', {})
@@ -0,0 +1,136 @@
+import io
+import os
+
+import numpy as np
+import pytest
+import rasterio
+from PIL import Image
+
+import tile_fetcher
+from tile_fetcher import TILE_SIZE, TileCache, TileFetcher, tiles_for_bbox, tms_to_geotiff
+
+BBOX = [-122.2660, 37.8680, -122.2550, 37.8750]
+ZOOM = 16
+
+
+def color(x, y):
+    return (x % 251, y % 241, 99)
+
+
+def tile_png(x, y, size=TILE_SIZE):
+    buffer = io.BytesIO()
+    Image.new('RGB', (size, size), color(x, y)).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def tile_server(http_server):
+    """本地瓦片服务：每个瓦片是以其(x, y)编码的纯色PNG"""
+    def serve(size=TILE_SIZE):
+        tiles, _, _ = tiles_for_bbox(BBOX, ZOOM)
+        for x, y in tiles:
+            http_server.routes[f'/{ZOOM}/{x}/{y}.png'] = tile_png(x, y, size)
+        return http_server.url + '{z}/{x}/{y}.png', tiles
+    http_server.serve = serve
+    return http_server
+
+
+def expected_image(tiles, origin, window, missing=()):
+    x0, y0 = origin
+    width = (max(x for x, _ in tiles) - x0 + 1) * TILE_SIZE
+    height = (max(y for _, y in tiles) - y0 + 1) * TILE_SIZE
+    image = np.zeros((height, width, 3), dtype=np.uint8)
+    for x, y in tiles:
+        if (x, y) not in missing:
+            image[(y - y0) * TILE_SIZE:(y - y0 + 1) * TILE_SIZE, (x - x0) * TILE_SIZE:(x - x0 + 1) * TILE_SIZE] = color(x, y)
+    left, top, right, bottom = window
+    return image[top:bottom, left:right]
+
+
+def read_rgb(path):
+    with rasterio.open(path) as src:
+        return src.read().transpose(1, 2, 0), src
+
+
+def test_mosaic_and_cache(tile_server, tmp_path):
+    template, tiles = tile_server.serve()
+    assert len(tiles) > 4
+    cache = TileCache(str(tmp_path / 'cache'))
+    output = str(tmp_path / 'image.tif')
+
+    tms_to_geotiff(output, BBOX, zoom=ZOOM, source=template, overwrite=True, cache=cache, quiet=True)
+    _, origin, window = tiles_for_bbox(BBOX, ZOOM)
+    image, src = read_rgb(output)
+    np.testing.assert_array_equal(image, expected_image(tiles, origin, window))
+    assert src.crs.to_epsg() == 3857
+    # 左上角与bbox西北角的Web墨卡托坐标相差不到一个像素
+    res = 2 * tile_fetcher.ORIGIN_SHIFT / (TILE_SIZE * 2**ZOOM)
+    west, north = src.transform.c, src.transform.f
+    expected_west = BBOX[0] / 180 * tile_fetcher.ORIGIN_SHIFT
+    expected_north = np.log(np.tan(np.radians(90 + BBOX[3]) / 2)) / np.pi * tile_fetcher.ORIGIN_SHIFT
+    assert expected_west - res < west <= expected_west and expected_north <= north < expected_north + res
+    assert cache.stats['fetched'] == len(tiles) and len(tile_server.log) == len(tiles)
+
+    # 重新运行全部命中缓存，不再请求
+    tms_to_geotiff(output, BBOX, zoom=ZOOM, source=template, overwrite=True, cache=cache, quiet=True)
+    assert cache.stats['hits'] == len(tiles) and len(tile_server.log) == len(tiles)
+
+
+def test_retina_tiles_are_resampled(tile_server, tmp_path):
+    template, tiles = tile_server.serve(size=2 * TILE_SIZE)
+    output = str(tmp_path / 'image.tif')
+    tms_to_geotiff(output, BBOX, zoom=ZOOM, source=template, overwrite=True,
+                   cache=TileCache(str(tmp_path / 'cache')), quiet=True)
+    _, origin, window = tiles_for_bbox(BBOX, ZOOM)
+    image, _ = read_rgb(output)
+    np.testing.assert_array_equal(image, expected_image(tiles, origin, window))
+
+
+def test_missing_tiles_are_reported(tile_server, tmp_path, capsys):
+    template, tiles = tile_server.serve()
+    missing = tiles[len(tiles) // 2]
+    del tile_server.routes[f'/{ZOOM}/{missing[0]}/{missing[1]}.png']
+    output = str(tmp_path / 'image.tif')
+
+    tms_to_geotiff(output, BBOX, zoom=ZOOM, source=template, overwrite=True,
+                   cache=TileCache(str(tmp_path / 'cache')), quiet=True)
+    assert f"1/{len(tiles)} 个瓦片" in capsys.readouterr().out
+    _, origin, window = tiles_for_bbox(BBOX, ZOOM)
+    image, _ = read_rgb(output)
+    np.testing.assert_array_equal(image, expected_image(tiles, origin, window, missing={missing}))
+
+    tile_server.routes.clear()
+    with pytest.raises(RuntimeError):
+        tms_to_geotiff(str(tmp_path / 'none.tif'), BBOX, zoom=ZOOM + 1, source=template,
+                       cache=TileCache(str(tmp_path / 'cache')), quiet=True)
+
+
+def test_download_retries_transient_errors(tile_server, tmp_path):
+    template, tiles = tile_server.serve()
+    x, y = tiles[0]
+    tile_server.fail(f'/{ZOOM}/{x}/{y}.png', 2, status=503)
+    fetcher = TileFetcher(TileCache(str(tmp_path / 'cache')), workers=4, backoff=0.01)
+    contents = fetcher.fetch_tiles(template, ZOOM, tiles)
+    assert all(data is not None for data in contents)
+    assert len(tile_server.requests(f'/{ZOOM}/{x}/{y}.png')) == 3
+
+
+def test_evict_keeps_size_without_walking(tmp_path, monkeypatch):
+    cache = TileCache(str(tmp_path / 'cache'), max_bytes=2500)
+    for i in range(4):
+        cache.put('src', 1, 0, i, b'x' * 1000)
+        os.utime(cache.path('src', 1, 0, i), (i, i))
+    assert cache.size() == 4000
+    assert cache.evict() == 2000
+    assert cache.stats['evicted'] == 2
+    assert not os.path.exists(cache.path('src', 1, 0, 0)) and os.path.exists(cache.path('src', 1, 0, 3))
+
+    cache.put('src', 1, 0, 3, b'x' * 500)
+    assert cache.size() == 1500
+
+    # 未超出上限时不遍历缓存目录
+    def walk(*args):
+        raise AssertionError("evict() 遍历了缓存目录")
+
+    monkeypatch.setattr(tile_fetcher.os, 'walk', walk)
+    assert cache.evict() == 1500
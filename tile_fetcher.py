@@ -0,0 +1,426 @@
+#!/usr/bin/env python3
+"""
+带本地瓦片缓存的并行XYZ瓦片下载与拼接
+notebook 10-13中的 samgeo.tms_to_geotiff 逐个串行请求瓦片，zoom=19时一个AOI
+就是成百上千次请求，且重复运行同一AOI会全部重新下载。本模块的同名函数：
+在有界线程池中并发下载瓦片（失败自动退避重试），每个瓦片一下载完成即写入
+<缓存目录>/<来源>/z/x/y 文件；重新运行时只下载缺失的瓦片，中断后可直接续跑。
+缓存按容量上限淘汰最近最少访问的瓦片（以文件修改时间记录访问）。
+大于或小于256像素的瓦片（如512像素的@2x瓦片）解码时重采样为256像素；
+下载失败或不存在的瓦片填0，并打印缺失的瓦片数。
+
+    from tile_fetcher import tms_to_geotiff
+    tms_to_geotiff(output="Image.tif", bbox=bbox, zoom=19, source="Satellite", overwrite=True)
+
+source 可为内置名称（Satellite/Roadmap/Terrain/Hybrid/OpenStreetMap），也可为
+含 {x} {y} {z} 的URL模板（例如本地瓦片服务 http://127.0.0.1:8000/{z}/{x}/{y}.png）。
+
+命令行: python tile_fetcher.py 输出.tif 西 南 东 北 [--zoom 19] [--source Satellite]
+"""
+
+import hashlib
+import io
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+
+# 瓦片缓存目录与默认容量上限
+CACHE_DIR = 'tile_cache'
+MAX_BYTES = 2 * 1024**3
+
+TILE_SIZE = 256
+
+# Web墨卡托（EPSG:3857）半周长（米）
+ORIGIN_SHIFT = 20037508.342789244
+
+# 内置瓦片来源（名称不区分大小写），与samgeo的tms_to_geotiff保持一致
+TILE_SOURCES = {
+    'satellite': 'https://mt1.google.com/vt/lyrs=s&x={x}&y={y}&z={z}',
+    'roadmap': 'https://mt1.google.com/vt/lyrs=m&x={x}&y={y}&z={z}',
+    'terrain': 'https://mt1.google.com/vt/lyrs=p&x={x}&y={y}&z={z}',
+    'hybrid': 'https://mt1.google.com/vt/lyrs=y&x={x}&y={y}&z={z}',
+    'openstreetmap': 'https://tile.openstreetmap.org/{z}/{x}/{y}.png',
+}
+
+# 这些状态码视为临时错误，退避后重试
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+HEADERS = {'User-Agent': 'Mozilla/5.0 (ODP_Demo tile_fetcher)'}
+
+
+def tile_url_template(source):
+    """来源名称或URL模板 -> (缓存子目录名, URL模板)"""
+    if '{x}' in source and '{y}' in source and '{z}' in source:
+        # 自定义模板以其哈希作为缓存子目录，避免不同服务的瓦片混在一起
+        return hashlib.sha1(source.encode('utf-8')).hexdigest()[:12], source
+    name = source.lower()
+    if name not in TILE_SOURCES:
+        raise ValueError(f"未知的瓦片来源: {source}，可选 {list(TILE_SOURCES)} 或XYZ URL模板")
+    return name, TILE_SOURCES[name]
+
+
+def lonlat_to_pixel(lon, lat, zoom):
+    """经纬度 -> 指定缩放级别下的全局像素坐标"""
+    scale = TILE_SIZE * 2**zoom
+    lat = max(min(lat, 85.05112878), -85.05112878)
+    x = (lon + 180.0) / 360.0 * scale
+    sin_lat = math.sin(math.radians(lat))
+    y = (0.5 - math.log((1 + sin_lat) / (1 - sin_lat)) / (4 * math.pi)) * scale
+    return x, y
+
+
+def tiles_for_bbox(bbox, zoom):
+    """
+    覆盖bbox（西, 南, 东, 北）所需的瓦片及裁剪窗口
+
+    Returns:
+        tuple: (瓦片(x, y)列表, 拼图左上角瓦片(x0, y0), 拼图中的像素窗口(left, top, right, bottom))
+    """
+    west, south, east, north = bbox
+    left, top = lonlat_to_pixel(west, north, zoom)
+    right, bottom = lonlat_to_pixel(east, south, zoom)
+    left, top = int(math.floor(left)), int(math.floor(top))
+    right, bottom = max(int(math.ceil(right)), left + 1), max(int(math.ceil(bottom)), top + 1)
+
+    x0, y0 = left // TILE_SIZE, top // TILE_SIZE
+    x1, y1 = (right - 1) // TILE_SIZE, (bottom - 1) // TILE_SIZE
+    tiles = [(x, y) for y in range(y0, y1 + 1) for x in range(x0, x1 + 1)]
+    window = (left - x0 * TILE_SIZE, top - y0 * TILE_SIZE,
+              right - x0 * TILE_SIZE, bottom - y0 * TILE_SIZE)
+    return tiles, (x0, y0), window
+
+
+class TileCache:
+    """
+    z/x/y目录结构的磁盘瓦片缓存
+
+    Args:
+        cache_dir (str): 缓存根目录，每个瓦片来源一个子目录
+        max_bytes (int): 容量上限，evict()时按最近访问时间淘汰
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.stats = {'hits': 0, 'fetched': 0, 'failed': 0, 'evicted': 0}
+        self._lock = threading.Lock()
+        # 缓存总大小：首次需要时遍历一次目录，之后随写入与淘汰增量维护
+        self._size = None
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def path(self, source, z, x, y):
+        return os.path.join(self.cache_dir, source, str(z), str(x), str(y))
+
+    def get(self, source, z, x, y):
+        """读取缓存瓦片并刷新其访问时间；未缓存返回None"""
+        path = self.path(source, z, x, y)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        os.utime(path)
+        self.count('hits')
+        return data
+
+    def put(self, source, z, x, y, data):
+        path = self.path(source, z, x, y)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # 先写临时文件再改名，中断时不会留下残缺瓦片
+        tmp_file = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_file, 'wb') as f:
+            f.write(data)
+        try:
+            replaced = os.path.getsize(path)
+        except FileNotFoundError:
+            replaced = 0
+        os.replace(tmp_file, path)
+        with self._lock:
+            if self._size is not None:
+                self._size += len(data) - replaced
+
+    def count(self, stat):
+        with self._lock:
+            self.stats[stat] += 1
+
+    def _files(self):
+        for root, _, names in os.walk(self.cache_dir):
+            for name in names:
+                path = os.path.join(root, name)
+                if name.endswith('.tmp'):
+                    os.remove(path)  # 上次中断遗留
+                    continue
+                stat = os.stat(path)
+                yield stat.st_mtime, stat.st_size, path
+
+    def size(self):
+        with self._lock:
+            if self._size is None:
+                self._size = sum(size for _, size, _ in self._files())
+            return self._size
+
+    def evict(self):
+        """超出容量上限时删除最近最少访问的瓦片；未超出时不遍历目录"""
+        if self.size() <= self.max_bytes:
+            return self._size
+        files = sorted(self._files())
+        total = sum(size for _, size, _ in files)
+        for _, size, path in files:
+            if total <= self.max_bytes:
+                break
+            os.remove(path)
+            total -= size
+            self.count('evicted')
+        with self._lock:
+            self._size = total
+        return total
+
+    def report(self, elapsed=None):
+        stats = self.stats
+        total = stats['hits'] + stats['fetched']
+        rate = stats['hits'] / total if total else 0
+        speed = f", {total / elapsed:.0f} 瓦片/秒" if elapsed else ""
+        print(f"瓦片: 缓存命中 {stats['hits']}, 下载 {stats['fetched']}, 失败 {stats['failed']} "
+              f"({rate:.0%} 来自缓存{speed}), 淘汰 {stats['evicted']}")
+
+
+class TileFetcher:
+    """
+    有界并发的瓦片下载器
+
+    Args:
+        cache (TileCache): 瓦片缓存
+        workers (int): 并发下载线程数
+        retries (int): 临时错误的重试次数
+        backoff (float): 首次重试等待秒数，之后指数增长
+        timeout (float): 单次请求超时（秒）
+        headers (dict): 请求头
+    """
+
+    def __init__(self, cache, workers=16, retries=3, backoff=0.5, timeout=30, headers=None):
+        self.cache = cache
+        self.workers = workers
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.headers = headers or HEADERS
+        self._local = threading.local()
+
+    def _session(self):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            session.headers.update(self.headers)
+            self._local.session = session
+        return session
+
+    def download(self, url):
+        """下载一个瓦片，临时错误按指数退避重试；瓦片不存在时返回None"""
+        for attempt in range(self.retries + 1):
+            try:
+                response = self._session().get(url, timeout=self.timeout)
+                if response.status_code in RETRY_STATUSES and attempt < self.retries:
+                    time.sleep(self.backoff * 2**attempt)
+                    continue
+                if response.status_code == 404:
+                    return None
+                response.raise_for_status()
+                return response.content
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.retries:
+                    raise
+                time.sleep(self.backoff * 2**attempt)
+
+    def fetch(self, source, template, z, x, y):
+        """从缓存或网络获取一个瓦片的字节内容；失败返回None"""
+        data = self.cache.get(source, z, x, y)
+        if data is not None:
+            return data
+        try:
+            data = self.download(template.format(x=x, y=y, z=z))
+        except requests.RequestException as e:
+            print(f"瓦片 {z}/{x}/{y} 下载失败: {e}")
+            data = None
+        if data is None:
+            self.cache.count('failed')
+            return None
+        self.cache.put(source, z, x, y, data)
+        self.cache.count('fetched')
+        return data
+
+    def fetch_tiles(self, source, zoom, tiles):
+        """
+        并发获取一组瓦片
+
+        Returns:
+            list: 与tiles顺序一致的字节内容（失败为None）
+        """
+        name, template = tile_url_template(source)
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            return list(pool.map(lambda tile: self.fetch(name, template, zoom, *tile), tiles))
+
+
+def _decode(data):
+    """解码为 TILE_SIZE×TILE_SIZE 的RGB数组，其他大小的瓦片（如@2x）重采样"""
+    from PIL import Image
+
+    with Image.open(io.BytesIO(data)) as image:
+        image = image.convert('RGB')
+        if image.size != (TILE_SIZE, TILE_SIZE):
+            image = image.resize((TILE_SIZE, TILE_SIZE), Image.Resampling.LANCZOS)
+        return np.asarray(image)
+
+
+def mosaic(tiles, origin, window, contents, workers=None):
+    """把瓦片内容拼接为RGB数组并裁剪到窗口；缺失瓦片（内容为None）填0"""
+    x0, y0 = origin
+    width = (max(x for x, _ in tiles) - x0 + 1) * TILE_SIZE
+    height = (max(y for _, y in tiles) - y0 + 1) * TILE_SIZE
+    image = np.zeros((height, width, 3), dtype=np.uint8)
+
+    # PIL解码时释放GIL，线程池即可并行解码
+    present = [(tile, data) for tile, data in zip(tiles, contents) if data is not None]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        decoded = pool.map(_decode, [data for _, data in present])
+        for ((x, y), _), pixels in zip(present, decoded):
+            top, left = (y - y0) * TILE_SIZE, (x - x0) * TILE_SIZE
+            image[top:top + TILE_SIZE, left:left + TILE_SIZE] = pixels
+
+    left, top, right, bottom = window
+    return image[top:bottom, left:right]
+
+
+# 进程内共用的默认缓存，缓存大小只在首次淘汰检查时统计一次
+_default_cache = None
+
+
+def default_cache():
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = TileCache()
+    return _default_cache
+
+
+def tms_to_geotiff(output, bbox, zoom=None, resolution=None, source='Satellite', crs='EPSG:3857',
+                   overwrite=False, quiet=False, cache=None, workers=16, **kwargs):
+    """
+    下载bbox范围内的XYZ瓦片并保存为GeoTIFF（samgeo.tms_to_geotiff的缓存并行版本）
+
+    Args:
+        output (str): 输出GeoTIFF路径
+        bbox (list): [西, 南, 东, 北]（经纬度）
+        zoom (int): 缩放级别，未指定时由resolution推算，默认20
+        resolution (float): 目标分辨率（米/像素），仅在未指定zoom时使用
+        source (str): 瓦片来源名称或XYZ URL模板
+        crs (str): 输出坐标系，非EPSG:3857时重投影
+        overwrite (bool): 是否覆盖已存在的输出
+        quiet (bool): 不打印统计信息
+        cache (TileCache): 瓦片缓存，默认使用tile_cache/目录
+        workers (int): 并发下载线程数
+        **kwargs: 传给rasterio写入的额外创建参数（如compress）
+
+    Returns:
+        str: 输出路径；部分瓦片缺失时打印缺失数，全部缺失时抛出RuntimeError
+    """
+    import rasterio
+    from rasterio.transform import from_origin
+
+    if os.path.exists(output) and not overwrite:
+        print(f"{output} 已存在，使用overwrite=True覆盖")
+        return
+
+    if zoom is None:
+        if resolution is None:
+            zoom = 20
+        else:
+            zoom = int(round(math.log2(2 * ORIGIN_SHIFT / TILE_SIZE / resolution)))
+
+    cache = cache or default_cache()
+    fetcher = TileFetcher(cache, workers=workers)
+    tiles, origin, window = tiles_for_bbox(bbox, zoom)
+
+    start = time.perf_counter()
+    contents = fetcher.fetch_tiles(source, zoom, tiles)
+    elapsed = time.perf_counter() - start
+    missing = sum(data is None for data in contents)
+    if missing == len(tiles):
+        raise RuntimeError(f"{len(tiles)} 个瓦片全部下载失败，来源: {source}")
+    if missing:
+        print(f"警告: {missing}/{len(tiles)} 个瓦片下载失败或不存在，已填0")
+    image = mosaic(tiles, origin, window, contents, workers=workers)
+
+    res = 2 * ORIGIN_SHIFT / (TILE_SIZE * 2**zoom)
+    left = origin[0] * TILE_SIZE + window[0]
+    top = origin[1] * TILE_SIZE + window[1]
+    transform = from_origin(-ORIGIN_SHIFT + left * res, ORIGIN_SHIFT - top * res, res, res)
+
+    profile = {
+        'driver': 'GTiff',
+        'height': image.shape[0],
+        'width': image.shape[1],
+        'count': 3,
+        'dtype': 'uint8',
+        'crs': 'EPSG:3857',
+        'transform': transform,
+        'tiled': True,
+        'compress': 'deflate',
+    }
+    profile.update(kwargs)
+
+    if crs.upper() == 'EPSG:3857':
+        with rasterio.open(output, 'w', **profile) as dst:
+            dst.write(image.transpose(2, 0, 1))
+    else:
+        _write_reprojected(output, image, profile, crs)
+
+    cache.evict()
+    if not quiet:
+        cache.report(elapsed)
+        print(f"已保存 {output}（{image.shape[1]}x{image.shape[0]}，{len(tiles)} 个瓦片）")
+    return output
+
+
+def _write_reprojected(output, image, profile, crs):
+    import rasterio
+    from rasterio.transform import array_bounds
+    from rasterio.warp import Resampling, calculate_default_transform, reproject
+
+    src_transform = profile['transform']
+    transform, width, height = calculate_default_transform(
+        profile['crs'], crs, profile['width'], profile['height'],
+        *array_bounds(profile['height'], profile['width'], src_transform))
+    profile = dict(profile, crs=crs, transform=transform, width=width, height=height)
+    with rasterio.open(output, 'w', **profile) as dst:
+        for band in range(3):
+            reproject(image[:, :, band], rasterio.band(dst, band + 1),
+                      src_transform=src_transform, src_crs='EPSG:3857',
+                      dst_transform=transform, dst_crs=crs, resampling=Resampling.bilinear)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="并行下载XYZ瓦片并拼接为GeoTIFF")
+    parser.add_argument("output", help="输出GeoTIFF路径")
+    parser.add_argument("bbox", nargs=4, type=float, metavar=("WEST", "SOUTH", "EAST", "NORTH"))
+    parser.add_argument("--zoom", type=int, default=19, help="缩放级别")
+    parser.add_argument("--source", default="Satellite", help="瓦片来源名称或XYZ URL模板")
+    parser.add_argument("--cache-dir", default=CACHE_DIR, help="瓦片缓存目录")
+    parser.add_argument("--max-mb", type=float, default=MAX_BYTES / 1024**2, help="缓存容量上限（MB）")
+    parser.add_argument("-j", "--workers", type=int, default=16, help="并发下载线程数")
+    args = parser.parse_args()
+
+    tms_to_geotiff(
+        args.output,
+        args.bbox,
+        zoom=args.zoom,
+        source=args.source,
+        overwrite=True,
+        cache=TileCache(args.cache_dir, int(args.max_mb * 1024**2)),
+        workers=args.workers,
+    )
@@ -0,0 +1,506 @@
+#!/usr/bin/env python3
+"""
+流式的时序影像延时动画（GIF/MP4）
+notebook 05 中 leafmap.create_timelapse 先把每景影像解码成图片文件，再整体
+读入、逐帧叠加文字和进度条后一次性编码，内存与耗时都随景数增长。本模块的
+同名函数参数与leafmap一致，但逐帧流式处理：
+
+    from timelapse import create_timelapse
+    create_timelapse('peru/*.tif', out_gif='landsat.gif', bands=[0, 1, 2], fps=10,
+                     add_text=True, text_sequence=1984, font_size=20)
+
+解码在线程池中进行（按窗口/降采样读取所需波段，GDAL读取时释放GIL），帧缓冲
+预先分配并循环使用，在途帧数固定为 2 × workers + 1；文字与进度条直接绘制在
+帧缓冲上，每帧一完成就写入GIF（逐帧局部调色板）与MP4（管道输入ffmpeg）。
+因此内存占用与景数无关，12景和400景相同。
+
+输出只有几百像素宽时用 max_size 指定帧的最长边：每景按输出分辨率读取，
+有内部金字塔（overviews）的影像直接由GDAL读取合适的层级；没有的影像在首次
+使用时于 timelapse_cache/ 生成按2的幂降采样的副本，之后重复渲染只读副本。
+缓存按源文件路径、修改时间和大小命名，可随时删除。
+
+同一组影像要生成多个波段组合时用 create_timelapses，每景只解码一次。
+
+命令行: python timelapse.py "peru/*.tif" landsat.gif [--bands 0 1 2] [--fps 10] [--mp4]
+"""
+
+import glob
+import hashlib
+import math
+import os
+import queue
+import shutil
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# 降采样副本的缓存目录
+OVERVIEW_DIR = 'timelapse_cache'
+
+
+def list_images(images, ext='.tif'):
+    """文件列表、目录或通配符 -> 按文件名排序的影像列表"""
+    if isinstance(images, (list, tuple)):
+        return list(images)
+    if os.path.isdir(images):
+        return sorted(glob.glob(os.path.join(images, f"*{ext}")))
+    return sorted(glob.glob(images))
+
+
+def _window(src, bbox):
+    """bbox（经纬度 [西, 南, 东, 北]）在影像中的窗口；None为整幅"""
+    from rasterio.warp import transform_bounds
+    from rasterio.windows import Window, from_bounds
+
+    full = Window(0, 0, src.width, src.height)
+    if bbox is None:
+        return full
+    bounds = transform_bounds('EPSG:4326', src.crs, *bbox) if src.crs else bbox
+    return from_bounds(*bounds, transform=src.transform).round_offsets().round_lengths().intersection(full)
+
+
+def frame_size(window, max_size):
+    """窗口等比缩小到最长边不超过 max_size 的 (行, 列)"""
+    height, width = int(window.height), int(window.width)
+    scale = min(1.0, max_size / max(height, width))
+    return max(1, round(height * scale)), max(1, round(width * scale))
+
+
+def overview_source(path, shape, bbox=None, cache_dir=OVERVIEW_DIR):
+    """
+    按输出分辨率选择读取的文件
+
+    降采样不足2倍或影像已有足够的内部金字塔时返回原路径（GDAL降采样读取时
+    自动使用内部金字塔）；否则返回缓存目录中按2的幂降采样的副本，首次使用时
+    分条带生成，不整幅读入内存。
+    """
+    import rasterio
+    from affine import Affine
+    from rasterio.enums import Resampling
+    from rasterio.windows import Window
+
+    with rasterio.open(path) as src:
+        window = _window(src, bbox)
+        ratio = min(window.height / shape[0], window.width / shape[1])
+        if ratio < 2:
+            return path
+        factor = 2 ** int(math.log2(ratio))
+        if max(src.overviews(1), default=1) >= factor:
+            return path
+
+        stat = os.stat(path)
+        key = hashlib.sha1(f"{os.path.abspath(path)}|{stat.st_mtime_ns}|{stat.st_size}|{factor}".encode())
+        cached = os.path.join(cache_dir, f"{key.hexdigest()}.tif")
+        if os.path.exists(cached):
+            return cached
+
+        width, height = math.ceil(src.width / factor), math.ceil(src.height / factor)
+        profile = src.profile.copy()
+        profile.update(
+            driver='GTiff', width=width, height=height, tiled=True, blockxsize=256, blockysize=256,
+            compress='deflate', transform=src.transform * Affine.scale(src.width / width, src.height / height),
+        )
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_file = f"{cached}.{os.getpid()}.{id(src)}.tmp"
+        with rasterio.open(tmp_file, 'w', **profile) as dst:
+            for row in range(0, height, 256):
+                rows = min(256, height - row)
+                source = Window(0, row * factor, src.width, min(rows * factor, src.height - row * factor))
+                data = src.read(window=source, out_shape=(src.count, rows, width), resampling=Resampling.average)
+                dst.write(data, window=Window(0, row, width, rows))
+    os.replace(tmp_file, cached)
+    return cached
+
+
+def read_bands(path, bands, shape, bbox=None, resampling='nearest'):
+    """
+    读取一景影像的指定波段并降采样到 shape
+
+    Args:
+        path (str): 影像路径
+        bands (list): 0起始的波段序号
+        shape (tuple): 输出 (行, 列)
+        bbox (list): 经纬度范围，None为整幅
+        resampling (str): 重采样方法名（rasterio.enums.Resampling）
+
+    Returns:
+        numpy.ma.MaskedArray: (波段, 行, 列)，nodata被屏蔽
+    """
+    import rasterio
+    from rasterio.enums import Resampling
+
+    with rasterio.open(path) as src:
+        return src.read([band + 1 for band in bands], window=_window(src, bbox),
+                        out_shape=(len(bands),) + tuple(shape), masked=True,
+                        resampling=Resampling[resampling])
+
+
+def to_rgb(data, stretch=None):
+    """
+    (1或3, 行, 列) 的波段数据拉伸为 HxWx3 uint8
+
+    Args:
+        data (numpy.ma.MaskedArray): read_bands 的结果（或其波段子集）
+        stretch (tuple): 固定拉伸范围 (最小值, 最大值)，使各帧亮度一致；
+            None则uint8直接使用，其他类型按本帧有效值的最小/最大值拉伸
+    """
+    if stretch is None and data.dtype == np.uint8:
+        frame = data.filled(0)
+    else:
+        low, high = stretch if stretch is not None else (data.min(), data.max())
+        if np.ma.is_masked(low) or high <= low:
+            low, high = 0, 1
+        scaled = (data.astype(np.float32) - low) * (255.0 / (high - low))
+        frame = np.clip(scaled.filled(0), 0, 255).astype(np.uint8)
+    if len(frame) == 1:
+        frame = np.repeat(frame, 3, axis=0)
+    return frame.transpose(1, 2, 0)
+
+
+def read_frame(path, bands, shape, bbox=None, stretch=None, resampling='nearest'):
+    """读取一景影像的指定波段（1或3个）为 HxWx3 uint8，参数见 read_bands 与 to_rgb"""
+    return to_rgb(read_bands(path, bands, shape, bbox, resampling), stretch)
+
+
+def _pixels(value, size):
+    """'3%' 或像素数 -> 像素数"""
+    if isinstance(value, str) and value.endswith('%'):
+        return int(size * float(value[:-1]) / 100)
+    return int(value)
+
+
+def _font(font_type, font_size):
+    from PIL import ImageFont
+
+    try:
+        return ImageFont.truetype(font_type, font_size)
+    except OSError:
+        return ImageFont.load_default(size=font_size)
+
+
+class Overlay:
+    """
+    把文字和进度条直接绘制到帧缓冲上
+
+    文字先渲染到一块复用的灰度画布，再按其覆盖度与颜色混合进帧缓冲。
+    """
+
+    def __init__(self, shape, count, add_progress_bar=True, progress_bar_color='blue',
+                 progress_bar_height=5, add_text=False, text_xy=None, font_type='arial.ttf',
+                 font_size=20, font_color='black'):
+        from PIL import Image, ImageColor, ImageDraw
+
+        self.height, self.width = shape
+        self.count = count
+        self.bar = np.array(ImageColor.getrgb(progress_bar_color), dtype=np.uint8)[:3] \
+            if add_progress_bar else None
+        self.bar_height = progress_bar_height
+        self.add_text = add_text
+        if add_text:
+            x, y = text_xy or ('3%', '3%')
+            self.text_x, self.text_y = _pixels(x, self.width), _pixels(y, self.height)
+            self.color = np.array(ImageColor.getrgb(font_color), dtype=np.float32)[:3]
+            self.font = _font(font_type, font_size)
+            self.canvas = Image.new('L', (self.width, self.height))
+            self.draw = ImageDraw.Draw(self.canvas)
+
+    def apply(self, frame, index, text=None):
+        if self.add_text and text:
+            left, top, right, bottom = self.draw.textbbox((self.text_x, self.text_y), text, font=self.font)
+            left, top = max(left, 0), max(top, 0)
+            right, bottom = min(right, self.width), min(bottom, self.height)
+            if right > left and bottom > top:
+                box = (left, top, right, bottom)
+                self.draw.rectangle(box, fill=0)
+                self.draw.text((self.text_x, self.text_y), text, fill=255, font=self.font)
+                alpha = np.asarray(self.canvas.crop(box), dtype=np.float32)[..., None] / 255
+                region = frame[top:bottom, left:right]
+                region[:] = region * (1 - alpha) + self.color * alpha
+        if self.bar is not None:
+            filled = int(round(self.width * (index + 1) / self.count))
+            frame[self.height - self.bar_height:, :filled] = self.bar
+        return frame
+
+
+class GifWriter:
+    """逐帧写入GIF：每帧单独量化并带局部调色板，不在内存中累积帧"""
+
+    def __init__(self, path, fps, loop=0):
+        self.path = path
+        self.duration = int(round(1000 / fps))
+        self.loop = loop
+        self.file = None
+
+    def write(self, frame):
+        from PIL import GifImagePlugin, Image
+
+        # 快速八叉树量化，比默认的中位切分快数十倍
+        image = Image.fromarray(frame).quantize(256, method=Image.Quantize.FASTOCTREE)
+        if self.file is None:
+            self.file = open(self.path, 'wb')
+            header, _ = GifImagePlugin.getheader(image, info={'loop': self.loop, 'duration': self.duration})
+            self.file.write(b''.join(header))
+        for chunk in GifImagePlugin.getdata(image, duration=self.duration, include_color_table=True):
+            self.file.write(chunk)
+
+    def close(self):
+        if self.file is not None:
+            self.file.write(b';')
+            self.file.close()
+
+
+def _ffmpeg():
+    try:
+        import imageio_ffmpeg
+
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except ImportError:
+        path = shutil.which('ffmpeg')
+        if path is None:
+            raise RuntimeError("生成MP4需要ffmpeg（或 pip install imageio-ffmpeg）")
+        return path
+
+
+class Mp4Writer:
+    """把原始RGB帧通过管道送入ffmpeg编码为H.264"""
+
+    def __init__(self, path, fps, shape):
+        height, width = shape
+        self.process = subprocess.Popen(
+            [_ffmpeg(), '-y', '-loglevel', 'error', '-f', 'rawvideo', '-pix_fmt', 'rgb24',
+             '-s', f'{width}x{height}', '-r', str(fps), '-i', '-',
+             # yuv420p要求宽高为偶数
+             '-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2', '-pix_fmt', 'yuv420p', '-c:v', 'libx264', path],
+            stdin=subprocess.PIPE,
+        )
+
+    def write(self, frame):
+        self.process.stdin.write(frame.tobytes())
+
+    def close(self):
+        self.process.stdin.close()
+        if self.process.wait() != 0:
+            raise RuntimeError(f"ffmpeg 编码失败（退出码 {self.process.returncode}）")
+
+
+def _labels(files, text_sequence):
+    if text_sequence is None:
+        return [os.path.splitext(os.path.basename(f))[0] for f in files]
+    if isinstance(text_sequence, int):
+        return [str(text_sequence + i) for i in range(len(files))]
+    if len(text_sequence) != len(files):
+        raise ValueError(f"text_sequence 有 {len(text_sequence)} 项，影像有 {len(files)} 景")
+    return [str(text) for text in text_sequence]
+
+
+# 每个变体可单独设置的参数及其默认值（与leafmap.create_timelapse一致）
+VARIANT_OPTIONS = {
+    'bands': None,
+    'fps': 5,
+    'loop': 0,
+    'add_progress_bar': True,
+    'progress_bar_color': 'blue',
+    'progress_bar_height': 5,
+    'add_text': False,
+    'text_xy': None,
+    'font_type': 'arial.ttf',
+    'font_size': 20,
+    'font_color': 'black',
+    'mp4': False,
+    'reduce_size': False,
+    'stretch': None,
+}
+
+
+def _decode(slot, path, bands, selections, shape, bbox, overview_cache):
+    """读取一景所有变体用到的波段（只读一次），再为每个变体拉伸到它的帧缓冲"""
+    resampling = 'nearest'
+    if overview_cache is not None:
+        source = overview_source(path, shape, bbox, overview_cache)
+        # 从降采样副本再缩放的倍数小于2，平均重采样几乎不增加开销
+        resampling = 'average' if source != path else resampling
+        path = source
+    data = read_bands(path, bands, shape, bbox, resampling)
+    for buffer, (index, stretch) in zip(slot, selections):
+        np.copyto(buffer, to_rgb(data[index], stretch))
+    return slot
+
+
+def create_timelapses(images, variants, ext='.tif', size=None, bbox=None, text_sequence=None,
+                      quiet=True, workers=4, max_size=None, overview_cache=OVERVIEW_DIR, **options):
+    """
+    一次读取时序影像，同时生成多个波段组合的延时GIF/MP4
+
+    每景影像只解码一次（读取所有变体用到的波段的并集），每多一个假彩色
+    变体只增加拉伸和编码的开销：
+
+        create_timelapses('naip/*.tif', [
+            {'out_gif': 'naip.gif', 'bands': [0, 1, 2]},
+            {'out_gif': 'naip2.gif', 'bands': [3, 0, 1], 'mp4': True},
+        ], fps=3, add_text=True, text_sequence=text_sequence, max_size=600)
+
+    Args:
+        images (str | list): 通配符、目录或影像列表（按文件名排序）
+        variants (list): 每个变体一个dict，必须有 out_gif，其余键见 VARIANT_OPTIONS，
+            未给出的取 options 中的值
+        ext, size, bbox, text_sequence, quiet, workers, max_size, overview_cache:
+            所有变体共用，见 create_timelapse
+        **options: 各变体的默认参数（VARIANT_OPTIONS 中的键）
+
+    Returns:
+        list: 各变体的输出GIF路径
+    """
+    import rasterio
+
+    unknown = set(options) - set(VARIANT_OPTIONS)
+    for variant in variants:
+        unknown |= set(variant) - set(VARIANT_OPTIONS) - {'out_gif'}
+    if unknown:
+        raise TypeError(f"未知的延时动画参数: {', '.join(sorted(unknown))}")
+    variants = [{**VARIANT_OPTIONS, **options, **variant} for variant in variants]
+
+    files = list_images(images, ext)
+    if not files:
+        raise ValueError(f"没有找到影像: {images}")
+    with rasterio.open(files[0]) as src:
+        for variant in variants:
+            if variant['bands'] is None:
+                variant['bands'] = list(range(min(src.count, 3)))
+        if size is None:
+            window = _window(src, bbox)
+            size = frame_size(window, max_size) if max_size else (int(window.height), int(window.width))
+    shape = tuple(size)
+    labels = _labels(files, text_sequence)
+
+    # 所有变体用到的波段的并集，以及每个变体在并集中的位置
+    bands = sorted({band for variant in variants for band in variant['bands']})
+    selections = [([bands.index(band) for band in variant['bands']], variant['stretch'])
+                  for variant in variants]
+
+    outputs = []
+    for variant in variants:
+        out_gif = variant['out_gif']
+        os.makedirs(os.path.dirname(os.path.abspath(out_gif)), exist_ok=True)
+        writers = [GifWriter(out_gif, variant['fps'], variant['loop'])]
+        if variant['mp4']:
+            writers.append(Mp4Writer(os.path.splitext(out_gif)[0] + '.mp4', variant['fps'], shape))
+        overlay = Overlay(shape, len(files), variant['add_progress_bar'], variant['progress_bar_color'],
+                          variant['progress_bar_height'], variant['add_text'], variant['text_xy'],
+                          variant['font_type'], variant['font_size'], variant['font_color'])
+        outputs.append((overlay, writers))
+
+    # 预分配的帧缓冲，每个在途槽位为每个变体各一帧；在途景数不超过槽位数
+    slots = queue.SimpleQueue()
+    for _ in range(2 * workers + 1):
+        slots.put([np.empty(shape + (3,), dtype=np.uint8) for _ in variants])
+
+    start = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(workers) as pool:
+            pending = queue.SimpleQueue()
+            tasks = iter(range(len(files)))
+
+            def submit():
+                for i in tasks:
+                    pending.put(pool.submit(_decode, slots.get(), files[i], bands, selections,
+                                            shape, bbox, overview_cache))
+                    return
+
+            for _ in range(2 * workers + 1):
+                submit()
+            for index in range(len(files)):
+                slot = pending.get().result()
+                for frame, (overlay, writers) in zip(slot, outputs):
+                    overlay.apply(frame, index, labels[index])
+                    for writer in writers:
+                        writer.write(frame)
+                slots.put(slot)
+                submit()
+                if not quiet:
+                    print(f"\r帧 {index + 1}/{len(files)}", end='')
+    finally:
+        for _, writers in outputs:
+            for writer in writers:
+                writer.close()
+
+    gifs = [variant['out_gif'] for variant in variants]
+    for variant in variants:
+        if variant['reduce_size']:
+            try:
+                from pygifsicle import optimize
+
+                optimize(variant['out_gif'])
+            except ImportError:
+                print("reduce_size 需要 pygifsicle（pip install pygifsicle）")
+    if not quiet:
+        elapsed = time.perf_counter() - start
+        print(f"\n{len(files)} 帧 × {len(variants)} 个变体，{elapsed:.1f} 秒"
+              f"（{len(files) / elapsed:.1f} 景/秒）-> {', '.join(gifs)}")
+    return gifs
+
+
+def create_timelapse(images, out_gif, ext='.tif', bands=None, size=None, bbox=None, fps=5,
+                     loop=0, add_progress_bar=True, progress_bar_color='blue',
+                     progress_bar_height=5, add_text=False, text_xy=None, text_sequence=None,
+                     font_type='arial.ttf', font_size=20, font_color='black', mp4=False,
+                     quiet=True, reduce_size=False, stretch=None, workers=4, max_size=None,
+                     overview_cache=OVERVIEW_DIR, **kwargs):
+    """
+    由一组GeoTIFF流式生成延时GIF（可同时生成MP4），参数与leafmap.create_timelapse一致
+
+    Args:
+        images (str | list): 通配符、目录或影像列表（按文件名排序）
+        out_gif (str): 输出GIF路径；mp4=True时另写同名 .mp4
+        ext (str): images 为目录时的影像扩展名
+        bands (list): 0起始的波段序号，默认前3个波段
+        size (tuple): 输出帧大小 (行, 列)，默认第一景（bbox范围内）的大小
+        bbox (list): 经纬度范围 [西, 南, 东, 北]，只读取窗口内数据
+        fps (int): 帧率
+        loop (int): GIF循环次数，0为无限
+        add_progress_bar, progress_bar_color, progress_bar_height: 进度条
+        add_text, text_xy, text_sequence, font_type, font_size, font_color: 帧文字；
+            text_sequence 为整数时逐帧加1（如起始年份），为列表时逐帧取值，None为文件名
+        mp4 (bool): 同时输出MP4
+        quiet (bool): 不打印进度
+        reduce_size (bool): 用gifsicle压缩GIF（需安装pygifsicle）
+        stretch (tuple): 固定拉伸范围 (最小值, 最大值)，见 to_rgb
+        workers (int): 解码线程数
+        max_size (int): 帧最长边的像素数（size 未指定时），按该分辨率读取
+        overview_cache (str): 无内部金字塔的影像降采样读取时，降采样副本的缓存目录；
+            None则每次直接从原分辨率降采样读取
+        **kwargs: 为兼容leafmap接受的其他参数，忽略
+
+    Returns:
+        str: 输出GIF路径
+    """
+    variant = {
+        'out_gif': out_gif, 'bands': bands, 'fps': fps, 'loop': loop,
+        'add_progress_bar': add_progress_bar, 'progress_bar_color': progress_bar_color,
+        'progress_bar_height': progress_bar_height, 'add_text': add_text, 'text_xy': text_xy,
+        'font_type': font_type, 'font_size': font_size, 'font_color': font_color, 'mp4': mp4,
+        'reduce_size': reduce_size, 'stretch': stretch,
+    }
+    return create_timelapses(images, [variant], ext=ext, size=size, bbox=bbox,
+                             text_sequence=text_sequence, quiet=quiet, workers=workers,
+                             max_size=max_size, overview_cache=overview_cache)[0]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="由时序GeoTIFF生成延时GIF/MP4")
+    parser.add_argument("images", help="影像通配符或目录")
+    parser.add_argument("out_gif", help="输出GIF")
+    parser.add_argument("--bands", type=int, nargs="+", default=None, help="0起始的波段序号")
+    parser.add_argument("--fps", type=int, default=5, help="帧率")
+    parser.add_argument("--text-sequence", type=int, default=None, help="起始序号（如年份）")
+    parser.add_argument("--mp4", action="store_true", help="同时输出MP4")
+    parser.add_argument("--workers", type=int, default=4, help="解码线程数")
+    parser.add_argument("--max-size", type=int, default=None, help="帧最长边像素数")
+    args = parser.parse_args()
+
+    create_timelapse(args.images, args.out_gif, bands=args.bands, fps=args.fps,
+                     add_text=args.text_sequence is not None, text_sequence=args.text_sequence,
+                     mp4=args.mp4, quiet=False, workers=args.workers, max_size=args.max_size)